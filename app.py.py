@@ -1,10 +1,104 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
+import glob
 import os
+import tempfile
+import threading
+import time
+
+from farmdata import (
+    DEFAULT_INITIAL_STOCK,
+    BackgroundWriter,
+    ConflictError,
+    SheetDict,
+    commit,
+    house_index,
+    is_house_sheet,
+    open_storage,
+    recalculate_stock,
+)
+from farmdata import bulk_import, export, profiling
+from farmdata.aggregates import HouseAggregates
+from farmdata.archive import CycleArchive
+from farmdata.cycles import age_for_date, cycle_registry, house_cycles, house_initial_stock, refresh_house
+from farmdata.farms import Farm, farm_report, load_farms, shard_version
+from farmdata.feed import FeedLedger
+from farmdata.growth import default_standard, growth_analytics, load_standard
+from farmdata.records import apply_batch, page_count, page_positions, record_table, required_sheets
+from farmdata.rollups import FarmRollups
+from farmdata.schema import BREEDS, PLACEMENT_COLUMNS, PLACEMENT_SHEET, PURCHASE_SHEET, WEIGHT_SHEET
+from farmdata.storage import iter_frame, since_day
+
+# 耗时统计（设置环境变量 CHICKEN_PROFILE=1 开启），记录本次页面运行各步骤的耗时
+profiling.begin_run()
 
 st.title('鸡舍数据录入系统')
 file_path = r"C:\Users\hb\Desktop\原始数据\chicken.xlsx"
+# 存储方式：excel（默认，直接读写工作簿）或 sqlite（与工作簿同目录的 .db 文件）
+storage_backend = os.environ.get("CHICKEN_STORAGE", "excel")
+# 鸡场配置：工作簿同目录的 farms.json（格式见farmdata.farms），没有时只有上面这一个工作簿
+farms_path = os.environ.get("CHICKEN_FARMS") or os.path.join(os.path.dirname(file_path), "farms.json")
+try:
+    farms = load_farms(farms_path, file_path, storage_backend)
+except (OSError, ValueError) as e:
+    st.error(f"鸡场配置读取失败：{e}")
+    st.stop()
+
+def switch_farm():
+    """切换鸡场：清空其余会话状态，各控件按新鸡场的鸡舍重新初始化"""
+    for key in list(st.session_state):
+        if key != "farm":
+            del st.session_state[key]
+
+if len(farms) > 1:
+    farm_name = st.sidebar.selectbox("鸡场", [f.name for f in farms], key="farm", on_change=switch_farm)
+    farm = next(f for f in farms if f.name == farm_name)
+    st.caption(f"当前鸡场：{farm.name}")
+else:
+    farm = farms[0]
+# 当前鸡场的工作簿、存储方式和鸡舍编号
+file_path, storage_backend, farm_houses = farm.path, farm.backend, list(farm.houses)
+
+@st.cache_resource
+def get_storage(path, backend, houses):
+    """打开数据存储、后台写回线程、鸡场汇总和饲料库存台账（每个鸡场一份，所有会话共享）"""
+    # 提交时只写日志，由后台线程把短时间内的改动合并后一次写回工作簿
+    storage = open_storage(path, backend, batch_size=None)
+    rollups = FarmRollups(houses)
+    feed_ledger = FeedLedger(houses)
+
+    def rebase(before, after):
+        # 写回工作簿不改变数据内容，汇总和台账无需重算
+        rollups.rebase(before, after)
+        feed_ledger.rebase(before, after)
+
+    return storage, BackgroundWriter(storage, on_compact=rebase), rollups, feed_ledger
+
+storage, writer, rollups, feed_ledger = get_storage(file_path, storage_backend, tuple(farm_houses))
+# 已结束批次的归档（工作簿同目录的 chicken.archive），查询历史时按需读取
+archive = CycleArchive(file_path)
+# 品种标准体重表：工作簿同目录的 品种标准.csv（列为 品种、日龄、标准体重(g)），没有时使用内置标准
+standard_path = os.environ.get("CHICKEN_BREED_STANDARD") or os.path.join(os.path.dirname(file_path), "品种标准.csv")
+
+@st.fragment(run_every="2s")
+def show_save_status():
+    """侧边栏显示改动是否已写入工作簿（每2秒刷新）"""
+    status = writer.status()
+    if status["last_error"]:
+        st.warning(f"⚠️ 写入工作簿失败：{status['last_error']}（改动已记录在日志中，不会丢失）")
+    if status["pending"]:
+        st.info(f"⏳ {status['pending']} 条改动待写入工作簿")
+        if st.button("立即写入", key="flush_btn"):
+            writer.flush()
+            st.rerun(scope="fragment")
+    else:
+        st.success("✅ 已保存")
+        if status["last_saved"]:
+            st.caption(f"最近写入：{status['last_saved'].strftime('%H:%M:%S')}")
+
+with st.sidebar:
+    show_save_status()
 
 # 在代码开头添加会话状态初始化
 if 'weight_age' not in st.session_state:
@@ -12,7 +106,7 @@ if 'weight_age' not in st.session_state:
 if 'weight_date' not in st.session_state:
     st.session_state.weight_date = datetime.now().date()
 if 'weight_house' not in st.session_state:
-    st.session_state.weight_house = 1
+    st.session_state.weight_house = farm_houses[0]
 
 # 在代码开头添加日常数据的会话状态初始化
 if 'daily_age' not in st.session_state:
@@ -20,84 +114,180 @@ if 'daily_age' not in st.session_state:
 if 'daily_date' not in st.session_state:
     st.session_state.daily_date = datetime.now().date()
 if 'daily_house' not in st.session_state:
-    st.session_state.daily_house = 1
+    st.session_state.daily_house = farm_houses[0]
 
 def update_weight_age():
     """更新体重数据的日龄"""
-    sheets = load_all_sheets()
+    sheets = load_sheets(str(st.session_state.weight_house), PLACEMENT_SHEET)
     st.session_state.weight_age = calculate_age_for_date(
         st.session_state.weight_house, 
         st.session_state.weight_date, 
         sheets
     )
 
-def recalculate_stock(df, initial_stock=54000):
-    """重新计算所有记录的存栏数"""
-    if df.empty:
-        return df
-    
-    # 确保按日期排序
-    df = df.sort_values('日期').reset_index(drop=True)
-    
-    # 重新计算存栏数
-    for i in range(len(df)):
-        if i == 0:
-            # 第一条记录：初始存栏 - 死亡 - 淘汰
-            df.at[i, '存栏数'] = initial_stock - df.iloc[i]['单日死亡(只)'] - df.iloc[i]['单日淘汰(只)']
-        else:
-            # 后续记录：上一条存栏 - 当前死亡 - 当前淘汰
-            previous_stock = df.iloc[i-1]['存栏数']
-            current_death = df.iloc[i]['单日死亡(只)']
-            current_eliminate = df.iloc[i]['单日淘汰(只)']
-            df.at[i, '存栏数'] = previous_stock - current_death - current_eliminate
-    
-    return df
+@st.cache_resource(max_entries=len(farms), show_spinner=False)
+def _workbook_cache(path):
+    """鸡场工作簿的读取缓存（每个鸡场一份，所有会话共享，只读）：只保留最近读取的数据版本，
+    切换鸡场时其他鸡场的缓存仍然有效
+    """
+    return {"version": None, "sheets": None, "lock": threading.Lock()}
 
+def _load_workbook(version):
+    """读取全部数据；数据版本与缓存一致时直接复用"""
+    cache = _workbook_cache(storage.path)
+    with cache["lock"]:
+        if cache["sheets"] is None or cache["version"] != version:
+            with profiling.span("读取工作簿（缓存未命中）") as info:
+                cache["sheets"] = storage.load_all_sheets()
+                if info is not None:
+                    info.update(profiling.frame_size(cache["sheets"]))
+            cache["version"] = version
+        return cache["sheets"]
+
+@profiling.profiled("load_all_sheets", measure=profiling.result_size)
 def load_all_sheets():
     """加载所有工作表"""
-    if os.path.exists(file_path):
-        sheets = pd.read_excel(file_path, sheet_name=None)
-        # 统一处理所有工作表的日期格式
-        for sheet_name, df in sheets.items():
-            if not df.empty and '日期' in df.columns:
-                # 将日期列统一转换为日期格式（不含时间）
-                df['日期'] = pd.to_datetime(df['日期']).dt.date
-        return sheets
-    return {}
-
-def save_all_sheets(sheets_dict):
-    """保存所有工作表"""
-    with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
-        for sheet_name, df in sheets_dict.items():
-            # 保存前确保日期格式正确
-            if not df.empty and '日期' in df.columns:
-                df_copy = df.copy()
-                # 确保日期列是datetime类型以便Excel保存
-                df_copy['日期'] = pd.to_datetime(df_copy['日期'])
-                df_copy.to_excel(writer, sheet_name=sheet_name, index=False)
-            else:
-                df.to_excel(writer, sheet_name=sheet_name, index=False)
+    # 数据版本号未变化时直接复用缓存
+    version = storage.version()
+    if version is None:
+        return SheetDict()
+    sheets = _load_workbook(version)
+    # 返回浅拷贝：调用方可以替换工作表，但不能原地修改缓存中的DataFrame；
+    # 记下读取时的版本号，提交时据此判断数据是否已被其他会话修改
+    return SheetDict(sheets, version=version)
+
+@st.cache_resource(max_entries=64, show_spinner=False)
+def _load_sheets(_storage, path, sheet_names, since, version):
+    """读取指定的工作表（按工作表、起始日期和数据版本缓存，所有会话共享，只读）"""
+    with profiling.span("读取工作表（缓存未命中）") as info:
+        sheets = _storage.load_sheets(sheet_names, since)
+        if info is not None:
+            info.update(profiling.frame_size(sheets))
+    return sheets
+
+@profiling.profiled("load_sheets", measure=profiling.result_size)
+def load_sheets(*sheet_names, since=None):
+    """只加载指定的工作表；指定since时只加载该日期及之后的记录
 
-def get_recent_data(sheets, house_num, days=14):
+    按日期筛选后的数据只用于显示，不能作为save_all_sheets的数据提交，否则会丢失更早的记录。
+    """
+    version = storage.version()
+    if version is None:
+        return SheetDict()
+    if since is not None:
+        since = since_day(since)
+    sheets = _load_sheets(storage, storage.path, sheet_names, since, version)
+    return SheetDict(sheets, version=version)
+
+@profiling.profiled("save_all_sheets")
+def save_all_sheets(sheets_dict, apply):
+    """在写锁内执行apply(sheets)修改工作表并保存，返回apply的结果
+
+    数据在读取后已被其他会话修改时，apply会在最新数据上重新执行，不会覆盖别人的记录。
+    只重写被替换的工作表，追加的新行直接写到表尾。
+    """
+    def on_commit(*changes):
+        # 汇总无法增量更新时在写锁内读取提交后的数据重算，其他会话读取的汇总始终可用
+        rollups.apply_changes(*changes, load=storage.load_all_sheets)
+        feed_ledger.apply_changes(*changes, load=lambda: storage.load_sheets(
+            [str(i) for i in farm_houses] + [PURCHASE_SHEET]))
+
+    try:
+        # 提交时同时增量更新鸡场汇总和饲料库存台账
+        return commit(storage, sheets_dict, apply, on_commit=on_commit)
+    finally:
+        # 写入后立即使缓存失效，并通知后台线程写回工作簿
+        _workbook_cache(storage.path)["sheets"] = None
+        _load_sheets.clear()
+        writer.notify()
+
+def _use_index(sheets):
+    """存储支持索引查询且内存数据没有未保存的改动时，直接查询存储"""
+    return storage.indexed and not getattr(sheets, 'dirty', None)
+
+def get_recent_data(house_num, days=14):
     """获取最近指定天数的数据"""
     sheet_name = str(house_num)
-    if sheet_name not in sheets:
-        return pd.DataFrame()
-    
-    df = sheets[sheet_name]
-    if df.empty:
-        return df
-    
-    # 确保日期列是datetime类型进行比较
-    df_temp = df.copy()
-    df_temp['日期_dt'] = pd.to_datetime(df_temp['日期'])
-    
-    # 获取最近两周的数据
+    # 日期晚于截止时间，即不早于截止时间的次日零点；只读取该鸡舍这段时间的记录
     cutoff_date = datetime.now() - timedelta(days=days)
-    recent_data = df_temp[df_temp['日期_dt'] >= pd.to_datetime(cutoff_date)]
-    
-    # 返回原始数据（不含临时列）
-    return df.loc[recent_data.index].sort_values('日期', ascending=False)
+    df = load_sheets(sheet_name, since=cutoff_date).get(sheet_name)
+    # 时间范围早于当前批次时合并已归档批次中的记录
+    df = archive.history(house_num, df, start=since_day(cutoff_date))
+    if df is None:
+        return pd.DataFrame()
+    return df.sort_values('日期', ascending=False, kind='stable')
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _breed_standard(path, mtime):
+    return load_standard(path) if mtime is not None else default_standard()
+
+def breed_standard():
+    """品种标准体重表；文件修改后重新读取"""
+    try:
+        mtime = os.path.getmtime(standard_path)
+    except OSError:
+        mtime = None
+    return _breed_standard(standard_path, mtime)
+
+def sync_rollups():
+    """汇总与当前数据版本一致时直接使用，否则读取全部工作表重算"""
+    rollups.sync(storage.version(), load_all_sheets)
+
+def sync_feed_ledger():
+    """台账与当前数据版本一致时直接使用，否则读取各鸡舍工作表和采购记录重建"""
+    feed_ledger.sync(storage.version(), lambda: load_sheets(*(str(i) for i in farm_houses), PURCHASE_SHEET))
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def _farm_report(farm_keys, versions):
+    """跨场汇总（按各鸡场的配置和数据版本缓存，所有会话共享）"""
+    with profiling.span("跨场汇总（缓存未命中）"):
+        return farm_report([Farm(*key) for key in farm_keys])
+
+def consolidated_report():
+    """全部鸡场的合计指标：各鸡场在多个进程中并行读取，任一鸡场的数据变化后重新汇总"""
+    return _farm_report(tuple(f.key() for f in farms), tuple(shard_version(f) for f in farms))
+
+def export_chunks(record_type, houses, start=None, end=None):
+    """按块读取要导出的记录；日常数据包括已归档的批次
+
+    SQLite按索引分块查询；工作簿复用已缓存的工作表，逐块筛选，不生成筛选后的整表。
+    """
+    sheet_name, _ = export.RECORD_TYPES[record_type]
+    if sheet_name is not None:
+        if storage.indexed:
+            yield from storage.iter_records(sheet_name, start, end, houses)
+        else:
+            yield from iter_frame(load_sheets(sheet_name).get(sheet_name), start, end, houses)
+        return
+    for house in houses:
+        sheet_name = str(house)
+        if storage.indexed:
+            hot = storage.iter_records(sheet_name, start, end)
+        else:
+            hot = iter_frame(load_sheets(sheet_name).get(sheet_name), start, end)
+        yield from archive.iter_history(house, hot, start, end)
+
+def show_recent_stats(house_num, days):
+    """显示鸡舍最近指定天数的统计：由累计和相减得到，不扫描原始记录"""
+    sync_rollups()
+    # 与get_recent_data的范围一致：今天及之前days-1天
+    start_date = datetime.now().date() - timedelta(days=days - 1)
+    if any(partition.overlaps(start_date) for partition in archive.partitions(house_num)):
+        # 范围包含已归档的批次，按合并后的记录计算
+        recent = HouseAggregates(get_recent_data(house_num, days)).totals(start_date)
+    else:
+        recent = rollups.house_totals(house_num, start=start_date)
+    current_stock = rollups.house_totals(house_num)["存栏数"]
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        average_feed = recent["平均日耗料(kg)"]
+        st.metric("平均日耗料", f"{average_feed:.1f}kg" if average_feed is not None else "—")
+    with col2:
+        st.metric("总死亡数", int(recent["死亡(只)"]))
+    with col3:
+        st.metric("总淘汰数", int(recent["淘汰(只)"]))
+    with col4:
+        st.metric("当前存栏", int(current_stock) if current_stock is not None and pd.notna(current_stock) else 0)
 
 def calculate_age(house_num, current_date, sheets):
     """根据鸡舍历史数据计算当前日龄"""
@@ -132,116 +322,103 @@ def calculate_age(house_num, current_date, sheets):
 
 def check_duplicate_daily_record(sheets, house_num, date):
     """检查日常数据是否存在重复记录"""
+    if _use_index(sheets):
+        # 按（鸡舍编号, 日期）索引查询
+        duplicate_records = storage.find_daily_records(house_num, date)
+        if not duplicate_records.empty:
+            return True, duplicate_records
+        return False, None
+    
     sheet_name = str(house_num)
     if sheet_name in sheets and not sheets[sheet_name].empty:
         df = sheets[sheet_name]
-        input_date = pd.to_datetime(date).date()
         
-        # 检查是否有相同日期的记录
-        duplicate_records = df[df['日期'] == input_date]
-        if not duplicate_records.empty:
-            return True, duplicate_records
+        # 在日期索引中二分查找相同日期的记录
+        positions = house_index(df).positions_on(date)
+        if len(positions):
+            return True, df.iloc[positions]
     return False, None
 
-def delete_record(sheets, sheet_name, record_index):
-    """删除指定记录"""
-    if sheet_name in sheets:
-        df = sheets[sheet_name]
-        if not df.empty and 0 <= record_index < len(df):
-            # 删除记录
-            deleted_record = df.iloc[record_index].copy()
-            df = df.drop(df.index[record_index]).reset_index(drop=True)
-            sheets[sheet_name] = df
-            save_all_sheets(sheets)
+def _with_cycle_sheets(sheets, targets):
+    """把按批次重算需要的工作表一并加入快照：改动日常数据需要进雏记录，改动进雏记录需要各鸡舍工作表"""
+    needed = required_sheets(sheets, targets, farm_houses)
+    if not needed:
+        return sheets
+    extra = load_sheets(*needed)
+    if extra.version != sheets.version:
+        # 版本不一致时commit会重新读取全部工作表
+        return sheets
+    return SheetDict({**extra, **sheets}, version=sheets.version)
+
+def delete_records(sheets, targets):
+    """批量删除记录：targets为{工作表: [记录ID]}，每个鸡舍只重算一次存栏数，只保存一次"""
+    sheets = _with_cycle_sheets(sheets, targets)
+    # 其他会话已写入时核对记录的取值，同键记录的序号可能已指向别的记录
+    return save_all_sheets(sheets, lambda latest: apply_batch(latest, targets, snapshot=sheets))
+
+def update_records(sheets, targets, updated_data):
+    """批量把记录的若干列改为同一取值，每个鸡舍只重算一次存栏数，只保存一次"""
+    sheets = _with_cycle_sheets(sheets, targets)
+    return save_all_sheets(sheets, lambda latest: apply_batch(latest, targets, updated_data, snapshot=sheets))
+
+def delete_record(sheets, sheet_name, record_id):
+    """删除指定记录；日常数据删除后从该日期起重新计算存栏数"""
+    df = sheets.get(sheet_name)
+    if df is not None and not df.empty:
+        position = record_table(sheet_name, df).position(record_id)
+        if position is not None:
+            deleted_record = df.iloc[position].copy()
+            delete_records(sheets, {sheet_name: [record_id]})
             return True, deleted_record
     return False, None
 
-def update_record(sheets, sheet_name, record_index, updated_data):
-    """更新指定记录"""
-    if sheet_name in sheets:
-        df = sheets[sheet_name]
-        if not df.empty and 0 <= record_index < len(df):
-            # 更新记录
-            for column, value in updated_data.items():
-                df.at[df.index[record_index], column] = value
-            sheets[sheet_name] = df
-            save_all_sheets(sheets)
-            return True
+def update_record(sheets, sheet_name, record_id, updated_data):
+    """更新指定记录；日常数据修改后从该日期起重新计算存栏数"""
+    df = sheets.get(sheet_name)
+    if df is not None and not df.empty and record_table(sheet_name, df).position(record_id) is not None:
+        update_records(sheets, {sheet_name: [record_id]}, updated_data)
+        return True
     return False
 
-tab1, tab2, tab3, tab4 = st.tabs(["日常数据", "体重数据", "采购饲料", "数据维护"])
+tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs(["日常数据", "体重数据", "采购饲料", "数据维护", "批量导入", "鸡场看板", "数据导出"])
 
+@profiling.profiled("calculate_age_for_date",
+                    measure=lambda result, house_num, target_date, sheets: profiling.frame_size(sheets.get(str(house_num))))
 def calculate_age_for_date(house_num, target_date, sheets):
-    """根据鸡舍历史数据计算指定日期的准确日龄"""
+    """计算指定日期的日龄：有进雏记录时由进雏日期计算，否则根据鸡舍历史数据推算"""
+    return age_for_date(sheets, house_num, target_date)
+
+def get_initial_stock(house_num, sheets, date=None):
+    """获取鸡舍的初始存栏数；date属于某个批次时为该批次的进雏数量"""
+    return house_initial_stock(sheets, house_num, date)
+
+def register_placement(house_num, placement_date, count, breed):
+    """登记一次进雏，并从进雏日期起按新批次重新计算该鸡舍的日龄和存栏数"""
     sheet_name = str(house_num)
-    
-    # 如果没有该鸡舍的数据，从第1天开始
-    if sheet_name not in sheets or sheets[sheet_name].empty:
-        return 1
-    
-    df = sheets[sheet_name]
-    
-    # 确保日期列是datetime类型进行比较
-    df_temp = df.copy()
-    df_temp['日期_dt'] = pd.to_datetime(df_temp['日期'])
-    target_date_dt = pd.to_datetime(target_date)
-    
-    # 按日期排序
-    df_temp = df_temp.sort_values('日期_dt')
-    
-    # 情况1：如果目标日期早于所有记录，需要推算
-    if target_date_dt < df_temp['日期_dt'].min():
-        first_record = df_temp.iloc[0]
-        first_date = first_record['日期']
-        first_age = first_record['日龄']
-        
-        # 计算日期差（目标日期比第一条记录早多少天）
-        days_diff = (pd.to_datetime(first_date) - target_date_dt).days
-        
-        # 日龄 = 第一条记录的日龄 - 日期差
-        calculated_age = first_age - days_diff
-        
-        # 日龄不能小于1
-        return max(1, calculated_age)
-    
-    # 情况2：如果目标日期晚于所有记录，基于最后一条记录推算
-    elif target_date_dt > df_temp['日期_dt'].max():
-        last_record = df_temp.iloc[-1]
-        last_date = last_record['日期']
-        last_age = last_record['日龄']
-        
-        # 计算日期差
-        days_diff = (target_date_dt - pd.to_datetime(last_date)).days
-        
-        # 日龄 = 最后记录的日龄 + 日期差
-        return last_age + days_diff
-    
-    # 情况3：如果目标日期在已有记录范围内，找到最接近的记录
-    else:
-        # 找到目标日期之前最近的记录
-        previous_records = df_temp[df_temp['日期_dt'] <= target_date_dt]
-        if not previous_records.empty:
-            closest_record = previous_records.iloc[-1]  # 最后一条，即最接近的记录
-            closest_date = closest_record['日期']
-            closest_age = closest_record['日龄']
-            
-            # 计算日期差
-            days_diff = (target_date_dt - pd.to_datetime(closest_date)).days
-            
-            # 日龄 = 最近记录的日龄 + 日期差
-            return closest_age + days_diff
+    new_row = pd.DataFrame([{
+        "日期": placement_date,
+        "鸡舍编号": house_num,
+        "进雏数量": count,
+        "品种": breed,
+    }], columns=PLACEMENT_COLUMNS)
+
+    def insert_placement(sheets):
+        placements = sheets.get(PLACEMENT_SHEET)
+        if placements is None:
+            placements = pd.DataFrame(columns=PLACEMENT_COLUMNS)
+        if house_cycles(sheets, house_num).age(placement_date) == 1:
+            raise ConflictError(f"鸡舍{house_num}在{placement_date}已有进雏记录")
+        if not placements.empty and pd.to_datetime(placement_date) < pd.to_datetime(placements['日期']).max():
+            placements = pd.concat([placements, new_row], ignore_index=True)
+            sheets[PLACEMENT_SHEET] = placements.sort_values(
+                '日期', key=pd.to_datetime, kind='stable', ignore_index=True)
         else:
-            return 1
+            sheets.append_rows(PLACEMENT_SHEET, new_row)
+        df = sheets.get(sheet_name)
+        if df is not None and not df.empty:
+            sheets[sheet_name] = refresh_house(df, house_cycles(sheets, house_num), placement_date)
 
-def get_initial_stock(house_num, sheets):
-    """获取鸡舍的初始存栏数"""
-    sheet_name = str(house_num)
-    if sheet_name in sheets and not sheets[sheet_name].empty:
-        df = sheets[sheet_name]
-        # 返回最早记录的存栏数 + 死亡 + 淘汰（推算初始值）
-        first_record = df.sort_values('日期').iloc[0]
-        return first_record['存栏数'] + first_record['单日死亡(只)'] + first_record['单日淘汰(只)']
-    return 54000  # 默认初始存栏
+    save_all_sheets(load_sheets(PLACEMENT_SHEET, sheet_name), insert_placement)
 
 def get_record_description(record, data_type):
     """根据数据类型获取记录描述"""
@@ -255,11 +432,14 @@ def get_record_description(record, data_type):
         elif data_type == "采购记录":
             date_str = record['日期'].strftime('%Y-%m-%d') if hasattr(record['日期'], 'strftime') else str(record['日期'])
             return f"采购:{record.get('采购饲料(kg)', 'N/A')}kg {record.get('料号', 'N/A')}"
+        elif data_type == "进雏记录":
+            return f"进雏:{record.get('进雏数量', 'N/A')}只 {record.get('品种', 'N/A')}"
         return ""
     except Exception as e:
         return f"数据格式异常: {str(e)}"
 
 # 修改后的日常数据标签页
+profiling.section("标签页：日常数据")
 with tab1:
     st.subheader("日常数据录入")
     
@@ -267,7 +447,7 @@ with tab1:
     col1, col2 = st.columns(2)
     with col1:
         date = st.date_input("日期", st.session_state.daily_date, key="daily_date_input")
-        house_num = st.selectbox("鸡舍编号", range(1,17), index=st.session_state.daily_house-1, key="daily_house_select")
+        house_num = st.selectbox("鸡舍编号", farm_houses, index=farm_houses.index(st.session_state.daily_house), key="daily_house_select")
     
     with col2:
         feed = st.number_input("单日耗料(kg)", 0.0, 20000.0, 0.0, key="feed_input")
@@ -277,12 +457,23 @@ with tab1:
     # 实时更新日龄
     st.session_state.daily_date = date
     st.session_state.daily_house = house_num
-    sheets = load_all_sheets()
+    sheets = load_sheets(str(house_num), PLACEMENT_SHEET)
+    cycles = house_cycles(sheets, house_num)
     st.session_state.daily_age = calculate_age_for_date(house_num, date, sheets)
     
     # 实时显示日龄信息
     st.info(f"**自动计算日龄：{st.session_state.daily_age} 天**")
     
+    # 所属批次：日龄和存栏数都由进雏记录直接得到
+    cycle = cycles.cycle(date)
+    if cycle is not None:
+        sync_rollups()
+        cycle_stock = cycles.stock(date, lambda start, end: rollups.house_totals(house_num, start, end))
+        st.caption(
+            f"第{cycle['批次']}批 · {cycle['品种']} · {cycle['进雏日期']}进雏{cycle['进雏数量']}只 · "
+            f"截至{date}存栏{int(cycle_stock)}只"
+        )
+    
     # 显示日龄计算说明
     with st.expander("日龄计算说明"):
         st.markdown(f"""
@@ -290,12 +481,37 @@ with tab1:
         **计算出的日龄**: {st.session_state.daily_age}天
         
         **计算逻辑**:
-        - 系统会根据鸡舍{house_num}的历史数据自动推算
+        - 鸡舍{house_num}登记了进雏记录时，日龄 = 日期 - 进雏日期 + 1
+        - 没有进雏记录时，系统会根据鸡舍{house_num}的历史数据自动推算
         - 如果录入历史日期，日龄会自动向前推算
         - 如果录入未来日期，日龄会自动向后推算
         - 确保整个时间线的日龄连续性
         """)
     
+    # 进雏登记：新批次从进雏日期起日龄从1开始，存栏数从进雏数量开始计算
+    with st.expander("🐣 进雏登记", expanded="placement_message" in st.session_state):
+        if "placement_message" in st.session_state:
+            st.success(st.session_state.pop("placement_message"))
+        with st.form("placement_form"):
+            placement_col1, placement_col2 = st.columns(2)
+            with placement_col1:
+                placement_date = st.date_input("进雏日期", date, key="placement_date")
+                placement_house = st.selectbox("鸡舍编号", farm_houses, index=farm_houses.index(house_num), key="placement_house")
+            with placement_col2:
+                placement_count = st.number_input("进雏数量(只)", 1, 200000, DEFAULT_INITIAL_STOCK, key="placement_count")
+                placement_breed = st.selectbox("品种", BREEDS, key="placement_breed")
+            if st.form_submit_button("登记进雏"):
+                try:
+                    register_placement(placement_house, placement_date, placement_count, placement_breed)
+                except ConflictError as e:
+                    st.error(f"❌ 登记失败：{e}")
+                else:
+                    st.session_state.placement_message = (
+                        f"✅ 已登记鸡舍{placement_house} {placement_date}进雏{placement_count}只，"
+                        f"该日期起的日龄和存栏数已按新批次重新计算"
+                    )
+                    st.rerun()
+    
     # 检查重复记录
     is_duplicate, duplicate_data = check_duplicate_daily_record(sheets, house_num, date)
     if is_duplicate:
@@ -304,6 +520,11 @@ with tab1:
         duplicate_display = duplicate_data.copy()
         st.dataframe(duplicate_display, use_container_width=True)
         st.warning("请检查日期是否正确，或前往'数据维护'页面修改现有记录")
+    # 已归档批次中的日期：工作表中的新记录会遮蔽归档中的记录，需先恢复归档
+    archived_cycle = archive.covering(house_num, date)
+    if archived_cycle is not None:
+        st.error(f"警告：{date}属于鸡舍{house_num}已归档的批次（{archived_cycle.first}至{archived_cycle.last}）！")
+        st.warning("补录该批次的数据前，请先在'数据维护'页面恢复该鸡舍的归档")
     
     # 提交按钮
     if st.button("提交日常数据", type="primary"):
@@ -311,15 +532,12 @@ with tab1:
         is_duplicate, duplicate_data = check_duplicate_daily_record(sheets, house_num, date)
         if is_duplicate:
             st.error("无法提交：存在重复记录！请修改日期或前往数据维护页面删除重复记录")
+        elif archive.covering(house_num, date) is not None:
+            st.error("无法提交：该日期属于已归档的批次！请先在数据维护页面恢复该鸡舍的归档")
         else:
             try:
                 sheet_name = str(house_num)
                 
-                if sheet_name in sheets:
-                    df = sheets[sheet_name]
-                else:
-                    df = pd.DataFrame(columns=["日期","鸡舍编号","日龄","单日耗料(kg)","单日死亡(只)","单日淘汰(只)","存栏数"])
-                
                 # 使用实时计算的日龄
                 final_age = st.session_state.daily_age
                 
@@ -334,36 +552,63 @@ with tab1:
                     "存栏数": 0  # 先设为0，后面统一计算
                 }])
                 
-                # 将新数据添加到DataFrame
-                df = pd.concat([df, new_row], ignore_index=True)
-                
-                # 确保日期列是datetime类型以便排序
-                df['日期'] = pd.to_datetime(df['日期'])
-                
-                # 按日期（日龄）从小到大排序
-                df = df.sort_values('日期').reset_index(drop=True)
-                
-                # 重新计算所有记录的存栏数
-                initial_stock = get_initial_stock(house_num, sheets)
-                df = recalculate_stock(df, initial_stock)
+                def insert_daily(sheets):
+                    # 在写锁内基于最新数据再次检查重复记录
+                    if check_duplicate_daily_record(sheets, house_num, date)[0]:
+                        raise ConflictError("无法提交：其他用户刚刚录入了该日期的数据，请前往数据维护页面查看")
+                    if archive.covering(house_num, date) is not None:
+                        raise ConflictError("无法提交：其他用户刚刚归档了该日期所属的批次，请先恢复归档")
+                    
+                    if sheet_name in sheets:
+                        df = sheets[sheet_name]
+                    else:
+                        df = pd.DataFrame(columns=["日期","鸡舍编号","日龄","单日耗料(kg)","单日死亡(只)","单日淘汰(只)","存栏数"])
+                    
+                    # 新日期晚于所有已有记录时属于纯追加
+                    is_append = sheet_name in sheets and not df.empty and \
+                        pd.to_datetime(date) > pd.to_datetime(df['日期']).max()
+                    
+                    # 将新数据添加到DataFrame
+                    df = pd.concat([df, new_row], ignore_index=True)
+                    
+                    # 确保日期列是datetime类型以便排序
+                    df['日期'] = pd.to_datetime(df['日期'])
+                    
+                    # 按日期（日龄）从小到大排序
+                    df = df.sort_values('日期').reset_index(drop=True)
+                    
+                    # 从新记录的日期开始重新计算存栏数，之前的记录不受影响：
+                    # 属于某个批次的记录从该批次的进雏数量开始，其余从鸡舍推算的初始存栏开始
+                    # 批次在写锁内的最新数据上取一次，显示和重算共用
+                    latest_cycles = house_cycles(sheets, house_num)
+                    house_initial = get_initial_stock(house_num, sheets)
+                    record_cycle = latest_cycles.cycle(date)
+                    record_initial = house_initial if record_cycle is None else int(record_cycle["进雏数量"])
+                    df = recalculate_stock(df, house_initial, start_date=date, cycles=latest_cycles)
+                    
+                    # 保存排序后的数据
+                    if is_append:
+                        # 新记录排在最后，只追加这一行
+                        sheets.append_rows(sheet_name, df.iloc[[-1]])
+                    else:
+                        sheets[sheet_name] = df
+                    return df, record_initial
                 
-                # 保存排序后的数据
-                sheets[sheet_name] = df
-                save_all_sheets(sheets)
+                df, record_initial = save_all_sheets(sheets, insert_daily)
                 st.success("日常数据保存成功！数据已按日期排序。")
                 
                 # 显示数据变化信息
                 st.info(f"数据更新说明：")
                 st.markdown(f"""
                 - **新增记录**: {date}，日龄{final_age}天
-                - **重新计算**: 所有记录的存栏数已更新
+                - **重新计算**: {date}及之后记录的存栏数已更新
                 - **时间顺序**: 数据已按日期重新排序
-                - **初始存栏**: 推算为{initial_stock}只
+                - **初始存栏**: {record_initial}只
                 """)
                 
                 # 显示最近数据
                 st.subheader(f"鸡舍{house_num}最近数据")
-                recent_data = get_recent_data(sheets, house_num, days=30)  # 显示30天数据
+                recent_data = get_recent_data(house_num, days=30)  # 显示30天数据
                 if not recent_data.empty:
                     # 格式化日期显示 - 确保只显示年月日
                     recent_data_display = recent_data.copy()
@@ -373,22 +618,14 @@ with tab1:
                     st.dataframe(recent_data_display, use_container_width=True)
                     
                     # 显示统计信息
-                    col1, col2, col3, col4 = st.columns(4)
-                    with col1:
-                        st.metric("平均日耗料", f"{recent_data['单日耗料(kg)'].mean():.1f}kg")
-                    with col2:
-                        st.metric("总死亡数", int(recent_data['单日死亡(只)'].sum()))
-                    with col3:
-                        st.metric("总淘汰数", int(recent_data['单日淘汰(只)'].sum()))
-                    with col4:
-                        current_stock = df.iloc[-1]["存栏数"] if not df.empty else 0
-                        st.metric("当前存栏", int(current_stock))
+                    show_recent_stats(house_num, 30)
                 else:
                     st.info("暂无历史数据")
                     
             except Exception as e:
                 st.error(f"保存失败: {e}")
 
+profiling.section("标签页：体重数据")
 with tab2:
     st.subheader("体重数据录入")
     
@@ -396,13 +633,13 @@ with tab2:
     col1, col2 = st.columns(2)
     with col1:
         date = st.date_input("称重日期", st.session_state.weight_date, key="weight_date_input")
-        house_num = st.selectbox("称重鸡舍", range(1,17), index=st.session_state.weight_house-1, key="weight_house_select")
+        house_num = st.selectbox("称重鸡舍", farm_houses, index=farm_houses.index(st.session_state.weight_house), key="weight_house_select")
         cage_num = st.number_input("鸡笼编号", 1, 100, 15, key="cage_num")
     
     # 实时更新日龄
     st.session_state.weight_date = date
     st.session_state.weight_house = house_num
-    sheets = load_all_sheets()
+    sheets = load_sheets(str(house_num), PLACEMENT_SHEET)
     st.session_state.weight_age = calculate_age_for_date(house_num, date, sheets)
     
     with col2:
@@ -461,17 +698,12 @@ with tab2:
     # 提交按钮
     if st.button("提交四层体重数据", type="primary"):
         try:
-            sheets = load_all_sheets()
             sheet_name = "称重数据"
+            sheets = load_sheets(sheet_name)
             
             # 使用实时计算的日龄
             final_age_weight = st.session_state.weight_age
             
-            if sheet_name in sheets:
-                df = sheets[sheet_name]
-            else:
-                df = pd.DataFrame(columns=["日期","鸡舍编号","鸡笼编号","层数","样本数量","总重量(kg)","均重(g)","日龄"])
-            
             new_rows = []
             layers_data = [
                 ("1层", layer1_count, layer1_weight),
@@ -495,16 +727,28 @@ with tab2:
                     })
             
             if new_rows:
-                df = pd.concat([df, pd.DataFrame(new_rows)], ignore_index=True)
-                
-                # 确保日期列是datetime类型以便排序
-                df['日期'] = pd.to_datetime(df['日期'])
-                
-                # 按日期排序
-                df = df.sort_values('日期').reset_index(drop=True)
+                def insert_weights(sheets):
+                    if sheet_name in sheets:
+                        df = sheets[sheet_name]
+                    else:
+                        df = pd.DataFrame(columns=["日期","鸡舍编号","鸡笼编号","层数","样本数量","总重量(kg)","均重(g)","日龄"])
+                    
+                    if sheet_name in sheets and not df.empty and \
+                            pd.to_datetime(date) >= pd.to_datetime(df['日期']).max():
+                        # 称重日期不早于已有记录，排序不变，直接追加
+                        sheets.append_rows(sheet_name, pd.DataFrame(new_rows))
+                    else:
+                        df = pd.concat([df, pd.DataFrame(new_rows)], ignore_index=True)
+                        
+                        # 确保日期列是datetime类型以便排序
+                        df['日期'] = pd.to_datetime(df['日期'])
+                        
+                        # 按日期排序
+                        df = df.sort_values('日期').reset_index(drop=True)
+                        
+                        sheets[sheet_name] = df
                 
-                sheets[sheet_name] = df
-                save_all_sheets(sheets)
+                save_all_sheets(sheets, insert_weights)
                 
                 st.success("✅ 四层体重数据保存成功！")
                 
@@ -517,10 +761,11 @@ with tab2:
         except Exception as e:
             st.error(f"保存失败: {e}")
 
+profiling.section("标签页：采购饲料")
 with tab3:
     with st.form("purchase_form"):
         date = st.date_input("采购日期", datetime.now(), key="purchase_date")
-        house_num = st.selectbox("采购鸡舍", range(1,17), key="purchase_house")
+        house_num = st.selectbox("采购鸡舍", farm_houses, key="purchase_house")
         feed_amount = st.number_input("采购饲料(kg)", 0, 50000, 0)
         feed_type = st.selectbox("料号", ["510", "510DC", "511", "513"])
         
@@ -528,13 +773,8 @@ with tab3:
         
         if submitted:
             try:
-                sheets = load_all_sheets()
                 sheet_name = "采购饲料记录"
-                
-                if sheet_name in sheets:
-                    df = sheets[sheet_name]
-                else:
-                    df = pd.DataFrame(columns=["日期", "鸡舍编号", "采购饲料(kg)", "料号"])
+                sheets = load_sheets(sheet_name)
                 
                 new_row = pd.DataFrame([{
                     "日期": date,  # 直接使用date对象，不含时间
@@ -543,15 +783,16 @@ with tab3:
                     "料号": feed_type
                 }])
                 
-                df = pd.concat([df, new_row], ignore_index=True)
-                sheets[sheet_name] = df
-                save_all_sheets(sheets)
+                # 采购记录不排序，直接追加到表尾
+                save_all_sheets(sheets, lambda latest: latest.append_rows(sheet_name, new_row))
                 st.success(f"采购记录保存成功！鸡舍{house_num}采购{feed_amount}kg {feed_type}饲料")
                 
                 # 显示最近采购记录
                 st.subheader(f"鸡舍{house_num}最近采购记录")
-                if sheet_name in sheets:
-                    purchase_df = sheets[sheet_name]
+                # 只读取最近两周的采购记录
+                recent_sheets = load_sheets(sheet_name, since=datetime.now() - timedelta(days=14))
+                if sheet_name in recent_sheets:
+                    purchase_df = recent_sheets[sheet_name]
                     # 确保日期列是datetime类型进行比较
                     purchase_df_temp = purchase_df.copy()
                     purchase_df_temp['日期_dt'] = pd.to_datetime(purchase_df_temp['日期'])
@@ -577,29 +818,59 @@ with tab3:
                 
             except Exception as e:
                 st.error(f"保存失败: {e}")
+    
+    # 饲料库存：采购减去耗料（耗料按当天或之前最近一次采购的料号计入），任意日期为前缀快照查询
+    st.markdown("#### 📦 饲料库存")
+    sync_feed_ledger()
+    stock_col1, stock_col2 = st.columns(2)
+    with stock_col1:
+        stock_date = st.date_input("库存日期", datetime.now().date(), key="feed_stock_date")
+    with stock_col2:
+        warn_days = st.number_input("预计几天内用完时提醒", 1, 30, 3, key="feed_warn_days")
+    feed_table = feed_ledger.table(stock_date, warn_days=warn_days)
+    for house, row in feed_table[feed_table["需要补料"]].iterrows():
+        days_left = row["预计可用天数"]
+        st.warning(
+            f"鸡舍{house}库存{row['库存合计(kg)']:,.0f}kg，"
+            + (f"按近7天耗料约{days_left:.1f}天后用完，请及时采购" if days_left > 0 else "已经用完，请及时采购")
+        )
+    feed_columns = [c for c in feed_table.columns if c not in ("当前料号", "需要补料", "预计可用天数")]
+    st.dataframe(
+        feed_table.style.format({**{c: "{:,.0f}" for c in feed_columns}, "预计可用天数": "{:.1f}"}, na_rep="—"),
+        use_container_width=True
+    )
+    st.caption("日常耗料没有记录料号，按当天或之前最近一次采购的料号计入；换料后旧料号的剩余仍显示在旧料号下")
+    
+    feed_house = st.selectbox("库存变化", farm_houses, format_func=lambda x: f"鸡舍{x}", key="feed_history_house")
+    feed_events = feed_ledger.house(feed_house).events()
+    if not feed_events.empty:
+        st.line_chart(feed_events.drop_duplicates("日期", keep="last").set_index("日期")["库存合计(kg)"])
 
 # 修复后的数据维护标签页
+profiling.section("标签页：数据维护")
 with tab4:
     st.subheader("📊 数据维护中心")
     
     # 选择数据类型
     data_type = st.selectbox(
         "选择数据类型",
-        ["日常数据", "体重数据", "采购记录"],
+        ["日常数据", "体重数据", "采购记录", "进雏记录"],
         key="data_type_select"
     )
     
-    sheets = load_all_sheets()
-    
+
     if data_type == "日常数据":
-        sheet_names = [str(i) for i in range(1, 17)]
-        sheet_display_names = [f"鸡舍{i}" for i in range(1, 17)]
+        sheet_names = [str(i) for i in farm_houses]
+        sheet_display_names = [f"鸡舍{i}" for i in farm_houses]
     elif data_type == "体重数据":
         sheet_names = ["称重数据"]
         sheet_display_names = ["称重数据"]
     elif data_type == "采购记录":
         sheet_names = ["采购饲料记录"]
         sheet_display_names = ["采购饲料记录"]
+    elif data_type == "进雏记录":
+        sheet_names = [PLACEMENT_SHEET]
+        sheet_display_names = [PLACEMENT_SHEET]
     
     if sheet_names:
         selected_sheet = st.selectbox(
@@ -609,76 +880,103 @@ with tab4:
             key="sheet_select"
         )
         
+        # 只读取选中的工作表
+        sheets = load_sheets(selected_sheet)
         if selected_sheet in sheets and not sheets[selected_sheet].empty:
             df = sheets[selected_sheet]
+            table = record_table(selected_sheet, df)
+            
+            st.subheader(f"{sheet_display_names[sheet_names.index(selected_sheet)]} 数据记录")
             
-            # 确保日期列只显示年月日
-            df_display = df.copy()
+            # 筛选条件：日期范围，以及称重、采购记录的鸡舍
+            first_date, last_date = table.date_range()
+            filter_col1, filter_col2, filter_col3 = st.columns([2, 1, 1])
+            with filter_col1:
+                date_range = st.date_input(
+                    "日期范围",
+                    value=(first_date, last_date) if first_date is not None else (),
+                    key=f"browse_range_{selected_sheet}"
+                )
+            with filter_col2:
+                if is_house_sheet(selected_sheet):
+                    house_filter = None
+                else:
+                    house_filter = st.selectbox(
+                        "鸡舍",
+                        [None] + farm_houses,
+                        format_func=lambda x: "全部" if x is None else f"鸡舍{x}",
+                        key=f"browse_house_{selected_sheet}"
+                    )
+            with filter_col3:
+                page_size = st.selectbox("每页条数", [20, 50, 100], index=1, key="browse_page_size")
+            
+            # 只选了开始日期时不限制结束日期
+            start_date = date_range[0] if len(date_range) > 0 else None
+            end_date = date_range[1] if len(date_range) > 1 else None
+            positions = table.select(start_date, end_date, house_filter)
+            total_pages = page_count(len(positions), page_size)
+            page = st.number_input("页码", min_value=1, max_value=total_pages, value=1, key=f"browse_page_{selected_sheet}")
+            page = min(int(page), total_pages)
+            visible = page_positions(positions, page, page_size)
+            st.caption(f"共 {len(positions)} 条记录，第 {page}/{total_pages} 页（最新的记录在前）")
+            
+            # 只格式化当前页，日期只显示年月日
+            df_display = df.iloc[visible].copy()
             if '日期' in df_display.columns:
                 df_display['日期'] = df_display['日期'].apply(
                     lambda x: x.strftime('%Y-%m-%d') if hasattr(x, 'strftime') else str(x)
                 )
             
-            st.subheader(f"{sheet_display_names[sheet_names.index(selected_sheet)]} 数据记录")
-            
             # 显示数据表格
             st.dataframe(df_display, use_container_width=True)
             
+            # 当前页的记录选项：记录ID -> 显示名称
+            record_labels = {}
+            for record_id, (_, record) in zip(table.ids[visible], df_display.iterrows()):
+                try:
+                    description = get_record_description(record, data_type)
+                    record_labels[record_id] = f"{record['日期']} - {description}"
+                except Exception as e:
+                    record_labels[record_id] = f"{record_id}: 数据异常"
+            
             # 记录操作区域
             st.markdown("---")
             col1, col2 = st.columns(2)
             
             with col1:
                 st.subheader("🗑️ 删除记录")
-                if len(df) > 0:
-                    # 创建选项列表
-                    options = list(range(len(df)))
-                    option_labels = []
-                    for i in options:
-                        try:
-                            record = df_display.iloc[i]
-                            date_str = record['日期'] if '日期' in record else '未知日期'
-                            description = get_record_description(record, data_type)
-                            option_labels.append(f"记录{i+1}: {date_str} - {description}")
-                        except Exception as e:
-                            option_labels.append(f"记录{i+1}: 数据异常")
-                    
+                if record_labels:
                     record_to_delete = st.selectbox(
                         "选择要删除的记录",
-                        options,
+                        list(record_labels),
                         key="delete_record_select",
-                        format_func=lambda x: option_labels[x]
+                        format_func=record_labels.get
                     )
                     
                     if st.button("删除选中记录", type="secondary", key="delete_btn"):
-                        success, deleted_record = delete_record(sheets, selected_sheet, record_to_delete)
+                        error_message = "❌ 删除失败"
+                        try:
+                            success, deleted_record = delete_record(sheets, selected_sheet, record_to_delete)
+                        except ConflictError as e:
+                            success, deleted_record = False, None
+                            error_message = f"❌ 删除失败：{e}"
                         if success:
                             deleted_date = deleted_record['日期'].strftime('%Y-%m-%d') if hasattr(deleted_record['日期'], 'strftime') else str(deleted_record['日期'])
                             st.success(f"✅ 记录删除成功！删除的记录：{deleted_date}")
                             st.rerun()
                         else:
-                            st.error("❌ 删除失败")
+                            st.error(error_message)
+                else:
+                    st.info("当前筛选条件下没有记录")
             
             with col2:
                 st.subheader("✏️ 修改记录")
-                if len(df) > 0:
-                    # 创建选项列表
-                    options = list(range(len(df)))
-                    option_labels = []
-                    for i in options:
-                        try:
-                            record = df_display.iloc[i]
-                            date_str = record['日期'] if '日期' in record else '未知日期'
-                            description = get_record_description(record, data_type)
-                            option_labels.append(f"记录{i+1}: {date_str} - {description}")
-                        except Exception as e:
-                            option_labels.append(f"记录{i+1}: 数据异常")
-                    
+                if record_labels:
                     record_to_edit = st.selectbox(
                         "选择要修改的记录",
-                        options,
+                        list(record_labels),
                         key="edit_record_select",
-                        format_func=lambda x: option_labels[x]
+                        format_func=record_labels.get
                     )
                     
                     if st.button("修改选中记录", type="primary", key="edit_btn"):
@@ -687,16 +985,112 @@ with tab4:
                         st.session_state.editing_data_type = data_type
                         st.rerun()
             
+            # 批量操作：所有改动在内存中完成，每个鸡舍只重算一次存栏数，只保存一次
+            with st.expander("🧹 批量操作", expanded="batch_message" in st.session_state):
+                # 上次批量操作的结果（操作后已刷新页面）
+                if "batch_message" in st.session_state:
+                    st.success(st.session_state.pop("batch_message"))
+                batch_mode = st.radio("选择记录", ["勾选当前页记录", "按鸡舍和日期范围"], horizontal=True, key="batch_mode")
+                batch_targets = {}
+                batch_sheets = sheets
+                if batch_mode == "勾选当前页记录":
+                    batch_ids = st.multiselect(
+                        "选择记录",
+                        list(record_labels),
+                        format_func=record_labels.get,
+                        key=f"batch_records_{selected_sheet}"
+                    )
+                    if batch_ids:
+                        batch_targets[selected_sheet] = batch_ids
+                else:
+                    batch_col1, batch_col2 = st.columns(2)
+                    with batch_col1:
+                        default_houses = [int(selected_sheet)] if is_house_sheet(selected_sheet) else []
+                        batch_houses = st.multiselect("鸡舍", farm_houses, default=default_houses,
+                                                      format_func=lambda x: f"鸡舍{x}", key="batch_houses")
+                    with batch_col2:
+                        batch_range = st.date_input("日期范围", value=(), key="batch_range")
+                    # 必须选定完整的日期范围，避免误删整个鸡舍的记录
+                    if batch_houses and len(batch_range) == 2:
+                        if data_type == "日常数据":
+                            candidates = [(str(h), None) for h in batch_houses]
+                        else:
+                            candidates = [(selected_sheet, h) for h in batch_houses]
+                        # 只读取涉及的工作表
+                        batch_sheets = load_sheets(*dict.fromkeys(name for name, _ in candidates))
+                        for batch_sheet, batch_house in candidates:
+                            batch_df = batch_sheets.get(batch_sheet)
+                            if batch_df is None or batch_df.empty:
+                                continue
+                            batch_table = record_table(batch_sheet, batch_df)
+                            matched = batch_table.ids[batch_table.select(batch_range[0], batch_range[1], batch_house)]
+                            if len(matched):
+                                batch_targets.setdefault(batch_sheet, []).extend(matched)
+                
+                batch_count = sum(len(ids) for ids in batch_targets.values())
+                st.caption(f"已选择 {batch_count} 条记录，涉及 {len(batch_targets)} 个工作表")
+                
+                batch_action = st.radio("操作", ["删除", "修改"], horizontal=True, key="batch_action")
+                batch_updates = None
+                if batch_action == "修改":
+                    editable_columns = {
+                        "日常数据": ["单日耗料(kg)", "单日死亡(只)", "单日淘汰(只)"],
+                        "体重数据": ["样本数量", "总重量(kg)", "均重(g)"],
+                        "采购记录": ["采购饲料(kg)", "料号"],
+                        "进雏记录": ["进雏数量", "品种"],
+                    }[data_type]
+                    batch_col1, batch_col2 = st.columns(2)
+                    with batch_col1:
+                        batch_column = st.selectbox("修改的列", editable_columns, key="batch_column")
+                    with batch_col2:
+                        if batch_column == "料号":
+                            batch_value = st.selectbox("新的值", ["510", "510DC", "511", "513"], key="batch_value_feed_type")
+                        elif batch_column == "品种":
+                            batch_value = st.selectbox("新的值", BREEDS, key="batch_value_breed")
+                        elif batch_column in ["单日耗料(kg)", "总重量(kg)", "均重(g)"]:
+                            batch_value = st.number_input("新的值", min_value=0.0, value=0.0, key="batch_value_float")
+                        else:
+                            batch_value = st.number_input("新的值", min_value=0, value=0, key="batch_value_int")
+                    batch_updates = {batch_column: batch_value}
+                
+                if st.button(f"批量{batch_action}选中记录", key="batch_btn", disabled=batch_count == 0):
+                    error_message = f"❌ 批量{batch_action}失败"
+                    try:
+                        if batch_updates is None:
+                            done = delete_records(batch_sheets, batch_targets)
+                        else:
+                            done = update_records(batch_sheets, batch_targets, batch_updates)
+                    except ConflictError as e:
+                        done = 0
+                        error_message = f"❌ 批量{batch_action}失败：{e}"
+                    if done:
+                        batch_message = f"✅ 已批量{batch_action} {done} 条记录"
+                        if data_type == "日常数据":
+                            batch_message += "，存栏数已重新计算"
+                        st.session_state.batch_message = batch_message
+                        st.rerun()
+                    else:
+                        st.error(error_message)
+            
+            # 正在修改的记录已被删除（或关键列已被修改）时退出修改
+            if ('editing_record' in st.session_state and st.session_state.editing_sheet == selected_sheet
+                    and table.position(st.session_state.editing_record) is None):
+                st.warning("正在修改的记录已不存在，请重新选择")
+                del st.session_state.editing_record
+                del st.session_state.editing_sheet
+                del st.session_state.editing_data_type
+            
             # 修改记录表单
             if 'editing_record' in st.session_state and st.session_state.editing_sheet == selected_sheet:
                 st.markdown("---")
                 st.subheader("📝 修改记录详情")
                 
-                record_index = st.session_state.editing_record
-                selected_record = df.iloc[record_index]
+                editing_id = st.session_state.editing_record
+                selected_record = df.iloc[table.position(editing_id)]
                 
                 with st.form("edit_record_form"):
-                    st.write(f"**正在修改：** {df_display.iloc[record_index]['日期']} 的记录")
+                    editing_date = selected_record['日期'].strftime('%Y-%m-%d') if hasattr(selected_record['日期'], 'strftime') else str(selected_record['日期'])
+                    st.write(f"**正在修改：** {editing_date} 的记录")
                     
                     # 根据数据类型显示不同的编辑字段
                     if data_type == "日常数据":
@@ -705,7 +1099,7 @@ with tab4:
                             # 日期显示为字符串，不可编辑
                             display_date = selected_record['日期'].strftime('%Y-%m-%d') if hasattr(selected_record['日期'], 'strftime') else str(selected_record['日期'])
                             st.text_input("日期", value=display_date, disabled=True)
-                            house_edit = st.number_input("鸡舍编号", value=int(selected_record['鸡舍编号']), min_value=1, max_value=16, disabled=True)
+                            house_edit = st.number_input("鸡舍编号", value=int(selected_record['鸡舍编号']), min_value=min(farm_houses), max_value=max(farm_houses), disabled=True)
                             age_edit = st.number_input("日龄", value=int(selected_record['日龄']), min_value=1, max_value=100)
                         
                         with col2:
@@ -726,7 +1120,7 @@ with tab4:
                         with col1:
                             display_date = selected_record['日期'].strftime('%Y-%m-%d') if hasattr(selected_record['日期'], 'strftime') else str(selected_record['日期'])
                             st.text_input("日期", value=display_date, disabled=True)
-                            house_edit = st.number_input("鸡舍编号", value=int(selected_record['鸡舍编号']), min_value=1, max_value=16, disabled=True)
+                            house_edit = st.number_input("鸡舍编号", value=int(selected_record['鸡舍编号']), min_value=min(farm_houses), max_value=max(farm_houses), disabled=True)
                             cage_edit = st.number_input("鸡笼编号", value=int(selected_record['鸡笼编号']), min_value=1, max_value=100)
                             age_edit = st.number_input("日龄", value=int(selected_record['日龄']), min_value=1, max_value=100)
                         
@@ -752,7 +1146,7 @@ with tab4:
                         with col1:
                             display_date = selected_record['日期'].strftime('%Y-%m-%d') if hasattr(selected_record['日期'], 'strftime') else str(selected_record['日期'])
                             st.text_input("日期", value=display_date, disabled=True)
-                            house_edit = st.number_input("鸡舍编号", value=int(selected_record['鸡舍编号']), min_value=1, max_value=16, disabled=True)
+                            house_edit = st.number_input("鸡舍编号", value=int(selected_record['鸡舍编号']), min_value=min(farm_houses), max_value=max(farm_houses), disabled=True)
                         
                         with col2:
                             feed_amount_edit = st.number_input("采购饲料(kg)", value=int(selected_record['采购饲料(kg)']), min_value=0, max_value=50000)
@@ -765,22 +1159,37 @@ with tab4:
                                 '料号': feed_type_edit
                             }
                     
+                    elif data_type == "进雏记录":
+                        col1, col2 = st.columns(2)
+                        with col1:
+                            display_date = selected_record['日期'].strftime('%Y-%m-%d') if hasattr(selected_record['日期'], 'strftime') else str(selected_record['日期'])
+                            st.text_input("日期", value=display_date, disabled=True)
+                            house_edit = st.number_input("鸡舍编号", value=int(selected_record['鸡舍编号']), min_value=min(farm_houses), max_value=max(farm_houses), disabled=True)
+                        
+                        with col2:
+                            placement_count_edit = st.number_input("进雏数量", value=int(selected_record['进雏数量']), min_value=1, max_value=200000)
+                            placement_breed_edit = st.selectbox("品种", BREEDS,
+                                                                index=BREEDS.index(selected_record['品种']) if selected_record['品种'] in BREEDS else 0)
+                        
+                        if st.form_submit_button("保存修改"):
+                            updated_data = {
+                                '进雏数量': placement_count_edit,
+                                '品种': placement_breed_edit
+                            }
+                    
                     # 保存修改
                     if 'updated_data' in locals():
-                        success = update_record(sheets, selected_sheet, record_index, updated_data)
+                        error_message = "❌ 修改失败"
+                        try:
+                            success = update_record(sheets, selected_sheet, editing_id, updated_data)
+                        except ConflictError as e:
+                            success = False
+                            error_message = f"❌ 修改失败：{e}"
                         if success:
                             st.success("✅ 记录修改成功！")
-                            # 如果是日常数据，重新计算存栏数
-                            if data_type == "日常数据":
-                                house_num = int(selected_record['鸡舍编号'])
-                                sheet_name = str(house_num)
-                                if sheet_name in sheets:
-                                    df_house = sheets[sheet_name]
-                                    initial_stock = get_initial_stock(house_num, sheets)
-                                    df_house = recalculate_stock(df_house, initial_stock)
-                                    sheets[sheet_name] = df_house
-                                    save_all_sheets(sheets)
-                                    st.info("🔄 存栏数已重新计算")
+                            # 日常数据的存栏数已在保存时一并重新计算
+                            if data_type in ["日常数据", "进雏记录"]:
+                                st.info("🔄 存栏数已重新计算")
                             
                             # 清除编辑状态
                             if 'editing_record' in st.session_state:
@@ -789,7 +1198,7 @@ with tab4:
                                 del st.session_state.editing_data_type
                             st.rerun()
                         else:
-                            st.error("❌ 修改失败")
+                            st.error(error_message)
                     
                     # 取消修改按钮
                     if st.form_submit_button("取消修改"):
@@ -801,20 +1210,303 @@ with tab4:
         
         else:
             st.info(f"📭 {sheet_display_names[sheet_names.index(selected_sheet)]} 暂无数据记录")
+        
+        # 批次归档：工作表只保留当前批次，已结束的批次存入归档，查看时按需读取
+        if data_type == "日常数据":
+            with st.expander("🗄️ 批次归档", expanded="archive_message" in st.session_state):
+                if "archive_message" in st.session_state:
+                    st.success(st.session_state.pop("archive_message"))
+                
+                # 批次边界以进雏记录为准
+                closed = archive.closed_cycles(load_sheets(selected_sheet, PLACEMENT_SHEET))
+                if closed:
+                    cycles = closed[selected_sheet]
+                    st.info(f"鸡舍{selected_sheet}的工作表中有 {len(cycles)} 个已结束的批次，共 {cycles[-1][1]} 条记录")
+                else:
+                    st.caption(f"鸡舍{selected_sheet}的工作表中只有当前批次")
+                if st.button("归档所有鸡舍已结束的批次", key="archive_btn"):
+                    house_sheets = [str(i) for i in farm_houses]
+                    try:
+                        archived = save_all_sheets(load_sheets(*house_sheets, PLACEMENT_SHEET),
+                                                   lambda latest: archive.archive_closed_cycles(latest, house_sheets))
+                    except Exception as e:
+                        st.error(f"归档失败: {e}")
+                    else:
+                        st.session_state.archive_message = (
+                            f"✅ 已归档 {sum(archived.values())} 条记录，涉及 {len(archived)} 个鸡舍" if archived
+                            else "没有需要归档的批次")
+                        st.rerun()
+                
+                partitions = archive.partitions(selected_sheet)
+                if partitions:
+                    st.markdown("**已归档的批次**")
+                    partition_index = st.selectbox(
+                        "选择批次查看记录",
+                        range(len(partitions)),
+                        index=None,
+                        format_func=lambda i: f"{partitions[i].first} 至 {partitions[i].last}",
+                        key=f"archive_partition_{selected_sheet}"
+                    )
+                    if partition_index is not None:
+                        # 只读取选中的批次
+                        archived_display = partitions[partition_index].load()
+                        archived_display['日期'] = archived_display['日期'].apply(
+                            lambda x: x.strftime('%Y-%m-%d') if hasattr(x, 'strftime') else str(x)
+                        )
+                        st.dataframe(archived_display, use_container_width=True)
+                    if st.button("恢复到工作表", key="restore_archive_btn",
+                                 help="把该鸡舍已归档的批次合并回工作表，以便修改其中的记录"):
+                        try:
+                            restored = save_all_sheets(sheets, lambda latest: archive.restore(latest, int(selected_sheet)))
+                        except Exception as e:
+                            st.error(f"恢复失败: {e}")
+                        else:
+                            # 工作表保存成功后再删除归档文件
+                            archive.remove(restored)
+                            st.session_state.archive_message = f"✅ 已把 {len(restored)} 个批次恢复到鸡舍{selected_sheet}的工作表"
+                            st.rerun()
+    
+    # 使用数据库存储时，可按原有布局导出为Excel工作簿
+    if storage_backend != "excel":
+        st.markdown("---")
+        if st.button("导出为Excel工作簿", key="export_excel_btn"):
+            storage.export_excel(file_path)
+            st.success(f"✅ 已导出到 {file_path}")
+
+# 批量导入：一次校验、一次保存
+profiling.section("标签页：批量导入")
+with tab5:
+    st.subheader("📥 批量导入")
+    import_type = st.selectbox("记录类型", bulk_import.RECORD_TYPES, key="import_type_select")
+    st.download_button(
+        "下载导入模板",
+        bulk_import.template(import_type),
+        file_name=f"{import_type}导入模板.csv",
+        mime="text/csv",
+        key="import_template_btn"
+    )
+    st.caption("日龄可留空，系统会按鸡舍已有记录自动推算；体重数据的均重由总重量和样本数量计算")
+    
+    uploaded = st.file_uploader("上传CSV或Excel文件", type=["csv", "xlsx"], key="import_file")
+    if uploaded is not None:
+        sheets = load_all_sheets()
+        try:
+            upload = bulk_import.read_upload(uploaded.getvalue(), uploaded.name)
+            result = bulk_import.validate(import_type, upload, sheets, farm_houses, archive)
+        except ValueError as e:
+            st.error(f"文件无法导入：{e}")
+        else:
+            st.info(f"共 {len(upload)} 行：{len(result.rows)} 行可以导入，{len(result.errors)} 行有问题")
+            if not result.errors.empty:
+                st.write("有问题的行（不会导入）：")
+                st.dataframe(result.errors, use_container_width=True, hide_index=True)
+            if not result.rows.empty:
+                st.write("待导入记录预览：")
+                st.dataframe(result.rows.head(100), use_container_width=True)
+                
+                if st.button(f"确认导入 {len(result.rows)} 条记录", type="primary", key="import_btn"):
+                    def apply_upload(latest):
+                        # 在最新数据上重新校验，期间有人录入了相同记录时不导入
+                        latest_result = bulk_import.validate(import_type, upload, latest, farm_houses, archive)
+                        if len(latest_result.rows) != len(result.rows):
+                            raise ConflictError("校验后其他用户录入了相同的记录或归档了批次，请重新上传文件")
+                        return bulk_import.apply_import(latest, latest_result)
+                    
+                    try:
+                        changed = save_all_sheets(sheets, apply_upload)
+                        st.success(f"✅ 已导入 {len(result.rows)} 条记录，涉及 {len(changed)} 个工作表")
+                    except Exception as e:
+                        st.error(f"导入失败: {e}")
+
+# 数据导出：逐块读取、逐块写入临时文件，再提供下载
+EXPORT_PREFIX = "chicken-export-"
+
+@st.cache_resource(show_spinner=False)
+def _sweep_exports():
+    """启动时删除之前进程异常退出遗留的导出临时文件（一小时以上未修改，不影响正在写入的导出）"""
+    cutoff = time.time() - 3600
+    for path in glob.glob(os.path.join(tempfile.gettempdir(), EXPORT_PREFIX + "*")):
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+_sweep_exports()
+profiling.section("标签页：数据导出")
+with tab7:
+    st.subheader("📤 数据导出")
+    export_col1, export_col2 = st.columns(2)
+    with export_col1:
+        export_type = st.selectbox("记录类型", list(export.RECORD_TYPES), key="export_type")
+        export_houses = st.multiselect("鸡舍", farm_houses, default=farm_houses,
+                                       format_func=lambda x: f"鸡舍{x}", key="export_houses")
+    with export_col2:
+        export_range = st.date_input("日期范围（不选为全部日期）", value=(), key="export_range")
+        export_format = st.radio("文件格式", list(export.FORMATS), horizontal=True, key="export_format")
+    
+    if st.button("生成导出文件", key="export_btn", disabled=not export_houses):
+        export_start = export_range[0] if len(export_range) > 0 else None
+        export_end = export_range[1] if len(export_range) > 1 else None
+        extension, mime = export.FORMATS[export_format]
+        # 同一会话只保留最近一次导出的文件
+        st.session_state.pop("export_file", None)
+        fd, export_path = tempfile.mkstemp(prefix=EXPORT_PREFIX, suffix=extension)
+        os.close(fd)
+        try:
+            with profiling.span("导出") as info:
+                export_rows = export.export_records(
+                    export_chunks(export_type, sorted(export_houses), export_start, export_end),
+                    export_path, export_format, export.RECORD_TYPES[export_type][1], title=export_type)
+                if info is not None:
+                    info["rows"] = export_rows
+            # 下载按钮本身就要读入完整的文件内容：读入后立即删除临时文件
+            with open(export_path, "rb") as f:
+                export_data = f.read()
+        except Exception as e:
+            st.error(f"导出失败: {e}")
+        else:
+            period = "" if export_start is None else f"_{export_start}_{export_end or datetime.now().date()}"
+            prefix = f"{farm.name}_" if len(farms) > 1 else ""
+            st.session_state.export_file = {
+                "data": export_data,
+                "name": f"{prefix}{export_type}{period}{extension}",
+                "mime": mime,
+                "rows": export_rows,
+            }
+        finally:
+            if os.path.exists(export_path):
+                os.remove(export_path)
+    
+    export_file = st.session_state.get("export_file")
+    if export_file is not None:
+        st.success(f"已生成 {export_file['name']}：共 {export_file['rows']} 条记录，"
+                   f"{len(export_file['data']) / 1024:,.0f} KB")
+        st.download_button("下载导出文件", export_file["data"], file_name=export_file["name"],
+                           mime=export_file["mime"], key="export_download")
+
+# 鸡场看板：读取共享的汇总表，数据未变化时不重新扫描工作表
+profiling.section("标签页：鸡场看板")
+with tab6:
+    st.subheader("📈 鸡场看板")
+    sync_rollups()
+    totals = rollups.totals()
+    
+    def show_value(value, fmt):
+        return fmt.format(value) if value is not None and pd.notna(value) else "—"
+    
+    metric_col1, metric_col2, metric_col3, metric_col4 = st.columns(4)
+    with metric_col1:
+        st.metric("全场存栏", f"{totals['存栏数']:,}")
+    with metric_col2:
+        st.metric("死亡率", show_value(totals['死亡率(%)'], "{:.2f}%"))
+    with metric_col3:
+        st.metric("只均日耗料", show_value(totals['只均日耗料(g)'], "{:.1f} g"))
+    with metric_col4:
+        st.metric("料重比", show_value(totals['料重比'], "{:.2f}"))
+    
+    kpi = rollups.table()
+    kpi_display = kpi.copy()
+    kpi_display['最近日期'] = kpi_display['最近日期'].dt.strftime('%Y-%m-%d')
+    st.dataframe(
+        kpi_display.style.format({
+            "死亡率(%)": "{:.2f}",
+            "淘汰率(%)": "{:.2f}",
+            "只均日耗料(g)": "{:.1f}",
+            "均重(g)": "{:.1f}",
+            "料重比": "{:.2f}",
+            "近7天死亡(只)": "{:.0f}",
+            "近7天日均耗料(kg)": "{:.1f}",
+        }, na_rep="—"),
+        use_container_width=True
+    )
+    st.caption("死亡率、淘汰率以各批次进雏数量之和为基数；料重比 = 当前批次耗料 ÷（当前存栏 × 最近一次称重均重）")
+    
+    # 跨场汇总：各鸡场的工作簿在多个进程中并行读取，合并后一次算出各鸡场和全部鸡场的指标
+    if len(farms) > 1 and st.toggle("🏭 汇总全部鸡场", key="farm_report_toggle"):
+        with st.spinner("正在读取各鸡场的数据…"):
+            try:
+                farm_kpi = consolidated_report()
+            except Exception as e:
+                st.error(f"跨场汇总失败: {e}")
+                farm_kpi = None
+        if farm_kpi is not None:
+            farm_kpi_display = farm_kpi.copy()
+            farm_kpi_display['最近日期'] = farm_kpi_display['最近日期'].dt.strftime('%Y-%m-%d')
+            st.dataframe(
+                farm_kpi_display.style.format({
+                    "死亡率(%)": "{:.2f}",
+                    "淘汰率(%)": "{:.2f}",
+                    "只均日耗料(g)": "{:.1f}",
+                    "料重比": "{:.2f}",
+                }, na_rep="—"),
+                use_container_width=True
+            )
+    
+    chart_metric = st.selectbox("对比指标", ["死亡率(%)", "淘汰率(%)", "只均日耗料(g)", "均重(g)", "料重比"], key="dashboard_metric")
+    st.bar_chart(kpi[chart_metric])
+    
+    # 生长曲线与均匀度：称重数据按数据版本只分析一次，切换鸡舍不重新计算
+    st.markdown("#### ⚖️ 生长曲线与均匀度")
+    growth_sheets = load_sheets(WEIGHT_SHEET, PLACEMENT_SHEET)
+    growth = growth_analytics(growth_sheets.get(WEIGHT_SHEET))
+    default_breed = st.selectbox("未登记进雏的鸡舍按品种", BREEDS, key="growth_breed")
+    try:
+        standard = breed_standard()
+    except (OSError, ValueError) as e:
+        st.warning(f"品种标准文件读取失败，使用内置标准：{e}")
+        standard = default_standard()
+    growth_curve = growth.compare(standard, cycle_registry(growth_sheets.get(PLACEMENT_SHEET)), default_breed)
+    if growth_curve.empty:
+        st.info("📭 暂无称重数据")
+    else:
+        growth_latest = growth.latest(growth_curve)
+        growth_display = growth_latest[["日期", "品种", "日龄", "样本数量", "均重(g)", "标准体重(g)",
+                                        "达标率(%)", "日增重(g)", "变异系数(%)"]].copy()
+        growth_display['日期'] = growth_display['日期'].dt.strftime('%Y-%m-%d')
+        st.dataframe(
+            growth_display.rename(columns={"日期": "最近称重"}).style.format({
+                "均重(g)": "{:.1f}",
+                "标准体重(g)": "{:.0f}",
+                "达标率(%)": "{:.1f}",
+                "日增重(g)": "{:.1f}",
+                "变异系数(%)": "{:.1f}",
+            }, na_rep="—"),
+            use_container_width=True
+        )
+        st.caption("变异系数 = 各鸡笼各层均重的标准差 ÷ 平均值，越小鸡群越均匀；日增重按同一批次相邻两次称重计算")
+        
+        growth_col1, growth_col2 = st.columns(2)
+        with growth_col1:
+            growth_house = st.selectbox("鸡舍", list(growth_latest.index), format_func=lambda x: f"鸡舍{x}", key="growth_house")
+        house_curve = growth.house_curve(growth_curve, growth_house)
+        with growth_col2:
+            growth_metric = st.selectbox("曲线", ["均重(g)", "日增重(g)", "变异系数(%)"], key="growth_metric")
+        if growth_metric == "均重(g)":
+            st.line_chart(house_curve[["均重(g)", "标准体重(g)"]])
+        else:
+            st.line_chart(house_curve[[growth_metric]])
+        latest_layers = growth.house_layers(growth_house, house_curve["日期"].iat[-1])
+        st.caption(f"鸡舍{growth_house}最近一批按日龄的曲线；{house_curve['日期'].iat[-1]:%Y-%m-%d} 各层均匀度：")
+        st.dataframe(
+            latest_layers[["鸡笼数", "样本数量", "均重(g)", "变异系数(%)"]].style.format(
+                {"均重(g)": "{:.1f}", "变异系数(%)": "{:.1f}"}, na_rep="—"),
+            use_container_width=True
+        )
 
 # 独立的数据查看功能
+profiling.section("数据查看")
 st.markdown("---")
 st.subheader("🔍 数据查看")
 
 view_col1, view_col2 = st.columns(2)
 with view_col1:
-    view_house = st.selectbox("选择鸡舍查看数据", range(1,17), key="view_house")
+    view_house = st.selectbox("选择鸡舍查看数据", farm_houses, key="view_house")
 with view_col2:
     view_days = st.selectbox("查看天数", [7, 14, 30, 60], index=1, key="view_days")
 
 if st.button("查看数据", key="view_data_btn"):
-    sheets = load_all_sheets()
-    recent_data = get_recent_data(sheets, view_house, view_days)
+    recent_data = get_recent_data(view_house, view_days)
     
     if not recent_data.empty:
         st.subheader(f"鸡舍{view_house}最近{view_days}天数据")
@@ -824,5 +1516,19 @@ if st.button("查看数据", key="view_data_btn"):
             lambda x: x.strftime('%Y-%m-%d') if hasattr(x, 'strftime') else str(x)
         )
         st.dataframe(recent_data_display, use_container_width=True)
+        show_recent_stats(view_house, view_days)
     else:
-        st.info(f"📭 鸡舍{view_house}暂无最近{view_days}天的数据")
\ No newline at end of file
+        st.info(f"📭 鸡舍{view_house}暂无最近{view_days}天的数据")
+
+# 本次运行的耗时明细：显示在侧边栏，并追加到工作簿同目录的 profile.jsonl
+if profiling.ENABLED:
+    profile_log = os.environ.get("CHICKEN_PROFILE_LOG") or os.path.join(os.path.dirname(file_path), "profile.jsonl")
+    profile_run = profiling.end_run(profile_log)
+    if profile_run is not None:
+        with st.sidebar.expander(f"⏱️ 本次运行耗时 {profile_run.total * 1000:.0f} ms"):
+            st.dataframe(
+                profiling.summary(profile_run).style.format({"耗时(ms)": "{:.1f}", "行数": "{:.0f}", "字节数": "{:,.0f}"}, na_rep=""),
+                hide_index=True,
+                use_container_width=True
+            )
+            st.caption(f"明细已写入 {profile_log}")
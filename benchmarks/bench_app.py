@@ -0,0 +1,295 @@
+"""应用关键路径基准测试：在模拟工作簿上计时读取、保存、存栏重算和各项查询，
+以及用Streamlit AppTest完整重新运行页面脚本
+
+app.py.py是页面脚本，不能直接导入。各项计时调用与页面中对应函数相同的farmdata接口：
+    load_all_sheets              -> storage.load_all_sheets()
+    load_sheets                  -> storage.load_sheet()：单个鸡舍全部记录、最近60天
+    save_all_sheets              -> commit()追加一条日常数据（只写日志）及写回工作簿
+    update_records               -> apply_batch()修改第二批第一天的记录（并核对存栏数从进雏数量重新累计）
+    recalculate_stock            -> 整表重算、从倒数第10条记录起增量重算
+    calculate_age_for_date       -> house_index(df).age_for_date()
+    check_duplicate_daily_record -> house_index(df).positions_on()（sqlite为索引查询）
+    get_recent_data              -> 按日期筛选最近14天（sqlite为索引查询）
+    growth_analytics             -> GrowthAnalytics(称重数据)：生长曲线和均匀度分析
+    sync_feed_ledger             -> FeedLedger重建饲料库存台账、按日期查询全部鸡舍库存
+    export                       -> storage.iter_records()分块读取称重数据，export_records()写成CSV、Parquet
+    consolidated_report          -> farm_report()：多个鸡场的工作簿依次读取与进程池并行读取
+
+运行方式（在项目根目录）：
+    python -m benchmarks.bench_app --years 1 3 --output bench_results.json
+结果以JSON写出，便于与之前的结果比较。
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.generate import generate_workbook
+from farmdata import SheetDict, commit, house_index, open_storage, recalculate_stock
+from farmdata.export import export_records
+from farmdata.farms import Farm, farm_report
+from farmdata.sidecar import sidecar_dir
+from farmdata.cycles import cycle_registry, refresh_house
+from farmdata.feed import FeedLedger
+from farmdata.growth import GrowthAnalytics
+from farmdata.records import apply_batch, record_table, required_sheets
+from farmdata.schema import PLACEMENT_SHEET, WEIGHT_COLUMNS, WEIGHT_SHEET
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_APP = os.path.join(_ROOT, "app.py.py")
+_APP_PATH = r'r"C:\Users\hb\Desktop\原始数据\chicken.xlsx"'
+
+
+def timings(func, repeat, setup=None):
+    """运行repeat次，返回每次的耗时（秒）；setup的返回值作为func的参数，不计入耗时"""
+    result = []
+    for _ in range(repeat):
+        argument = setup() if setup is not None else None
+        started = time.perf_counter()
+        func(argument) if setup is not None else func()
+        result.append(time.perf_counter() - started)
+    return result
+
+
+class Recorder:
+    """收集各项计时结果"""
+    def __init__(self, case):
+        self.case = case
+        self.results = []
+
+    def add(self, name, seconds, **extra):
+        record = dict(self.case, name=name, repeat=len(seconds), best=min(seconds),
+                      median=statistics.median(seconds), **extra)
+        self.results.append(record)
+        print(f"  {name:<40} 最快 {record['best'] * 1000:9.2f} ms   中位数 {record['median'] * 1000:9.2f} ms")
+
+
+def _clear_caches(path):
+    """删除侧车缓存、日志和数据库，模拟首次打开工作簿"""
+    root = os.path.dirname(path)
+    for name in os.listdir(root):
+        if name != os.path.basename(path):
+            target = os.path.join(root, name)
+            shutil.rmtree(target) if os.path.isdir(target) else os.remove(target)
+
+
+def bench_functions(recorder, path, backend, repeat):
+    _clear_caches(path)
+    started = time.perf_counter()
+    storage = open_storage(path, backend, batch_size=None)
+    recorder.add("open_storage(首次)", [time.perf_counter() - started])
+
+    # 首次读取需要解析工作簿（并生成侧车缓存），之后读取缓存；
+    # 缓存生成之前只读取单个工作表时逐行读取工作簿
+    recorder.add("load_sheets(首次，单个鸡舍)", timings(lambda: storage.load_sheet("1"), 1))
+    recorder.add("load_all_sheets(首次)", timings(storage.load_all_sheets, 1))
+    recorder.add("load_all_sheets", timings(storage.load_all_sheets, repeat))
+    sheets = storage.load_all_sheets()
+    house = max((name for name in sheets if name.isdigit()), key=lambda name: len(sheets[name]))
+    df = sheets[house]
+    dates = pd.to_datetime(df['日期'])
+    last_date = dates.max()
+    recorder.add("load_sheets(单个鸡舍)", timings(lambda: storage.load_sheet(house), repeat), rows=len(df))
+    recorder.add("load_sheets(单个鸡舍近60天)",
+                 timings(lambda: storage.load_sheet(house, since=last_date - timedelta(days=59)), repeat))
+
+    def append_one(snapshot):
+        row = df.iloc[[-1]].copy()
+        row['日期'] = (pd.Timestamp(snapshot[house]['日期'].max()) + timedelta(days=1)).date()
+        commit(storage, snapshot, lambda latest: latest.append_rows(house, row))
+
+    def fresh_snapshot():
+        return SheetDict(storage.load_all_sheets(), version=storage.version())
+
+    recorder.add("save_all_sheets(追加一行)", timings(append_one, repeat, setup=fresh_snapshot))
+    started = time.perf_counter()
+    storage.compact()
+    recorder.add("写回工作簿(compact)", [time.perf_counter() - started])
+    seconds = check_cycle_edit(storage, house)
+    if seconds is not None:
+        recorder.add("update_records(第二批第一天)", [seconds])
+
+    recorder.add("recalculate_stock(整表)", timings(recalculate_stock, repeat, setup=lambda: df.copy()),
+                 rows=len(df))
+    edit_date = df['日期'].iloc[-10]
+    recorder.add("recalculate_stock(增量)",
+                 timings(lambda d: recalculate_stock(d, start_date=edit_date), repeat, setup=lambda: df.copy()),
+                 rows=len(df))
+
+    targets = [last_date - timedelta(days=int(d)) for d in np.linspace(0, len(df), 50)]
+    recorder.add("calculate_age_for_date(建索引)", timings(lambda d: house_index(d), repeat, setup=lambda: df.copy()))
+    index = house_index(df)
+    recorder.add("calculate_age_for_date(50次查询)",
+                 timings(lambda: [index.age_for_date(t) for t in targets], repeat))
+
+    if storage.indexed:
+        duplicate = lambda: [storage.find_daily_records(int(house), t) for t in targets]
+        recent = lambda: storage.daily_records_since(int(house), last_date - timedelta(days=13))
+    else:
+        duplicate = lambda: [index.positions_on(t) for t in targets]
+        recent = lambda: df[dates >= last_date - timedelta(days=13)].sort_values('日期', ascending=False)
+    recorder.add("check_duplicate_daily_record(50次)", timings(duplicate, repeat))
+    recorder.add("get_recent_data(14天)", timings(recent, repeat))
+
+    weights = sheets[WEIGHT_SHEET]
+    recorder.add("growth_analytics(称重数据)", timings(lambda: GrowthAnalytics(weights), repeat), rows=len(weights))
+
+    recorder.add("sync_feed_ledger(重建)", timings(lambda: FeedLedger().sync(None, lambda: sheets), repeat))
+    ledger = FeedLedger()
+    ledger.sync(None, lambda: sheets)
+    recorder.add("feed_ledger.table(50个日期)", timings(lambda: [ledger.table(t) for t in targets], repeat))
+
+    for file_format, extension in [("CSV", ".csv"), ("Parquet", ".parquet")]:
+        target = os.path.join(os.path.dirname(path), "export" + extension)
+        recorder.add(f"export(称重数据，{file_format})", timings(
+            lambda: export_records(storage.iter_records(WEIGHT_SHEET), target, file_format, WEIGHT_COLUMNS), repeat),
+            rows=len(weights))
+        os.remove(target)
+
+
+def check_cycle_edit(storage, house):
+    """与数据维护页面相同，在只读取了该鸡舍工作表的快照上修改第二批第一天的死亡数，返回耗时（秒）
+
+    快照补齐required_sheets后提交，修改后的存栏数应与按进雏记录整表重算的结果相同：
+    第二批从进雏数量重新累计，不接续上一批的存栏数。
+    """
+    cycles = cycle_registry(storage.load_sheet(PLACEMENT_SHEET)).house(house)
+    if len(cycles) < 2:
+        return None
+    version = storage.version()
+    snapshot = SheetDict(storage.load_sheets([house]), version=version)
+    df = snapshot[house]
+    record_id = record_table(house, df).ids[house_index(df).positions_on(cycles.dates[1].astype(object))[0]]
+    targets = {house: [record_id]}
+    snapshot = SheetDict({**storage.load_sheets(required_sheets(snapshot, targets, [int(house)])), **snapshot},
+                         version=version)
+    started = time.perf_counter()
+    commit(storage, snapshot, lambda latest: apply_batch(latest, targets, {"单日死亡(只)": 5}, snapshot=snapshot))
+    seconds = time.perf_counter() - started
+    df = storage.load_sheet(house)
+    expected = refresh_house(df, cycles)
+    assert np.array_equal(df['存栏数'].to_numpy(dtype=float), expected['存栏数'].to_numpy(dtype=float)), \
+        "修改第二批第一天后存栏数没有从进雏数量重新累计"
+    return seconds
+
+
+def bench_farms(recorder, path, backend, repeat, count):
+    """跨场汇总：把工作簿复制为count个鸡场，比较依次读取和进程池并行读取（每次都重新解析工作簿）"""
+    root = os.path.join(os.path.dirname(path), "farms")
+    farms = []
+    for i in range(count):
+        target = os.path.join(root, str(i + 1), os.path.basename(path))
+        os.makedirs(os.path.dirname(target))
+        shutil.copy(path, target)
+        farms.append(Farm(f"鸡场{i + 1}", target, backend=backend))
+
+    def clear():
+        for farm in farms:
+            shutil.rmtree(sidecar_dir(farm.path), ignore_errors=True)
+            database = os.path.splitext(farm.path)[0] + ".db"
+            if os.path.exists(database):
+                os.remove(database)
+
+    try:
+        recorder.add(f"consolidated_report({count}个鸡场，依次)",
+                     timings(lambda _: farm_report(farms, max_workers=1), repeat, setup=clear), farms=count)
+        recorder.add(f"consolidated_report({count}个鸡场，并行)",
+                     timings(lambda _: farm_report(farms), repeat, setup=clear), farms=count, workers=os.cpu_count())
+    finally:
+        shutil.rmtree(root)
+
+
+def bench_reruns(recorder, path, backend, reruns):
+    """用AppTest完整运行页面脚本：首次运行和之后的重新运行"""
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        print("  未安装streamlit，跳过页面重新运行测试")
+        return
+    _clear_caches(path)
+    with open(_APP, encoding="utf-8") as f:
+        source = f.read().replace(_APP_PATH, repr(path))
+    script = os.path.join(os.path.dirname(path), "app_bench.py")
+    with open(script, "w", encoding="utf-8") as f:
+        f.write(source)
+    previous = os.environ.get("CHICKEN_STORAGE")
+    os.environ["CHICKEN_STORAGE"] = backend
+    if _ROOT not in sys.path:
+        sys.path.insert(0, _ROOT)
+    try:
+        app = AppTest.from_file(script, default_timeout=600)
+        started = time.perf_counter()
+        app.run()
+        recorder.add("AppTest首次运行", [time.perf_counter() - started])
+        if app.exception:
+            raise RuntimeError(app.exception[0].message)
+        recorder.add("AppTest重新运行", timings(app.run, reruns))
+    finally:
+        os.remove(script)
+        if previous is None:
+            os.environ.pop("CHICKEN_STORAGE", None)
+        else:
+            os.environ["CHICKEN_STORAGE"] = previous
+
+
+def _environment():
+    try:
+        commit_id = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=_ROOT,
+                                   capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit_id = None
+    return {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit_id,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="应用关键路径基准测试")
+    parser.add_argument("--years", type=float, nargs="+", default=[1, 3], help="模拟数据的历史年数")
+    parser.add_argument("--cages", type=int, default=4, help="每次称重的鸡笼数")
+    parser.add_argument("--backend", nargs="+", default=["excel", "sqlite"], choices=["excel", "sqlite"])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--farms", type=int, default=4, help="跨场汇总的鸡场数，0为跳过")
+    parser.add_argument("--reruns", type=int, default=3, help="AppTest重新运行次数，0为跳过")
+    parser.add_argument("--output", default="bench_results.json", help="结果JSON文件")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for years in args.years:
+            for backend in args.backend:
+                path = os.path.join(workdir, f"{backend}-{years}", "chicken.xlsx")
+                os.makedirs(os.path.dirname(path))
+                rows = generate_workbook(path, years, args.cages)
+                case = {"years": years, "cages": args.cages, "backend": backend, "total_rows": sum(rows.values())}
+                print(f"{years} 年数据（{case['total_rows']} 行），{backend}：")
+                recorder = Recorder(case)
+                bench_functions(recorder, path, backend, args.repeat)
+                if args.farms:
+                    bench_farms(recorder, path, backend, args.repeat, args.farms)
+                if args.reruns:
+                    bench_reruns(recorder, path, backend, args.reruns)
+                results.extend(recorder.results)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"environment": _environment(), "results": results}, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
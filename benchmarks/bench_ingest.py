@@ -0,0 +1,135 @@
+"""数据接收接口基准测试：模拟电子秤和料塔计量表向本地接口批量上报，计时每秒写入的读数
+
+在模拟工作簿上启动接收服务（随机端口），模拟设备依次：
+    上报batches批称重数据（每批batch_size条，日期晚于已有记录）
+    上报一批日常数据（每个鸡舍一天的耗料和死亡，CSV格式）
+    重复上报第一批称重数据，应全部因重复被拒绝
+最后把日志写回工作簿，核对写入的行数。
+
+运行方式（在项目根目录）：
+    python -m benchmarks.bench_ingest --years 1 --batches 50 --batch-size 200
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.generate import HOUSES, LAYERS, generate_workbook
+from farmdata import open_storage
+from farmdata.ingest import make_server
+from farmdata.schema import WEIGHT_SHEET
+from farmdata.writer import BackgroundWriter
+
+
+class DeviceClient:
+    """模拟设备：向接收接口POST一批读数，返回响应"""
+    def __init__(self, url):
+        self.url = url
+
+    def post(self, path, body, content_type="application/json"):
+        request = urllib.request.Request(self.url + path, data=body, headers={"Content-Type": content_type})
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    def weights(self, records):
+        return self.post("/weights", json.dumps({"records": records}, ensure_ascii=False).encode("utf-8"))
+
+    def daily(self, df):
+        return self.post("/daily", df.to_csv(index=False).encode("utf-8"), "text/csv")
+
+
+def weight_batches(first_date, batches, batch_size, cages, rng):
+    """称重读数：每批按鸡舍、鸡笼、层数轮流生成，一天称完全部鸡笼后换下一天"""
+    per_day = len(HOUSES) * cages * len(LAYERS)
+    total = batches * batch_size
+    i = np.arange(total)
+    day, slot = i // per_day, i % per_day
+    house = np.array(HOUSES)[slot // (cages * len(LAYERS))]
+    cage = (slot // len(LAYERS)) % cages + 1
+    layer = np.array(LAYERS)[slot % len(LAYERS)]
+    samples = rng.integers(15, 26, total)
+    records = [
+        {"date": str(first_date + timedelta(days=int(d))), "house": int(h), "cage": int(c), "layer": str(l),
+         "samples": int(s), "weight_kg": round(min(float(s) * 1.8 * float(rng.normal(1, 0.05)), 49.9), 2)}
+        for d, h, c, l, s in zip(day, house, cage, layer, samples)
+    ]
+    return [records[k:k + batch_size] for k in range(0, total, batch_size)]
+
+
+def run(path, backend, batches, batch_size, cages):
+    storage = open_storage(path, backend, batch_size=None)
+    sheets = storage.load_all_sheets()
+    weights_before = len(sheets[WEIGHT_SHEET])
+    last_date = max(pd.to_datetime(df['日期']).max() for name, df in sheets.items() if name.isdigit())
+    writer = BackgroundWriter(storage)
+    server = make_server(storage, HOUSES, port=0, writer=writer, quiet=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    client = DeviceClient(f"http://127.0.0.1:{server.server_address[1]}")
+    rng = np.random.default_rng(0)
+    try:
+        payloads = weight_batches(last_date.date() + timedelta(days=1), batches, batch_size, cages, rng)
+        seconds = []
+        for records in payloads:
+            started = time.perf_counter()
+            status, reply = client.weights(records)
+            seconds.append(time.perf_counter() - started)
+            assert status == 200 and reply["accepted"] == len(records), reply
+        total = sum(seconds)
+        print(f"  称重：{len(payloads)} 批共 {batches * batch_size} 条，{total:.2f} s，"
+              f"{batches * batch_size / total:,.0f} 条/秒（每批中位数 {statistics.median(seconds) * 1000:.1f} ms）")
+
+        daily = pd.DataFrame({"date": str((last_date + timedelta(days=1)).date()), "house": list(HOUSES),
+                              "feed_kg": rng.uniform(1000, 3000, len(HOUSES)).round(1),
+                              "deaths": rng.integers(0, 20, len(HOUSES))})
+        started = time.perf_counter()
+        status, reply = client.daily(daily)
+        print(f"  日常数据（CSV）：{reply['accepted']} 条，{(time.perf_counter() - started) * 1000:.1f} ms")
+        assert status == 200 and reply["accepted"] == len(HOUSES), reply
+
+        status, reply = client.weights(payloads[0])
+        assert status == 200 and reply["accepted"] == 0 and len(reply["rejected"]) == len(payloads[0]), reply
+        print(f"  重复上报：{len(reply['rejected'])} 条全部拒绝（{reply['rejected'][0]['reason']}）")
+    finally:
+        server.shutdown()
+        server.server_close()
+        writer.close()
+    storage.compact()
+    sheets = storage.load_all_sheets()
+    assert len(sheets[WEIGHT_SHEET]) == weights_before + batches * batch_size
+    print(f"  写回后称重数据 {len(sheets[WEIGHT_SHEET])} 行，核对无误")
+    return batches * batch_size / total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="数据接收接口基准测试")
+    parser.add_argument("--years", type=float, default=1, help="模拟数据的历史年数")
+    parser.add_argument("--cages", type=int, default=4, help="每个鸡舍称重的鸡笼数")
+    parser.add_argument("--batches", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--backend", nargs="+", default=["excel", "sqlite"], choices=["excel", "sqlite"])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for backend in args.backend:
+            path = os.path.join(workdir, backend, "chicken.xlsx")
+            os.makedirs(os.path.dirname(path))
+            generate_workbook(path, args.years, args.cages)
+            print(f"{args.years} 年数据，{backend}：")
+            run(path, backend, args.batches, args.batch_size, args.cages)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""存栏数计算基准测试：逐行循环 vs 向量化 vs 增量重算
+
+运行方式（在项目根目录）：
+    python -m benchmarks.bench_stock --rows 10000 50000
+"""
+import argparse
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from farmdata import recalculate_stock
+
+
+def legacy_recalculate_stock(df, initial_stock=54000):
+    """原逐行实现，作为结果比对的基准"""
+    if df.empty:
+        return df
+    df = df.sort_values('日期').reset_index(drop=True)
+    for i in range(len(df)):
+        if i == 0:
+            df.at[i, '存栏数'] = initial_stock - df.iloc[i]['单日死亡(只)'] - df.iloc[i]['单日淘汰(只)']
+        else:
+            previous_stock = df.iloc[i-1]['存栏数']
+            current_death = df.iloc[i]['单日死亡(只)']
+            current_eliminate = df.iloc[i]['单日淘汰(只)']
+            df.at[i, '存栏数'] = previous_stock - current_death - current_eliminate
+    return df
+
+
+def make_house_sheet(rows, seed=0):
+    """生成一个鸡舍工作表（每天一条记录）"""
+    rng = np.random.default_rng(seed)
+    start = date(2000, 1, 1)
+    return pd.DataFrame({
+        "日期": [start + timedelta(days=i) for i in range(rows)],
+        "鸡舍编号": 1,
+        "日龄": np.arange(1, rows + 1),
+        "单日耗料(kg)": rng.uniform(1000, 3000, rows).round(1),
+        "单日死亡(只)": rng.integers(0, 5, rows),
+        "单日淘汰(只)": rng.integers(0, 2, rows),
+        "存栏数": 0,
+    })
+
+
+def best_of(func, repeat):
+    """多次运行取最快一次（秒）"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def run(rows, repeat):
+    df = make_house_sheet(rows)
+    expected = legacy_recalculate_stock(df.copy())
+    full = recalculate_stock(df.copy())
+    assert np.array_equal(expected['存栏数'].to_numpy(), full['存栏数'].to_numpy()), "向量化结果不一致"
+
+    # 模拟补录：修改倒数第10条记录后从该日期开始增量重算
+    edited = expected.copy()
+    edited.loc[rows - 10, '单日死亡(只)'] += 3
+    edit_date = edited.loc[rows - 10, '日期']
+    expected_edit = legacy_recalculate_stock(edited.copy())
+    incremental = recalculate_stock(edited.copy(), start_date=edit_date)
+    assert np.array_equal(expected_edit['存栏数'].to_numpy(), incremental['存栏数'].to_numpy()), "增量结果不一致"
+
+    legacy_time = best_of(lambda: legacy_recalculate_stock(df.copy()), 1)
+    full_time = best_of(lambda: recalculate_stock(df.copy()), repeat)
+    incremental_time = best_of(lambda: recalculate_stock(edited.copy(), start_date=edit_date), repeat)
+    print(f"{rows:>8} 行 | 逐行 {legacy_time * 1000:9.1f} ms | 向量化 {full_time * 1000:7.2f} ms "
+          f"({legacy_time / full_time:6.0f}x) | 增量 {incremental_time * 1000:7.2f} ms "
+          f"({legacy_time / incremental_time:6.0f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="存栏数计算基准测试")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 50000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    for rows in args.rows:
+        run(rows, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
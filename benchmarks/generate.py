@@ -0,0 +1,166 @@
+"""生成模拟的鸡场工作簿：16个鸡舍工作表、称重数据、采购饲料记录和进雏记录
+
+鸡群按批次饲养：每批饲养cycle_days天，出栏后空舍empty_days天。每批登记一条进雏记录，
+日龄随批次从1重新开始，存栏数从进雏数量重新累计（与应用中登记进雏后的规则相同）。
+每批每隔weigh_every天称重一次，每次称cages个鸡笼的四层。
+
+运行方式（在项目根目录）：
+    python -m benchmarks.generate chicken.xlsx --years 3 --cages 4
+"""
+import argparse
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from farmdata import DEFAULT_INITIAL_STOCK, recalculate_stock
+from farmdata.cycles import CycleRegistry
+from farmdata.schema import (
+    BREEDS,
+    DAILY_COLUMNS,
+    PLACEMENT_COLUMNS,
+    PLACEMENT_SHEET,
+    PURCHASE_COLUMNS,
+    PURCHASE_SHEET,
+    WEIGHT_COLUMNS,
+    WEIGHT_SHEET,
+)
+from farmdata.storage import write_workbook
+
+HOUSES = range(1, 17)
+LAYERS = ["1层", "2层", "3层", "4层"]
+
+
+def _growth_weight(ages):
+    """按日龄估算的均重(g)，接近白羽肉鸡的生长曲线"""
+    ages = np.asarray(ages, dtype=float)
+    return 42 + 3800 / (1 + np.exp(-(ages - 38) / 9))
+
+
+def _feed_type(age):
+    """按日龄选择料号"""
+    if age <= 10:
+        return "510"
+    if age <= 20:
+        return "510DC"
+    if age <= 32:
+        return "511"
+    return "513"
+
+
+def house_days(years, start, cycle_days, empty_days, offset):
+    """鸡舍有鸡的日期及对应日龄，以及各批次的进雏日期；不同鸡舍按offset错开进雏日期"""
+    end = start + timedelta(days=int(365 * years))
+    dates, ages, placements = [], [], []
+    placement = start + timedelta(days=offset)
+    while placement < end:
+        days = min(cycle_days, (end - placement).days)
+        dates.extend(placement + timedelta(days=i) for i in range(days))
+        ages.extend(range(1, days + 1))
+        placements.append(placement)
+        placement += timedelta(days=cycle_days + empty_days)
+    return dates, np.array(ages, dtype=np.int64), placements
+
+
+def make_placements(house, placements, rng):
+    """进雏记录：每批一条，进雏数量在默认初始存栏上下浮动，品种轮换"""
+    return pd.DataFrame({
+        "日期": placements,
+        "鸡舍编号": house,
+        "进雏数量": (DEFAULT_INITIAL_STOCK * rng.uniform(0.95, 1.05, len(placements))).round().astype(np.int64),
+        "品种": [BREEDS[(house + i) % len(BREEDS)] for i in range(len(placements))],
+    }, columns=PLACEMENT_COLUMNS)
+
+
+def make_house(house, dates, ages, rng, cycles=None):
+    """一个鸡舍的日常数据，存栏数按应用中的规则计算；cycles为鸡舍的批次时每批从进雏数量重新累计"""
+    n = len(dates)
+    # 死亡集中在育雏期
+    deaths = rng.poisson(np.where(ages <= 7, 25, 6))
+    df = pd.DataFrame({
+        "日期": dates,
+        "鸡舍编号": house,
+        "日龄": ages,
+        "单日耗料(kg)": (DEFAULT_INITIAL_STOCK * _growth_weight(ages) * 0.00011 * rng.uniform(0.9, 1.1, n)).round(1),
+        "单日死亡(只)": deaths,
+        "单日淘汰(只)": rng.poisson(2, n),
+        "存栏数": 0,
+    }, columns=DAILY_COLUMNS)
+    return recalculate_stock(df, DEFAULT_INITIAL_STOCK, cycles=cycles)
+
+
+def make_weights(house, dates, ages, cages, weigh_every, rng):
+    """称重数据：每隔weigh_every天称cages个鸡笼，每笼四层各一条记录"""
+    mask = ages % weigh_every == 0
+    weigh_dates = np.array(dates, dtype=object)[mask]
+    weigh_ages = ages[mask]
+    per_day = cages * len(LAYERS)
+    count = len(weigh_dates) * per_day
+    samples = rng.integers(15, 26, count)
+    average = np.repeat(_growth_weight(weigh_ages), per_day) * rng.normal(1, 0.08, count)
+    total = (samples * average / 1000).round(2)
+    return pd.DataFrame({
+        "日期": np.repeat(weigh_dates, per_day),
+        "鸡舍编号": house,
+        "鸡笼编号": np.tile(np.repeat(np.arange(1, cages + 1), len(LAYERS)), len(weigh_dates)),
+        "层数": np.tile(LAYERS, len(weigh_dates) * cages),
+        "样本数量": samples,
+        "总重量(kg)": total,
+        "均重(g)": (total * 1000 / samples).round(1),
+        "日龄": np.repeat(weigh_ages, per_day),
+    }, columns=WEIGHT_COLUMNS)
+
+
+def make_purchases(house, dates, ages, purchase_every, rng):
+    """采购饲料记录：每隔purchase_every天采购一次"""
+    mask = (ages - 1) % purchase_every == 0
+    return pd.DataFrame({
+        "日期": np.array(dates, dtype=object)[mask],
+        "鸡舍编号": house,
+        "采购饲料(kg)": rng.integers(8, 31, mask.sum()) * 1000,
+        "料号": [_feed_type(age) for age in ages[mask]],
+    }, columns=PURCHASE_COLUMNS)
+
+
+def make_sheets(years=1.0, cages=4, seed=0, start=date(2020, 1, 1),
+                cycle_days=42, empty_days=14, weigh_every=7, purchase_every=5):
+    """生成全部工作表，返回{工作表名称: DataFrame}"""
+    rng = np.random.default_rng(seed)
+    sheets, weights, purchases, placements = {}, [], [], []
+    for house in HOUSES:
+        dates, ages, placement_dates = house_days(years, start, cycle_days, empty_days, offset=(house - 1) * 3)
+        house_placements = make_placements(house, placement_dates, rng)
+        cycles = CycleRegistry(house_placements).house(house)
+        sheets[str(house)] = make_house(house, dates, ages, rng, cycles)
+        weights.append(make_weights(house, dates, ages, cages, weigh_every, rng))
+        purchases.append(make_purchases(house, dates, ages, purchase_every, rng))
+        placements.append(house_placements)
+    sheets[WEIGHT_SHEET] = pd.concat(weights, ignore_index=True).sort_values("日期", kind="stable", ignore_index=True)
+    sheets[PURCHASE_SHEET] = pd.concat(purchases, ignore_index=True).sort_values("日期", kind="stable", ignore_index=True)
+    sheets[PLACEMENT_SHEET] = pd.concat(placements, ignore_index=True).sort_values("日期", kind="stable",
+                                                                                  ignore_index=True)
+    return sheets
+
+
+def generate_workbook(path, years=1.0, cages=4, seed=0, **options):
+    """生成工作簿文件，返回各工作表的行数"""
+    sheets = make_sheets(years, cages, seed, **options)
+    write_workbook(path, sheets)
+    return {name: len(df) for name, df in sheets.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成模拟的鸡场工作簿")
+    parser.add_argument("path")
+    parser.add_argument("--years", type=float, default=1.0, help="历史数据年数")
+    parser.add_argument("--cages", type=int, default=4, help="每次称重的鸡笼数")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rows = generate_workbook(args.path, args.years, args.cages, args.seed)
+    print(f"已生成 {args.path}：共 {sum(rows.values())} 行")
+    for name, count in rows.items():
+        print(f"  {name}: {count}")
+
+
+if __name__ == "__main__":
+    main()
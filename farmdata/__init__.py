@@ -0,0 +1,35 @@
+"""鸡舍数据处理模块（与Streamlit界面无关的计算逻辑）"""
+from farmdata.concurrency import ConflictError, commit, save_changes
+from farmdata.date_index import HouseIndex, house_index
+from farmdata.locking import WriteLock
+from farmdata.schema import is_house_sheet
+from farmdata.stock import DEFAULT_INITIAL_STOCK, initial_stock, recalculate_stock
+from farmdata.storage import (
+    ExcelStorage,
+    JournaledExcelStorage,
+    SheetDict,
+    SqliteStorage,
+    Storage,
+    open_storage,
+)
+from farmdata.writer import BackgroundWriter
+
+__all__ = [
+    "BackgroundWriter",
+    "ConflictError",
+    "DEFAULT_INITIAL_STOCK",
+    "ExcelStorage",
+    "HouseIndex",
+    "JournaledExcelStorage",
+    "SheetDict",
+    "SqliteStorage",
+    "Storage",
+    "WriteLock",
+    "commit",
+    "house_index",
+    "initial_stock",
+    "is_house_sheet",
+    "open_storage",
+    "recalculate_stock",
+    "save_changes",
+]
@@ -0,0 +1,6 @@
+"""python -m farmdata：命令行维护工具，见farmdata.cli"""
+import sys
+
+from farmdata.cli import main
+
+sys.exit(main())
@@ -0,0 +1,124 @@
+"""鸡舍日常数据的累计和：任意日期范围的合计都是两个前缀和之差
+
+追加新记录时只在数组末尾写入（容量按倍数增长，均摊O(1)）；补录或修改历史记录后
+从第一处改动的位置开始重算累计和，之前的部分保持不变。
+"""
+import numpy as np
+import pandas as pd
+
+from farmdata.frames import to_day
+
+_FIELDS = ["单日耗料(kg)", "单日死亡(只)", "单日淘汰(只)"]
+
+
+def _columns(df):
+    """按日期排序后的日期、每日数值（耗料、死亡、淘汰）和存栏数数组"""
+    dates = pd.to_datetime(df['日期']).to_numpy(dtype='datetime64[D]')
+    # 缺失值按0累计
+    values = df[_FIELDS].apply(pd.to_numeric, errors='coerce').fillna(0).to_numpy(dtype=float)
+    stocks = pd.to_numeric(df['存栏数'], errors='coerce').to_numpy(dtype=float)
+    if len(dates) > 1 and (np.diff(dates) < np.timedelta64(0, 'D')).any():
+        order = np.argsort(dates, kind='stable')
+        dates, values, stocks = dates[order], values[order], stocks[order]
+    return dates, values, stocks
+
+
+class HouseAggregates:
+    """单个鸡舍按日期排序的累计耗料、死亡、淘汰"""
+    def __init__(self, df=None):
+        self._size = 0
+        self._dates = np.empty(0, dtype='datetime64[D]')
+        self._values = np.empty((0, len(_FIELDS)))
+        self._stocks = np.empty(0)
+        # _cumulative[i]为前i天的合计，_cumulative[0]为0
+        self._cumulative = np.zeros((1, len(_FIELDS)))
+        if df is not None and not df.empty:
+            self.repair(df)
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def dates(self):
+        return self._dates[:self._size]
+
+    def _reserve(self, size):
+        capacity = len(self._dates)
+        if size <= capacity:
+            return
+        capacity = max(size, capacity * 2, 64)
+        dates = np.empty(capacity, dtype='datetime64[D]')
+        values = np.empty((capacity, len(_FIELDS)))
+        stocks = np.empty(capacity)
+        cumulative = np.zeros((capacity + 1, len(_FIELDS)))
+        n = self._size
+        dates[:n], values[:n], stocks[:n] = self._dates[:n], self._values[:n], self._stocks[:n]
+        cumulative[:n + 1] = self._cumulative[:n + 1]
+        self._dates, self._values, self._stocks, self._cumulative = dates, values, stocks, cumulative
+
+    def _write(self, start, dates, values, stocks):
+        """从位置start起写入记录并重算之后的累计和"""
+        end = start + len(dates)
+        self._reserve(end)
+        self._dates[start:end] = dates
+        self._values[start:end] = values
+        self._stocks[start:end] = stocks
+        self._cumulative[start + 1:end + 1] = self._cumulative[start] + np.cumsum(values, axis=0)
+        self._size = end
+
+    def append(self, rows):
+        """在末尾追加新记录；新记录早于已有的最后日期时不追加，返回False"""
+        dates, values, stocks = _columns(rows)
+        if not len(dates):
+            return True
+        if self._size and dates[0] < self._dates[self._size - 1]:
+            return False
+        self._write(self._size, dates, values, stocks)
+        return True
+
+    def repair(self, df):
+        """按工作表的最新数据更新，只重算第一处改动之后的累计和，返回改动位置"""
+        dates, values, stocks = _columns(df)
+        common = min(self._size, len(dates))
+        changed = ((self._dates[:common] != dates[:common])
+                   | (self._values[:common] != values[:common]).any(axis=1)
+                   | ~((self._stocks[:common] == stocks[:common])
+                       | (np.isnan(self._stocks[:common]) & np.isnan(stocks[:common]))))
+        mismatch = np.flatnonzero(changed)
+        start = int(mismatch[0]) if len(mismatch) else common
+        self._write(start, dates[start:], values[start:], stocks[start:])
+        return start
+
+    def totals(self, start=None, end=None):
+        """日期范围（含首尾）内的合计；范围内最后一条记录的存栏数"""
+        dates = self.dates
+        lo = 0 if start is None else int(np.searchsorted(dates, to_day(start), side='left'))
+        hi = self._size if end is None else int(np.searchsorted(dates, to_day(end), side='right'))
+        hi = max(lo, hi)
+        feed, deaths, culls = self._cumulative[hi] - self._cumulative[lo]
+        days = hi - lo
+        return {
+            "天数": days,
+            "耗料(kg)": feed,
+            "死亡(只)": deaths,
+            "淘汰(只)": culls,
+            "平均日耗料(kg)": feed / days if days else None,
+            "存栏数": self._stocks[hi - 1] if days else None,
+        }
+
+    def window(self, days, end=None):
+        """截至end（默认最后一条记录的日期）的最近days天"""
+        if end is None:
+            if not self._size:
+                return self.totals()
+            end = self._dates[self._size - 1]
+        start = to_day(end) - np.timedelta64(days - 1, 'D')
+        return self.totals(start, end)
+
+    def rolling(self, days):
+        """每条记录及之前days天内的滚动合计，以日期为索引"""
+        dates = self.dates
+        lo = np.searchsorted(dates, dates - np.timedelta64(days - 1, 'D'), side='left')
+        sums = self._cumulative[1:self._size + 1] - self._cumulative[lo]
+        return pd.DataFrame(sums, columns=[f"近{days}天{name}" for name in ["耗料(kg)", "死亡(只)", "淘汰(只)"]],
+                            index=pd.DatetimeIndex(dates, name="日期"))
@@ -0,0 +1,253 @@
+"""已结束批次的归档：鸡舍工作表只保留当前批次，之前的批次按批次存为单独的文件
+
+批次以进雏记录为准：每次进雏当天起的记录属于新批次，其之前的批次都已结束。
+没有进雏记录（或早于第一次进雏）的记录按日龄识别：出栏后进雏的新批次日龄从头开始，
+日龄比上一条记录小、且不超过MAX_START_AGE的记录即为新批次的第一条记录。
+
+归档目录与工作簿同目录（<文件名>.archive），每个鸡舍一个子目录，每个批次一个Arrow文件，
+文件名为该批次的首末日期。查询历史时只读取与日期范围有交集的批次文件，
+工作表的大小只与当前批次有关，不随饲养年数增长。
+"""
+import os
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from farmdata.cycles import cycle_registry
+from farmdata.schema import PLACEMENT_SHEET, is_house_sheet
+from farmdata.storage import normalize_dates
+
+# 新批次第一条记录的最大日龄：进雏后几天才开始记录也能识别
+MAX_START_AGE = 7
+
+
+def archive_dir(excel_path):
+    """归档目录：与工作簿同目录的 <文件名>.archive"""
+    return os.path.splitext(excel_path)[0] + ".archive"
+
+
+def cycle_starts(df, cycles=None):
+    """按日期排序的鸡舍数据中每个批次第一条记录的位置，第一个总是0
+
+    cycles为鸡舍的批次（HouseCycles）：属于某次进雏的记录以进雏日期为批次边界，
+    早于第一次进雏的记录按日龄识别。
+    """
+    if df is None or df.empty:
+        return []
+    ages = pd.to_numeric(df['日龄'], errors='coerce').to_numpy(dtype=float)
+    # 日龄缺失时比较结果为False，不会被当作新批次
+    reset = (ages[1:] < ages[:-1]) & (ages[1:] <= MAX_START_AGE)
+    if cycles is not None and len(cycles):
+        found = cycles.find_all(pd.to_datetime(df['日期']).to_numpy(dtype='datetime64[D]'))
+        reset = np.where(found[1:] >= 0, found[1:] != found[:-1], reset)
+    return [0] + (np.flatnonzero(reset) + 1).tolist()
+
+
+def _to_date(value):
+    return None if value is None else pd.Timestamp(value).date()
+
+
+def _write_frame(path, df):
+    """写入临时文件后原子替换，写入中途出错不会留下不完整的批次文件"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    temp = path + ".tmp"
+    try:
+        with pa.OSFile(temp, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(temp, path)
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
+
+
+def _read_frame(path):
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).read_all().to_pandas()
+
+
+class Partition:
+    """一个已归档批次的文件"""
+    def __init__(self, house, first, last, path):
+        self.house = house
+        self.first = first
+        self.last = last
+        self.path = path
+
+    def overlaps(self, start=None, end=None):
+        """批次是否与日期范围（含首尾）有交集"""
+        return (start is None or self.last >= start) and (end is None or self.first <= end)
+
+    def load(self):
+        return _read_frame(self.path)
+
+
+class CycleArchive:
+    """各鸡舍已结束批次的归档"""
+    def __init__(self, excel_path):
+        self.folder = archive_dir(excel_path)
+
+    def partitions(self, house):
+        """鸡舍已归档的批次，按日期排序；只列出文件，不读取内容"""
+        folder = os.path.join(self.folder, str(house))
+        try:
+            names = os.listdir(folder)
+        except FileNotFoundError:
+            return []
+        result = []
+        for name in names:
+            stem, ext = os.path.splitext(name)
+            if ext != ".arrow":
+                continue
+            try:
+                first, last = (date.fromisoformat(part) for part in stem.split("_"))
+            except ValueError:
+                continue
+            result.append(Partition(int(house), first, last, os.path.join(folder, name)))
+        return sorted(result, key=lambda p: (p.first, p.last))
+
+    def covering(self, house, day):
+        """首末日期（含首尾）覆盖某一天的已归档批次；没有时返回None"""
+        day = _to_date(day)
+        for partition in self.partitions(house):
+            if partition.first <= day <= partition.last:
+                return partition
+        return None
+
+    def covered(self, house, dates):
+        """各日期是否落在鸡舍某个已归档批次的首末日期之间（含首尾），返回布尔数组"""
+        days = pd.to_datetime(pd.Series(dates)).to_numpy(dtype='datetime64[D]')
+        result = np.zeros(len(days), dtype=bool)
+        for partition in self.partitions(house):
+            result |= (days >= np.datetime64(partition.first, 'D')) & (days <= np.datetime64(partition.last, 'D'))
+        return result
+
+    def write(self, house, df):
+        """把一个批次的记录写入归档，同一批次再次归档时覆盖原文件"""
+        df = normalize_dates({"": df.reset_index(drop=True).copy()})[""]
+        first, last = df['日期'].min(), df['日期'].max()
+        folder = os.path.join(self.folder, str(house))
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"{first.isoformat()}_{last.isoformat()}.arrow")
+        _write_frame(path, df)
+        return Partition(int(house), first, last, path)
+
+    def load(self, house, start=None, end=None):
+        """读取与日期范围（含首尾）有交集的已归档记录，按日期排序；没有时返回None"""
+        start, end = _to_date(start), _to_date(end)
+        frames = [p.load() for p in self.partitions(house) if p.overlaps(start, end)]
+        if not frames:
+            return None
+        df = pd.concat(frames, ignore_index=True)
+        dates = pd.to_datetime(df['日期'])
+        keep = np.ones(len(df), dtype=bool)
+        if start is not None:
+            keep &= (dates >= pd.Timestamp(start)).to_numpy()
+        if end is not None:
+            keep &= (dates <= pd.Timestamp(end)).to_numpy()
+        return df[keep].sort_values('日期', kind='stable', ignore_index=True)
+
+    def history(self, house, hot, start=None, end=None):
+        """鸡舍在日期范围内的完整记录：已归档的批次与工作表中的记录合并，按日期排序
+
+        hot为工作表中（已按相同范围筛选）的记录。归档后工作表未能保存时同一天的记录会同时
+        出现在归档和工作表中，以工作表为准。
+        """
+        archived = self.load(house, start, end)
+        if archived is None:
+            return hot
+        if hot is None or hot.empty:
+            return archived
+        archived = archived[~pd.to_datetime(archived['日期']).isin(pd.to_datetime(hot['日期']))]
+        return pd.concat([archived, hot], ignore_index=True).sort_values(
+            '日期', key=pd.to_datetime, kind='stable', ignore_index=True)
+
+    def iter_history(self, house, hot_chunks, start=None, end=None):
+        """与history相同，但逐块交出：先逐个交出已归档的批次，再交出工作表中的记录（hot_chunks）
+
+        用于导出等不需要把全部记录合并成一张表的场合；工作表中已有的日期不再从归档中交出。
+        """
+        hot_chunks = iter(hot_chunks)
+        first = next(hot_chunks, None)
+        cutoff = pd.to_datetime(first['日期']).min() if first is not None and not first.empty else None
+        start, end = _to_date(start), _to_date(end)
+        for partition in self.partitions(house):
+            if not partition.overlaps(start, end):
+                continue
+            df = partition.load()
+            dates = pd.to_datetime(df['日期'])
+            keep = np.ones(len(df), dtype=bool)
+            if start is not None:
+                keep &= (dates >= pd.Timestamp(start)).to_numpy()
+            if end is not None:
+                keep &= (dates <= pd.Timestamp(end)).to_numpy()
+            if cutoff is not None:
+                keep &= (dates < cutoff).to_numpy()
+            if keep.any():
+                yield df[keep]
+        if first is not None:
+            yield first
+            yield from hot_chunks
+
+    def closed_cycles(self, sheets):
+        """各鸡舍工作表中已结束、可以归档的批次：{工作表: [(起始位置, 结束位置)]}
+
+        批次边界取sheets中的进雏记录，没有进雏记录工作表时按日龄识别。
+        """
+        registry = cycle_registry(sheets.get(PLACEMENT_SHEET))
+        result = {}
+        for sheet_name, df in sheets.items():
+            if not is_house_sheet(sheet_name) or df is None or df.empty:
+                continue
+            starts = cycle_starts(_sorted(df), registry.house(sheet_name))
+            if len(starts) > 1:
+                result[sheet_name] = list(zip(starts[:-1], starts[1:]))
+        return result
+
+    def archive_closed_cycles(self, sheets, sheet_names=None):
+        """把工作表中已结束的批次写入归档，工作表只保留当前批次；返回{工作表: 归档的记录数}
+
+        在commit的apply中调用：批次文件先写入，再随提交保存缩短后的工作表。
+        """
+        if sheet_names is not None:
+            sheets_to_check = {name: sheets[name] for name in [*sheet_names, PLACEMENT_SHEET] if name in sheets}
+        else:
+            sheets_to_check = sheets
+        archived = {}
+        for sheet_name, cycles in self.closed_cycles(sheets_to_check).items():
+            df = _sorted(sheets[sheet_name])
+            for lo, hi in cycles:
+                self.write(int(sheet_name), df.iloc[lo:hi])
+            active = cycles[-1][1]
+            sheets[sheet_name] = df.iloc[active:].reset_index(drop=True)
+            archived[sheet_name] = active
+        return archived
+
+    def restore(self, sheets, house):
+        """把鸡舍已归档的批次合并回工作表，返回这些批次
+
+        在commit的apply中调用；提交成功后再用remove删除批次文件。
+        """
+        partitions = self.partitions(house)
+        if partitions:
+            sheet_name = str(house)
+            sheets[sheet_name] = self.history(house, sheets.get(sheet_name))
+        return partitions
+
+    def remove(self, partitions):
+        """删除已合并回工作表的批次文件"""
+        for partition in partitions:
+            try:
+                os.remove(partition.path)
+            except FileNotFoundError:
+                pass
+
+
+def _sorted(df):
+    """按日期排序（已有序时不复制）"""
+    dates = pd.to_datetime(df['日期'])
+    if dates.is_monotonic_increasing:
+        return df
+    return df.sort_values('日期', key=pd.to_datetime, kind='stable', ignore_index=True)
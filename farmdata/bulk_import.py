@@ -0,0 +1,247 @@
+"""批量导入日常、称重、采购记录（CSV或xlsx）
+
+所有行在一次向量化校验中完成检查：必填列、取值范围、与已有记录及文件内部的重复，
+缺少日龄时按与calculate_age_for_date相同的规则推算（有进雏记录时由进雏日期计算）。通过校验的记录一次写入，
+每个受影响的鸡舍只重算一次存栏数。
+"""
+import io
+
+import numpy as np
+import pandas as pd
+
+from farmdata.cycles import house_cycles
+from farmdata.date_index import ages_from_anchors, house_index
+from farmdata.schema import (
+    DAILY_COLUMNS,
+    FEED_TYPES,
+    PURCHASE_COLUMNS,
+    PURCHASE_SHEET,
+    WEIGHT_COLUMNS,
+    WEIGHT_SHEET,
+    is_house_sheet,
+)
+from farmdata.stock import initial_stock, recalculate_stock
+
+DAILY = "日常数据"
+WEIGHT = "体重数据"
+PURCHASE = "采购记录"
+RECORD_TYPES = [DAILY, WEIGHT, PURCHASE]
+
+# 各类记录导入文件需要的列（日龄、均重可省略，由系统计算）
+REQUIRED_COLUMNS = {
+    DAILY: ["日期", "鸡舍编号", "单日耗料(kg)", "单日死亡(只)", "单日淘汰(只)"],
+    WEIGHT: ["日期", "鸡舍编号", "鸡笼编号", "层数", "样本数量", "总重量(kg)"],
+    PURCHASE: ["日期", "鸡舍编号", "采购饲料(kg)", "料号"],
+}
+
+# 取值范围与录入表单一致
+RANGES = {
+    DAILY: {"单日耗料(kg)": (0, 20000), "单日死亡(只)": (0, 1000), "单日淘汰(只)": (0, 1000), "日龄": (1, 1000)},
+    WEIGHT: {"鸡笼编号": (1, 100), "样本数量": (1, 100), "总重量(kg)": (0, 50), "日龄": (1, 1000)},
+    PURCHASE: {"采购饲料(kg)": (0, 50000)},
+}
+
+LAYERS = ["1层", "2层", "3层", "4层"]
+
+
+class ImportResult:
+    """校验结果：rows为可导入的记录，errors为有问题的行（行号、原因）"""
+    def __init__(self, record_type, rows, errors):
+        self.record_type = record_type
+        self.rows = rows
+        self.errors = errors
+
+
+def read_upload(data, filename):
+    """读取上传的CSV或xlsx文件"""
+    if filename.lower().endswith(".csv"):
+        return pd.read_csv(io.BytesIO(data), encoding="utf-8-sig")
+    return pd.read_excel(io.BytesIO(data))
+
+
+def template(record_type):
+    """导入模板（只有表头的CSV）"""
+    columns = REQUIRED_COLUMNS[record_type] + (["日龄"] if record_type != PURCHASE else [])
+    return pd.DataFrame(columns=columns).to_csv(index=False).encode("utf-8-sig")
+
+
+def _existing_daily_keys(sheets):
+    frames = [pd.DataFrame({"鸡舍编号": int(name), "日期": pd.to_datetime(df['日期'])})
+              for name, df in sheets.items() if is_house_sheet(name) and not df.empty]
+    if not frames:
+        return pd.MultiIndex.from_arrays([[], []], names=["鸡舍编号", "日期"])
+    keys = pd.concat(frames, ignore_index=True)
+    return pd.MultiIndex.from_frame(keys[["鸡舍编号", "日期"]])
+
+
+def _derive_ages(sheets, rows):
+    """缺少日龄的行按该鸡舍已有记录（及文件中给出日龄的行）推算日龄"""
+    ages = rows["日龄"].to_numpy(dtype=float, copy=True)
+    missing = np.isnan(ages)
+    if not missing.any():
+        return ages.astype(np.int64)
+    for house_num, group in rows[missing].groupby("鸡舍编号"):
+        existing = sheets.get(str(house_num))
+        anchor_dates = np.array([], dtype='datetime64[D]')
+        anchor_ages = np.array([], dtype=np.int64)
+        if existing is not None and not existing.empty:
+            index = house_index(existing)
+            anchor_dates, anchor_ages = index.dates, index.ages
+        given = rows[(rows["鸡舍编号"] == house_num) & ~missing]
+        if not given.empty:
+            anchor_dates = np.concatenate([anchor_dates, given["日期"].to_numpy(dtype='datetime64[D]')])
+            anchor_ages = np.concatenate([anchor_ages, given["日龄"].to_numpy(dtype=np.int64)])
+            order = np.argsort(anchor_dates, kind='stable')
+            anchor_dates, anchor_ages = anchor_dates[order], anchor_ages[order]
+        target = group["日期"].to_numpy(dtype='datetime64[D]')
+        derived = ages_from_anchors(anchor_dates, anchor_ages, target).astype(float)
+        # 属于已登记批次的日期，日龄由进雏日期计算
+        cycle_ages = house_cycles(sheets, house_num).ages(target)
+        derived = np.where(np.isnan(cycle_ages), derived, cycle_ages)
+        ages[rows.index.get_indexer(group.index)] = derived
+    return ages.astype(np.int64)
+
+
+def validate(record_type, upload, sheets, houses=range(1, 17), archive=None):
+    """一次性校验上传的全部行，返回ImportResult
+
+    archive为鸡场的批次归档（CycleArchive）：日常数据的日期落在已归档批次内时拒绝，
+    否则工作表中的新记录会遮蔽归档中的同一天；需要补录时先恢复该鸡舍的归档。
+    """
+    missing_columns = [c for c in REQUIRED_COLUMNS[record_type] if c not in upload.columns]
+    if missing_columns:
+        raise ValueError(f"缺少列：{'、'.join(missing_columns)}")
+
+    rows = upload.copy().reset_index(drop=True)
+    reasons = pd.Series("", index=rows.index)
+
+    def flag(mask, message):
+        nonlocal reasons
+        reasons = reasons.mask(mask, reasons + message + "；")
+
+    rows["日期"] = pd.to_datetime(rows["日期"], errors="coerce")
+    flag(rows["日期"].isna(), "日期无效")
+
+    rows["鸡舍编号"] = pd.to_numeric(rows["鸡舍编号"], errors="coerce")
+    flag(~rows["鸡舍编号"].isin(list(houses)), "鸡舍编号无效")
+
+    if record_type != PURCHASE:
+        rows["日龄"] = pd.to_numeric(rows["日龄"], errors="coerce") if "日龄" in rows.columns else np.nan
+
+    for column, (low, high) in RANGES[record_type].items():
+        values = pd.to_numeric(rows[column], errors="coerce")
+        rows[column] = values
+        bad = values.notna() & ((values < low) | (values > high))
+        if column != "日龄":
+            bad |= values.isna()
+        flag(bad, f"{column}应在{low}~{high}之间")
+
+    if record_type == WEIGHT:
+        # 层数可以写成1~4或“1层”
+        layer = rows["层数"].astype(str).str.strip()
+        rows["层数"] = layer.where(layer.str.endswith("层"), layer + "层")
+        flag(~rows["层数"].isin(LAYERS), "层数应为1层~4层")
+    if record_type == PURCHASE:
+        rows["料号"] = rows["料号"].astype(str).str.strip()
+        flag(~rows["料号"].isin(FEED_TYPES), f"料号应为{'/'.join(FEED_TYPES)}")
+
+    # 重复检查：文件内部，以及与已有记录
+    if record_type == DAILY:
+        key_columns = ["鸡舍编号", "日期"]
+        existing = _existing_daily_keys(sheets)
+    elif record_type == WEIGHT:
+        key_columns = ["鸡舍编号", "日期", "鸡笼编号", "层数"]
+        existing_df = sheets.get(WEIGHT_SHEET)
+        existing = pd.MultiIndex.from_arrays([[]] * len(key_columns), names=key_columns)
+        if existing_df is not None and not existing_df.empty:
+            keys = existing_df[key_columns].assign(日期=pd.to_datetime(existing_df["日期"]))
+            existing = pd.MultiIndex.from_frame(keys)
+    else:
+        key_columns, existing = None, None
+    if key_columns is not None:
+        flag(rows.duplicated(key_columns, keep=False) & rows[key_columns].notna().all(axis=1), "文件内重复")
+        if len(existing):
+            flag(pd.MultiIndex.from_frame(rows[key_columns]).isin(existing), "已存在相同记录")
+    if record_type == DAILY and archive is not None:
+        archived = np.zeros(len(rows), dtype=bool)
+        known = rows["鸡舍编号"].isin(list(houses)) & rows["日期"].notna()
+        for house_num in rows.loc[known, "鸡舍编号"].unique():
+            mask = (known & (rows["鸡舍编号"] == house_num)).to_numpy()
+            archived[mask] = archive.covered(int(house_num), rows.loc[mask, "日期"])
+        flag(archived, "日期属于已归档的批次，请先恢复该鸡舍的归档")
+
+    valid = reasons == ""
+    errors = pd.DataFrame({"行号": rows.index[~valid] + 2, "原因": reasons[~valid].str.rstrip("；")})
+    rows = rows[valid].copy()
+    if rows.empty:
+        return ImportResult(record_type, rows, errors)
+
+    rows["鸡舍编号"] = rows["鸡舍编号"].astype(np.int64)
+    if record_type == DAILY:
+        rows["日龄"] = _derive_ages(sheets, rows)
+        rows["存栏数"] = 0
+        rows = rows[DAILY_COLUMNS]
+    elif record_type == WEIGHT:
+        # 称重日龄与日常数据的时间线一致
+        rows["日龄"] = _derive_ages(sheets, rows)
+        rows["均重(g)"] = (rows["总重量(kg)"] / rows["样本数量"] * 1000).round(1)
+        rows = rows[WEIGHT_COLUMNS]
+    else:
+        rows = rows[PURCHASE_COLUMNS]
+    rows["日期"] = rows["日期"].dt.date
+    return ImportResult(record_type, rows.reset_index(drop=True), errors)
+
+
+def _appends(existing, rows):
+    """新记录是否都不早于已有记录：此时按日期排好的新记录可以直接追加到表尾，不需要重写工作表"""
+    if existing is None or existing.empty:
+        return False
+    dates = pd.to_datetime(existing['日期'])
+    return dates.is_monotonic_increasing and pd.to_datetime(rows['日期']).min() >= dates.iat[-1]
+
+
+def apply_import(sheets, result):
+    """把校验通过的记录写入工作表字典（每个鸡舍只重算一次存栏数），返回受影响的工作表
+
+    新记录都不早于工作表中已有的记录时（如设备实时上报）追加到表尾，否则整表重写。
+    """
+    rows = result.rows
+    if rows.empty:
+        return []
+    if result.record_type == PURCHASE:
+        sheets.append_rows(PURCHASE_SHEET, rows)
+        return [PURCHASE_SHEET]
+    if result.record_type == WEIGHT:
+        existing = sheets.get(WEIGHT_SHEET, pd.DataFrame(columns=WEIGHT_COLUMNS))
+        if _appends(existing, rows):
+            sheets.append_rows(WEIGHT_SHEET, rows.sort_values('日期', kind='stable'))
+            return [WEIGHT_SHEET]
+        df = pd.concat([existing, rows], ignore_index=True)
+        df['日期'] = pd.to_datetime(df['日期'])
+        sheets[WEIGHT_SHEET] = df.sort_values('日期', kind='stable').reset_index(drop=True)
+        return [WEIGHT_SHEET]
+
+    changed = []
+    for house_num, group in rows.groupby("鸡舍编号"):
+        sheet_name = str(house_num)
+        existing = sheets.get(sheet_name)
+        stock = initial_stock(existing)
+        cycles = house_cycles(sheets, house_num)
+        if _appends(existing, group):
+            # 只追加新行：接着已有记录重算新行的存栏数
+            group = group.sort_values('日期', kind='stable')
+            df = pd.concat([existing, group], ignore_index=True)
+            df['日期'] = pd.to_datetime(df['日期'])
+            df = recalculate_stock(df, stock, start_date=group['日期'].iat[0], cycles=cycles)
+            new_rows = df.iloc[len(existing):].reset_index(drop=True)
+            new_rows['日期'] = new_rows['日期'].dt.date
+            sheets.append_rows(sheet_name, new_rows)
+            changed.append(sheet_name)
+            continue
+        df = group if existing is None else pd.concat([existing, group], ignore_index=True)
+        df['日期'] = pd.to_datetime(df['日期'])
+        df = df.sort_values('日期').reset_index(drop=True)
+        # 从本次导入的最早日期开始重算存栏数
+        sheets[sheet_name] = recalculate_stock(df, stock, start_date=group['日期'].min(), cycles=cycles)
+        changed.append(sheet_name)
+    return changed
@@ -0,0 +1,116 @@
+"""命令行维护工具：不打开页面，在夜间等空闲时段执行整表运算
+
+运行方式（在项目根目录）：
+    python -m farmdata --workbook D:/原始数据/chicken.xlsx nightly --output reports
+    python -m farmdata --farms farms.json --farm 一场 validate
+
+命令：
+    validate       校验全部工作表，发现问题时退出码为1
+    recompute      按鸡舍并行重算日龄和存栏数，有改动的鸡舍一次提交
+    rebuild-cache  把日志写回工作簿并重建列式缓存；SQLite为重建索引
+    report         输出鸡舍指标、全场合计、饲料库存和最近称重（CSV）
+    nightly        依次执行 validate、recompute、rebuild-cache、report
+未指定--workbook时按鸡场配置（--farms，默认为环境变量CHICKEN_FARMS）处理全部或--farm指定的鸡场。
+写入使用与页面相同的写锁，页面运行时也可以执行。
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+from farmdata import maintenance
+from farmdata.farms import load_farms
+from farmdata.growth import load_standard
+from farmdata.storage import open_storage
+
+COMMANDS = ["validate", "recompute", "rebuild-cache", "report", "nightly"]
+
+
+def _print_issues(issues, limit=20):
+    counts = issues.groupby("问题", sort=False).size()
+    for message, count in counts.items():
+        print(f"    {message}：{count} 处")
+    if len(issues) > limit:
+        print(f"    （前{limit}条）")
+    print(issues.head(limit).to_string(index=False, na_rep=""))
+
+
+def _standard(farm, path):
+    """品种标准体重表：与页面相同，默认为工作簿同目录的 品种标准.csv，没有时使用内置标准"""
+    path = path or os.path.join(os.path.dirname(farm.path), "品种标准.csv")
+    return load_standard(path) if os.path.exists(path) else None
+
+
+def run_farm(farm, args, output):
+    """对一个鸡场执行命令，返回发现的问题数"""
+    steps = ["validate", "recompute", "rebuild-cache", "report"] if args.command == "nightly" else [args.command]
+    storage = open_storage(farm.path, farm.backend)
+    problems = 0
+    for step in steps:
+        started = time.perf_counter()
+        if step == "validate":
+            issues = maintenance.validate(storage.load_all_sheets(), farm.houses, args.workers)
+            problems += len(issues)
+            print(f"[{farm.name}] 校验：{len(issues)} 个问题")
+            if not issues.empty:
+                _print_issues(issues)
+                if output:
+                    os.makedirs(output, exist_ok=True)
+                    issues.to_csv(os.path.join(output, "校验问题.csv"), encoding="utf-8-sig", index=False)
+        elif step == "recompute":
+            changed = maintenance.recompute(storage, args.workers)
+            storage.compact()
+            print(f"[{farm.name}] 重算：{len(changed)} 个鸡舍有改动，共 {sum(changed.values())} 条记录")
+            for sheet_name, count in sorted(changed.items(), key=lambda item: int(item[0])):
+                print(f"    鸡舍{sheet_name}：{count} 条")
+        elif step == "rebuild-cache":
+            maintenance.rebuild_caches(storage)
+            print(f"[{farm.name}] 已重建缓存和索引")
+        elif step == "report":
+            reports = maintenance.build_reports(storage.load_all_sheets(), farm.houses, args.date,
+                                                _standard(farm, args.standard))
+            print(f"[{farm.name}] 全场合计：")
+            print(reports["全场合计"].to_string(index=False, na_rep="—"))
+            if output:
+                for path in maintenance.write_reports(reports, output):
+                    print(f"    已写出 {path}")
+        print(f"    用时 {time.perf_counter() - started:.1f}s")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m farmdata", description="鸡舍数据离线维护")
+    parser.add_argument("command", choices=COMMANDS)
+    parser.add_argument("--workbook", help="工作簿路径；不指定时按鸡场配置处理")
+    parser.add_argument("--storage", default=os.environ.get("CHICKEN_STORAGE", "excel"), choices=["excel", "sqlite"])
+    parser.add_argument("--farms", default=os.environ.get("CHICKEN_FARMS"), help="鸡场配置文件")
+    parser.add_argument("--farm", action="append", help="只处理指定的鸡场，可以重复")
+    parser.add_argument("--workers", type=int, help="进程数，默认为CPU核数")
+    parser.add_argument("--output", help="报表和校验结果的输出目录")
+    parser.add_argument("--date", type=date.fromisoformat, default=None, help="饲料库存的日期（YYYY-MM-DD），默认为今天")
+    parser.add_argument("--standard", default=os.environ.get("CHICKEN_BREED_STANDARD"), help="品种标准体重CSV")
+    args = parser.parse_args(argv)
+    args.date = args.date or date.today()
+
+    if args.workbook is None and not args.farms:
+        parser.error("需要--workbook或鸡场配置（--farms）")
+    try:
+        farms = load_farms(None if args.workbook else args.farms, args.workbook, args.storage)
+    except (OSError, ValueError) as e:
+        parser.error(f"鸡场配置读取失败：{e}")
+    if args.farm:
+        unknown = set(args.farm) - {farm.name for farm in farms}
+        if unknown:
+            parser.error(f"未配置的鸡场：{'、'.join(sorted(unknown))}")
+        farms = [farm for farm in farms if farm.name in args.farm]
+
+    problems = 0
+    for farm in farms:
+        output = args.output and (os.path.join(args.output, farm.name) if len(farms) > 1 else args.output)
+        problems += run_farm(farm, args, output)
+    return 1 if problems and args.command in ("validate", "nightly") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
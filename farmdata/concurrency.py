@@ -0,0 +1,67 @@
+"""多会话并发写入：写操作串行化，读操作使用快照不加锁
+
+每个会话读取的工作表字典都带有读取时的数据版本号。提交改动时先获取写锁，
+若版本号未变则直接保存；若期间其他会话已写入，则读取最新数据并重新应用改动，
+不会覆盖别人的记录。
+"""
+import pandas as pd
+
+from farmdata import profiling
+from farmdata.storage import SheetDict
+
+
+class ConflictError(Exception):
+    """改动无法在最新数据上应用（例如记录已被其他会话删除）"""
+
+
+def save_changes(storage, sheets):
+    """保存工作表字典中的改动：整表替换的工作表和追加的新行"""
+    dirty = getattr(sheets, 'dirty', None)
+    if dirty is None:
+        storage.save_sheets(sheets)
+        return
+    if dirty:
+        storage.save_sheets(sheets, set(dirty))
+    for sheet_name, rows in sheets.appended.items():
+        if sheet_name not in dirty:
+            storage.append_rows(sheet_name, pd.concat(rows, ignore_index=True))
+    sheets.mark_saved()
+
+
+def commit(storage, snapshot, apply, on_commit=None):
+    """在写锁内提交改动
+
+    apply(sheets)在工作表字典上做修改并返回结果。快照版本与存储一致时直接
+    在快照上修改；否则说明其他会话已写入，在最新数据上重新执行apply。
+    on_commit(sheets, replaced, appended, before, after)在保存后、释放写锁前调用，
+    replaced为整表替换的工作表，appended为{工作表: 追加的新行}，before、after为提交前后的版本号。
+    """
+    with storage.write_lock:
+        current = storage.version()
+        sheets = snapshot
+        if getattr(snapshot, 'version', None) != current or getattr(snapshot, 'dirty', None):
+            sheets = SheetDict(storage.load_all_sheets(), version=current)
+        result = apply(sheets)
+        # 普通字典没有改动记录，保存时整体写出
+        dirty = getattr(sheets, 'dirty', None)
+        replaced = set(sheets) if dirty is None else set(dirty)
+        appended = {name: pd.concat(rows, ignore_index=True)
+                    for name, rows in getattr(sheets, 'appended', {}).items() if name not in replaced}
+        with profiling.span("save_changes") as info:
+            save_changes(storage, sheets)
+            if info is not None:
+                # 写出的数据：整表替换的工作表和追加的新行
+                size = profiling.frame_size({**{name: sheets[name] for name in replaced if name in sheets},
+                                             **appended})
+                info.update(size)
+        saved = storage.version()
+        if on_commit is not None:
+            on_commit(sheets, replaced, appended, current, saved)
+        if sheets is not snapshot:
+            # 让调用方的快照看到最新数据
+            dict.clear(snapshot)
+            dict.update(snapshot, sheets)
+        if hasattr(snapshot, 'version'):
+            # 快照已与存储中的数据一致
+            snapshot.version = saved
+        return result
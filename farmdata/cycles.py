@@ -0,0 +1,159 @@
+"""鸡群批次（进雏记录）：各鸡舍每批鸡的进雏日期、进雏数量和品种
+
+某一天所属的批次是该日期当天或之前最近的一次进雏，之后：
+    日龄 = 日期 - 进雏日期 + 1
+    存栏 = 进雏数量 - 进雏以来的死亡、淘汰合计（由累计和之差得到）
+查找批次只在进雏日期数组上二分查找，不需要扫描或排序鸡舍工作表，缺少某几天的记录也不影响结果。
+没有进雏记录的鸡舍仍按原有规则由日常记录推算。
+"""
+import numpy as np
+import pandas as pd
+
+from farmdata.date_index import house_index
+from farmdata.frames import per_frame_cache, to_day
+from farmdata.schema import PLACEMENT_SHEET
+from farmdata.stock import initial_stock as infer_initial_stock, recalculate_stock
+
+class HouseCycles:
+    """单个鸡舍按进雏日期排序的批次"""
+    def __init__(self, dates=None, counts=None, breeds=None):
+        self.dates = np.array([], dtype='datetime64[D]') if dates is None else dates
+        self.counts = np.array([], dtype=np.int64) if counts is None else counts
+        self.breeds = np.array([], dtype=object) if breeds is None else breeds
+
+    def __len__(self):
+        return len(self.dates)
+
+    def find(self, date):
+        """日期所属批次的序号（从0开始）；早于第一次进雏时返回-1"""
+        return int(np.searchsorted(self.dates, to_day(date), side='right')) - 1
+
+    def find_all(self, dates):
+        """批量查找多个日期所属的批次"""
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        return np.searchsorted(self.dates, dates, side='right') - 1
+
+    def cycle(self, date):
+        """日期所属批次的信息；没有所属批次时返回None"""
+        i = self.find(date)
+        if i < 0:
+            return None
+        return {
+            "批次": i + 1,
+            "进雏日期": self.dates[i].astype(object),
+            "进雏数量": self.counts[i],
+            "品种": self.breeds[i],
+        }
+
+    def age(self, date):
+        """日期对应的日龄；没有所属批次时返回None"""
+        i = self.find(date)
+        if i < 0:
+            return None
+        return int((to_day(date) - self.dates[i]).astype(int)) + 1
+
+    def ages(self, dates):
+        """批量计算日龄，没有所属批次的日期为NaN"""
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        if not len(self):
+            return np.full(len(dates), np.nan)
+        i = self.find_all(dates)
+        ages = (dates - self.dates[np.maximum(i, 0)]).astype(np.int64) + 1
+        return np.where(i >= 0, ages, np.nan)
+
+    def stock(self, date, totals):
+        """日期当天的存栏数：进雏数量减去进雏以来的死亡、淘汰
+
+        totals(start, end)返回日期范围（含首尾）内的合计，如HouseAggregates.totals。
+        没有所属批次时返回None。
+        """
+        i = self.find(date)
+        if i < 0:
+            return None
+        losses = totals(self.dates[i].astype(object), date)
+        return self.counts[i] - losses["死亡(只)"] - losses["淘汰(只)"]
+
+
+class CycleRegistry:
+    """全部鸡舍的批次，由进雏记录工作表建立"""
+    def __init__(self, df=None):
+        self._houses = {}
+        if df is None or df.empty:
+            return
+        data = pd.DataFrame({
+            "日期": pd.to_datetime(df['日期'], errors='coerce'),
+            "鸡舍": pd.to_numeric(df['鸡舍编号'], errors='coerce'),
+            "进雏数量": pd.to_numeric(df['进雏数量'], errors='coerce'),
+            "品种": df['品种'] if '品种' in df.columns else None,
+        }).dropna(subset=["日期", "鸡舍", "进雏数量"])
+        data = data.sort_values(["鸡舍", "日期"], kind='stable')
+        for house, group in data.groupby("鸡舍", sort=False):
+            self._houses[int(house)] = HouseCycles(
+                group["日期"].to_numpy(dtype='datetime64[D]'),
+                group["进雏数量"].round().to_numpy(dtype=np.int64),
+                group["品种"].to_numpy(dtype=object),
+            )
+
+    def house(self, house_num):
+        """鸡舍的批次；没有进雏记录时为空"""
+        return self._houses.get(int(house_num), HouseCycles())
+
+    def houses(self):
+        return sorted(self._houses)
+
+
+_registry = per_frame_cache(CycleRegistry)
+
+
+def cycle_registry(df):
+    """获取进雏记录DataFrame对应的批次登记；没有进雏记录工作表时为空"""
+    return CycleRegistry() if df is None else _registry(df)
+
+
+def house_cycles(sheets, house_num):
+    """从工作表字典中取出鸡舍的批次"""
+    return cycle_registry(sheets.get(PLACEMENT_SHEET)).house(house_num)
+
+
+def age_for_date(sheets, house_num, date):
+    """日期对应的日龄：有进雏记录时由进雏日期计算，否则根据鸡舍已有记录推算，没有记录时为1"""
+    age = house_cycles(sheets, house_num).age(date)
+    if age is not None:
+        return age
+    df = sheets.get(str(house_num))
+    if df is None or df.empty:
+        return 1
+    # 在日期索引中二分查找：以目标日期当天或之前最近的记录为基准推算，
+    # 早于所有记录时从第一条记录向前推算
+    return house_index(df).age_for_date(date)
+
+
+def house_initial_stock(sheets, house_num, date=None):
+    """鸡舍的初始存栏数；date属于某个批次时为该批次的进雏数量"""
+    if date is not None:
+        cycle = house_cycles(sheets, house_num).cycle(date)
+        if cycle is not None:
+            return int(cycle["进雏数量"])
+    # 最早记录的存栏数 + 死亡 + 淘汰（推算初始值），没有记录时为默认初始存栏
+    return infer_initial_stock(sheets.get(str(house_num)))
+
+
+def refresh_house(df, cycles, start_date=None, initial_stock=None):
+    """按批次重新计算鸡舍工作表中start_date及之后记录的日龄和存栏数，返回新的DataFrame
+
+    用于登记、修改或删除进雏记录之后：属于某个批次的记录日龄改为由进雏日期计算，
+    存栏数从该批次的进雏数量重新累计。
+    """
+    if df is None or df.empty:
+        return df
+    if initial_stock is None:
+        initial_stock = infer_initial_stock(df)
+    df = df.copy()
+    dates = pd.to_datetime(df['日期']).to_numpy(dtype='datetime64[D]')
+    ages = cycles.ages(dates)
+    mask = ~np.isnan(ages)
+    if start_date is not None:
+        mask &= dates >= to_day(start_date)
+    if mask.any():
+        df.loc[mask, '日龄'] = ages[mask].astype(np.int64)
+    return recalculate_stock(df, initial_stock, start_date=start_date, cycles=cycles)
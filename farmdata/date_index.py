@@ -0,0 +1,84 @@
+"""鸡舍日期索引：按日期排序的NumPy数组，日龄查询、重复检查均为二分查找
+
+索引按DataFrame对象缓存。工作簿每个版本的DataFrame只建一次索引，
+工作表被替换（新的DataFrame）后自动重建。
+"""
+import numpy as np
+import pandas as pd
+
+from farmdata.frames import per_frame_cache, to_day
+
+
+def ages_from_anchors(anchor_dates, anchor_ages, target_dates):
+    """按日龄推算规则批量计算日龄（与HouseIndex.age_for_date相同）
+
+    anchor_dates为已排序的datetime64[D]数组。以目标日期当天或之前最近的记录为基准
+    向后推算；早于所有记录时从第一条记录向前推算，日龄不小于1；没有记录时为1。
+    """
+    target_dates = np.asarray(target_dates, dtype='datetime64[D]')
+    if not len(anchor_dates):
+        return np.ones(len(target_dates), dtype=np.int64)
+    i = np.searchsorted(anchor_dates, target_dates, side='right') - 1
+    before_all = i < 0
+    i = np.where(before_all, 0, i)
+    days_diff = (target_dates - anchor_dates[i]).astype(np.int64)
+    ages = anchor_ages[i] + days_diff
+    return np.where(before_all, np.maximum(1, ages), ages)
+
+
+class HouseIndex:
+    """单个鸡舍按日期排序的记录索引"""
+    def __init__(self, df):
+        dates = pd.to_datetime(df['日期']).to_numpy(dtype='datetime64[D]')
+        valid = np.flatnonzero(~np.isnat(dates))
+        # 稳定排序，同一天的多条记录保持原有顺序
+        order = valid[np.argsort(dates[valid], kind='stable')]
+        self.positions = order
+        self.dates = dates[order]
+        self.ages = df['日龄'].to_numpy()[order]
+        self.stocks = df['存栏数'].to_numpy()[order] if '存栏数' in df.columns else None
+        self.deaths = df['单日死亡(只)'].to_numpy()[order] if '单日死亡(只)' in df.columns else None
+        self.culls = df['单日淘汰(只)'].to_numpy()[order] if '单日淘汰(只)' in df.columns else None
+
+    def __len__(self):
+        return len(self.dates)
+
+    def positions_on(self, date):
+        """某一天的记录在原DataFrame中的位置"""
+        day = to_day(date)
+        lo = np.searchsorted(self.dates, day, side='left')
+        hi = np.searchsorted(self.dates, day, side='right')
+        return np.sort(self.positions[lo:hi])
+
+    def contains(self, date):
+        """是否已有该日期的记录"""
+        day = to_day(date)
+        i = np.searchsorted(self.dates, day, side='left')
+        return i < len(self.dates) and self.dates[i] == day
+
+    def age_for_date(self, target_date):
+        """指定日期的日龄：以该日期当天或之前最近的记录为基准推算"""
+        if not len(self.dates):
+            return 1
+        day = to_day(target_date)
+        i = np.searchsorted(self.dates, day, side='right') - 1
+        if i < 0:
+            # 目标日期早于所有记录：从第一条记录向前推算，日龄不能小于1
+            days_diff = (self.dates[0] - day).astype(int)
+            return max(1, self.ages[0] - days_diff)
+        days_diff = (day - self.dates[i]).astype(int)
+        return self.ages[i] + days_diff
+
+    def ages_for_dates(self, target_dates):
+        """批量计算多个日期的日龄"""
+        return ages_from_anchors(self.dates, self.ages, target_dates)
+
+    def initial_stock(self):
+        """最早记录的存栏数 + 死亡 + 淘汰（推算初始存栏）"""
+        return self.stocks[0] + self.deaths[0] + self.culls[0]
+
+
+@per_frame_cache
+def house_index(df):
+    """获取DataFrame对应的日期索引"""
+    return HouseIndex(df)
@@ -0,0 +1,138 @@
+"""数据导出：把按块读取的记录逐块写成CSV、Parquet或xlsx文件
+
+写入过程中只保留当前这一块记录，不把全部结果拼成一个DataFrame：
+    CSV      逐块追加文本
+    Parquet  每块写成一个行组（pyarrow.parquet.ParquetWriter）
+    xlsx     openpyxl只写模式逐行写入，超过单个工作表的行数上限时续写到新的工作表
+各列按schema中的列定义输出，同一列在各块中的类型保持一致。
+"""
+import os
+
+import openpyxl
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from farmdata.schema import (
+    DAILY_COLUMNS,
+    PLACEMENT_COLUMNS,
+    PLACEMENT_SHEET,
+    PURCHASE_COLUMNS,
+    PURCHASE_SHEET,
+    WEIGHT_COLUMNS,
+    WEIGHT_SHEET,
+)
+
+# 可导出的记录类型：工作表（日常数据为各鸡舍工作表，为None）和输出的列
+DAILY = "日常数据"
+RECORD_TYPES = {
+    DAILY: (None, DAILY_COLUMNS),
+    "称重数据": (WEIGHT_SHEET, WEIGHT_COLUMNS),
+    "采购记录": (PURCHASE_SHEET, PURCHASE_COLUMNS),
+    "进雏记录": (PLACEMENT_SHEET, PLACEMENT_COLUMNS),
+}
+
+# 导出格式：扩展名和下载时的MIME类型
+FORMATS = {
+    "CSV": (".csv", "text/csv"),
+    "Parquet": (".parquet", "application/vnd.apache.parquet"),
+    "Excel": (".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+_TEXT_COLUMNS = {"层数", "料号", "品种"}
+_FLOAT_COLUMNS = {"单日耗料(kg)", "总重量(kg)", "均重(g)", "采购饲料(kg)"}
+# xlsx单个工作表最多1048576行（含表头）
+_XLSX_MAX_ROWS = 1048575
+
+
+def _normalize(chunk, columns):
+    """按列定义整理一块记录：日期为date，整数列可为空，文本列为字符串"""
+    chunk = chunk.reindex(columns=columns)
+    data = {}
+    for column in columns:
+        values = chunk[column]
+        if column == "日期":
+            data[column] = pd.to_datetime(values, errors='coerce').dt.date
+        elif column in _TEXT_COLUMNS:
+            data[column] = values.astype("string")
+        elif column in _FLOAT_COLUMNS:
+            data[column] = pd.to_numeric(values, errors='coerce').astype(float)
+        else:
+            data[column] = pd.to_numeric(values, errors='coerce').round().astype("Int64")
+    return pd.DataFrame(data, columns=columns)
+
+
+def _arrow_schema(columns):
+    fields = []
+    for column in columns:
+        if column == "日期":
+            fields.append(pa.field(column, pa.date32()))
+        elif column in _TEXT_COLUMNS:
+            fields.append(pa.field(column, pa.string()))
+        elif column in _FLOAT_COLUMNS:
+            fields.append(pa.field(column, pa.float64()))
+        else:
+            fields.append(pa.field(column, pa.int64()))
+    return pa.schema(fields)
+
+
+def _write_csv(chunks, path, columns):
+    rows = 0
+    # 带BOM的UTF-8，Excel直接打开时中文不乱码
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        f.write(",".join(columns) + "\n")
+        for chunk in chunks:
+            _normalize(chunk, columns).to_csv(f, header=False, index=False, date_format="%Y-%m-%d")
+            rows += len(chunk)
+    return rows
+
+
+def _write_parquet(chunks, path, columns):
+    rows = 0
+    schema = _arrow_schema(columns)
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in chunks:
+            writer.write_table(pa.Table.from_pandas(_normalize(chunk, columns), schema=schema, preserve_index=False))
+            rows += len(chunk)
+    return rows
+
+
+def _write_xlsx(chunks, path, columns, title):
+    rows = 0
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet, sheet_rows, sheets = None, _XLSX_MAX_ROWS, 0
+    for chunk in chunks:
+        values = _normalize(chunk, columns).astype(object)
+        for row in values.where(values.notna(), None).itertuples(index=False, name=None):
+            if sheet_rows >= _XLSX_MAX_ROWS:
+                sheets += 1
+                sheet = workbook.create_sheet(title if sheets == 1 else f"{title}_{sheets}")
+                sheet.append(columns)
+                sheet_rows = 0
+            sheet.append(row)
+            sheet_rows += 1
+        rows += len(chunk)
+    if sheet is None:
+        workbook.create_sheet(title).append(columns)
+    workbook.save(path)
+    return rows
+
+
+def export_records(chunks, path, file_format, columns, title="数据"):
+    """把chunks中的记录逐块写入path，返回写入的行数
+
+    file_format为FORMATS中的格式，columns为输出的列，title为xlsx的工作表名称。
+    写入失败时删除不完整的文件。
+    """
+    try:
+        if file_format == "CSV":
+            return _write_csv(chunks, path, columns)
+        if file_format == "Parquet":
+            return _write_parquet(chunks, path, columns)
+        if file_format == "Excel":
+            return _write_xlsx(chunks, path, columns, title)
+        raise ValueError(f"不支持的导出格式：{file_format}")
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
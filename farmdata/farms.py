@@ -0,0 +1,169 @@
+"""多个鸡场：每个鸡场有自己的工作簿（或SQLite数据库）和鸡舍编号
+
+鸡场配置为JSON文件，默认为工作簿同目录的 farms.json，也可以用环境变量 CHICKEN_FARMS 指定：
+    [
+        {"name": "一场", "path": "D:/原始数据/一场/chicken.xlsx", "houses": 16},
+        {"name": "二场", "path": "二场/chicken.xlsx", "houses": [1, 2, 3, 5, 6], "storage": "sqlite"}
+    ]
+houses为鸡舍数量（1到N号）或鸡舍编号列表；path为相对路径时相对于配置文件所在目录；
+storage省略时使用默认存储方式。没有配置文件时只有一个鸡场，即原有的工作簿和1到16号鸡舍。
+
+跨场汇总时各鸡场在进程池中并行读取和汇总（openpyxl解析工作簿是纯Python运算，受GIL限制，
+多线程不能并行），子进程只传回各鸡舍的汇总表；主进程把全部鸡场的汇总一次拼接，
+按鸡场分组算出合计指标。
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from farmdata.maintenance import parallel_map
+from farmdata.rollups import HOUSES, summarise_houses, summarise_weights
+from farmdata.schema import WEIGHT_SHEET, is_house_sheet
+from farmdata.storage import ExcelStorage, JournaledExcelStorage, SqliteStorage
+
+# 没有配置文件时唯一鸡场的名称
+DEFAULT_FARM = "本场"
+# 跨场汇总表中全部鸡场合计一行的名称
+ALL_FARMS = "全部鸡场"
+
+_SUMMED = ["存栏数", "初始存栏", "累计死亡", "累计淘汰", "累计耗料(kg)", "批次耗料(kg)", "存栏只日"]
+
+
+class Farm:
+    """一个鸡场：名称、工作簿路径、鸡舍编号和存储方式"""
+    def __init__(self, name, path, houses=HOUSES, backend="excel"):
+        self.name = name
+        self.path = path
+        self.houses = tuple(int(house) for house in houses)
+        self.backend = backend
+
+    def key(self):
+        """可哈希的配置，Farm(*farm.key())得到相同的鸡场"""
+        return (self.name, self.path, self.houses, self.backend)
+
+
+def _houses(value):
+    if isinstance(value, int):
+        return range(1, value + 1)
+    return sorted({int(house) for house in value})
+
+
+def load_farms(config_path, default_path, backend="excel"):
+    """读取鸡场配置，返回Farm列表；配置文件不存在时只有default_path一个鸡场"""
+    if not config_path or not os.path.exists(config_path):
+        return [Farm(DEFAULT_FARM, default_path, HOUSES, backend)]
+    with open(config_path, encoding="utf-8-sig") as f:
+        entries = json.load(f)
+    folder = os.path.dirname(os.path.abspath(config_path))
+    farms, names = [], set()
+    for entry in entries:
+        try:
+            name, path = str(entry["name"]), str(entry["path"])
+        except (KeyError, TypeError):
+            raise ValueError("鸡场配置的每一项都需要name和path") from None
+        if name in names or name == ALL_FARMS:
+            raise ValueError(f"鸡场名称重复或不可用：{name}")
+        houses = _houses(entry.get("houses", len(HOUSES)))
+        if not houses:
+            raise ValueError(f"鸡场{name}没有鸡舍")
+        names.add(name)
+        farms.append(Farm(name, os.path.join(folder, os.path.expanduser(path)), houses,
+                          entry.get("storage", backend)))
+    if not farms:
+        raise ValueError("鸡场配置为空")
+    return farms
+
+
+def _sqlite_path(farm):
+    return os.path.splitext(farm.path)[0] + ".db"
+
+
+def _file_state(path):
+    """文件的修改时间和大小；文件不存在时为None"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def open_shard(farm):
+    """以只读方式打开鸡场的存储：不合并或修复日志、不建表也不导入工作簿，
+    不与该鸡场页面和数据接收服务的写入争用
+    """
+    if farm.backend == "excel":
+        return JournaledExcelStorage(farm.path, batch_size=None)
+    if farm.backend == "sqlite":
+        path = _sqlite_path(farm)
+        # 数据库尚未从工作簿导入时直接读取工作簿
+        return SqliteStorage(path, readonly=True) if os.path.exists(path) else ExcelStorage(farm.path)
+    raise ValueError(f"未知的存储类型：{farm.backend}")
+
+
+def shard_version(farm):
+    """鸡场的数据版本号，只查看文件状态，不打开存储、不读取数据"""
+    if farm.backend == "sqlite":
+        path = _sqlite_path(farm)
+        if not os.path.exists(path):
+            # 数据库尚未从工作簿导入时以工作簿为准，导入后版本号随之变化
+            return ("xlsx", _file_state(farm.path))
+        # WAL模式下提交先写入-wal文件，合并后主文件才变化
+        return (_file_state(path), _file_state(path + "-wal"))
+    return (_file_state(farm.path), _file_state(farm.path + ".journal"))
+
+
+def summarise_farm(farm):
+    """读取一个鸡场的全部工作表并汇总，返回(鸡舍汇总, 称重汇总)；在子进程中运行，只传回汇总表"""
+    storage = open_shard(farm)
+    sheets = storage.load_all_sheets() if storage.version() is not None else {}
+    houses = summarise_houses({int(name): df for name, df in sheets.items()
+                               if is_house_sheet(name) and int(name) in farm.houses})
+    weights = summarise_weights(sheets.get(WEIGHT_SHEET))
+    return houses, weights[weights.index.isin(farm.houses)]
+
+
+def consolidate(summaries):
+    """把各鸡场的汇总一次拼接，按鸡场分组算出合计指标，最后一行为全部鸡场合计
+
+    summaries为{鸡场名称: (鸡舍汇总, 称重汇总)}，结果按summaries的顺序、以鸡场名称为索引。
+    指标的算法与FarmRollups.totals相同。
+    """
+    names = list(summaries)
+    houses = pd.concat({name: houses for name, (houses, _) in summaries.items()}, names=["鸡场", "鸡舍"])
+    weights = pd.concat({name: weights for name, (_, weights) in summaries.items()},
+                        names=["鸡场", "鸡舍"]).reindex(houses.index)
+    data = houses[_SUMMED].astype(float)
+    samples = weights["样本数量"].astype(float)
+    data["鸡舍数"] = 1.0
+    # 只统计已有称重数据的鸡舍
+    data["称重鸡舍耗料(kg)"] = data["批次耗料(kg)"].where(samples.notna())
+    data["活重(kg)"] = data["存栏数"] * weights["总重量(kg)"].astype(float) / samples
+    sums = data.groupby(level="鸡场", sort=False).sum().reindex(names).fillna(0.0)
+    sums.loc[ALL_FARMS] = sums.sum()
+    latest = pd.to_datetime(houses["最近日期"]).groupby(level="鸡场", sort=False).max().reindex(names)
+    latest.loc[ALL_FARMS] = latest.max()
+
+    def ratio(numerator, denominator):
+        return numerator / denominator.where(denominator > 0)
+
+    return pd.DataFrame({
+        "鸡舍数": sums["鸡舍数"].astype(int),
+        "存栏数": sums["存栏数"].astype(np.int64),
+        "死亡率(%)": ratio(sums["累计死亡"], sums["初始存栏"]) * 100,
+        "淘汰率(%)": ratio(sums["累计淘汰"], sums["初始存栏"]) * 100,
+        "只均日耗料(g)": ratio(sums["累计耗料(kg)"] * 1000, sums["存栏只日"]),
+        "料重比": ratio(sums["称重鸡舍耗料(kg)"], sums["活重(kg)"]),
+        "最近日期": latest,
+    }).rename_axis("鸡场")
+
+
+def farm_report(farms, max_workers=None):
+    """读取全部鸡场并汇总，返回consolidate的结果
+
+    各鸡场在进程池中并行读取，进程数默认为鸡场数与CPU核数中较小者；
+    只有一个鸡场或max_workers为1时在当前进程中依次读取。
+    """
+    results = parallel_map(summarise_farm, farms, max_workers)
+    return consolidate({farm.name: result for farm, result in zip(farms, results)})
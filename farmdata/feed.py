@@ -0,0 +1,278 @@
+"""饲料库存台账：采购饲料记录与各鸡舍每日耗料对账，得到任意日期各鸡舍、各料号的库存
+
+日常数据的耗料没有记录料号：按日期做as-of连接，取该鸡舍当天或之前最近一次采购的料号，
+即换料当天起的耗料都记到新料号上；第一次采购之前的耗料记为未对账耗料，不计入库存
+（期初库存未知）。换料时旧料号剩余的库存会留在旧料号下，各料号合计的库存不受影响。
+
+每个鸡舍把采购和耗料按日期合成一条事件序列（同一天采购在前），保存每个事件之后
+各料号的累计采购减累计耗料，即每个事件都是一个库存快照：任意日期的库存只需二分查找
+到该日期最后一个事件，读取对应的快照。提交新的采购或日常数据时，日期不早于已有事件
+的记录直接在序列末尾追加快照，补录或修改历史记录时只重建涉及的鸡舍。
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from farmdata.frames import to_day
+from farmdata.schema import PURCHASE_SHEET
+
+# 默认的鸡舍编号（没有配置鸡场时）
+HOUSES = range(1, 17)
+# 未对账耗料（第一次采购之前的耗料）的料号
+UNMATCHED = ""
+_UNSET = object()
+
+
+def _purchases(df):
+    """采购记录按日期排序的日期、料号、采购量"""
+    if df is None or df.empty:
+        return np.array([], dtype='datetime64[D]'), np.array([], dtype=object), np.array([])
+    data = pd.DataFrame({
+        "日期": pd.to_datetime(df['日期'], errors='coerce'),
+        "料号": df['料号'].astype(str),
+        "采购": pd.to_numeric(df['采购饲料(kg)'], errors='coerce'),
+    }).dropna(subset=["日期"]).sort_values("日期", kind='stable')
+    return (data["日期"].to_numpy(dtype='datetime64[D]'), data["料号"].to_numpy(dtype=object),
+            data["采购"].fillna(0).to_numpy(dtype=float))
+
+
+def _consumption(df):
+    """日常数据按日期排序的日期、耗料"""
+    if df is None or df.empty:
+        return np.array([], dtype='datetime64[D]'), np.array([])
+    data = pd.DataFrame({
+        "日期": pd.to_datetime(df['日期'], errors='coerce'),
+        "耗料": pd.to_numeric(df['单日耗料(kg)'], errors='coerce'),
+    }).dropna(subset=["日期"]).sort_values("日期", kind='stable')
+    return data["日期"].to_numpy(dtype='datetime64[D]'), data["耗料"].fillna(0).to_numpy(dtype=float)
+
+
+class HouseFeed:
+    """单个鸡舍的库存事件序列和每个事件之后的库存快照"""
+    def __init__(self, purchases=None, daily=None):
+        self.purchases = _purchases(purchases)
+        self.daily = _consumption(daily)
+        self._build()
+
+    def _build(self):
+        self.dates = np.array([], dtype='datetime64[D]')
+        self.types = np.array([], dtype=object)
+        self.amounts = np.array([])
+        self.type_names = []
+        # _balances[i]为前i个事件之后各料号的库存，_balances[0]为0；_consumed为累计耗料
+        self._balances = np.zeros((1, 0))
+        self._consumed = np.zeros(1)
+        self._extend(np.arange(len(self.purchases[0])), np.arange(len(self.daily[0])))
+
+    def _extend(self, purchase_positions, daily_positions):
+        """把指定位置的采购和耗料作为新事件接在序列末尾，并计算它们之后的快照"""
+        purchase_dates, purchase_types, purchase_amounts = self.purchases
+        daily_dates, daily_amounts = self.daily
+        daily_dates, daily_amounts = daily_dates[daily_positions], daily_amounts[daily_positions]
+        # as-of连接：每天的耗料记到当天或之前最近一次采购的料号
+        matched = np.searchsorted(purchase_dates, daily_dates, side='right') - 1
+        daily_types = np.full(len(daily_dates), UNMATCHED, dtype=object)
+        daily_types[matched >= 0] = purchase_types[matched[matched >= 0]]
+        dates = np.concatenate([purchase_dates[purchase_positions], daily_dates])
+        # 同一天采购排在耗料之前
+        order = np.lexsort((np.r_[np.zeros(len(purchase_positions)), np.ones(len(daily_dates))], dates))
+        types = np.concatenate([purchase_types[purchase_positions], daily_types])[order]
+        amounts = np.concatenate([purchase_amounts[purchase_positions], -daily_amounts])[order]
+
+        new_names = sorted(set(types) - set(self.type_names))
+        if new_names:
+            # 新出现的料号：之前的快照中库存为0
+            self.type_names = self.type_names + new_names
+            self._balances = np.hstack([self._balances, np.zeros((len(self._balances), len(new_names)))])
+        codes = {name: i for i, name in enumerate(self.type_names)}
+        changes = np.zeros((len(amounts), len(self.type_names)))
+        changes[np.arange(len(amounts)), [codes[name] for name in types]] = amounts
+        self._balances = np.vstack([self._balances, self._balances[-1] + np.cumsum(changes, axis=0)])
+        self._consumed = np.r_[self._consumed, self._consumed[-1] + np.cumsum(np.maximum(-amounts, 0))]
+        self.dates = np.concatenate([self.dates, dates[order]])
+        self.types = np.concatenate([self.types, types])
+        self.amounts = np.concatenate([self.amounts, amounts])
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def last_date(self):
+        return self.dates[-1] if len(self.dates) else None
+
+    def append(self, purchases=None, daily=None):
+        """在序列末尾追加新的采购或耗料，只计算新事件的快照
+
+        新记录早于已有事件，或新采购与已有耗料在同一天（会改变当天耗料的料号）时不追加，返回False。
+        """
+        new_purchases = _purchases(purchases)
+        new_daily = _consumption(daily)
+        last = self.last_date
+        if last is not None:
+            if (len(new_purchases[0]) and new_purchases[0][0] < last) or (len(new_daily[0]) and new_daily[0][0] < last):
+                return False
+            if len(new_purchases[0]) and new_purchases[0][0] == last and (self.amounts[self.dates == last] < 0).any():
+                return False
+        purchase_start, daily_start = len(self.purchases[0]), len(self.daily[0])
+        self.purchases = tuple(np.concatenate([old, new]) for old, new in zip(self.purchases, new_purchases))
+        self.daily = tuple(np.concatenate([old, new]) for old, new in zip(self.daily, new_daily))
+        self._extend(np.arange(purchase_start, len(self.purchases[0])), np.arange(daily_start, len(self.daily[0])))
+        return True
+
+    def replace(self, purchases=_UNSET, daily=_UNSET):
+        """替换采购或耗料记录后重建该鸡舍的快照"""
+        if purchases is not _UNSET:
+            self.purchases = _purchases(purchases)
+        if daily is not _UNSET:
+            self.daily = _consumption(daily)
+        self._build()
+
+    def _position(self, date):
+        """日期当天最后一个事件之后的快照位置"""
+        if date is None:
+            return len(self.dates)
+        return int(np.searchsorted(self.dates, to_day(date), side='right'))
+
+    def balance(self, date=None):
+        """日期当天结束时各料号的库存(kg)，默认为最后一个事件之后"""
+        return pd.Series(self._balances[self._position(date)], index=self.type_names, dtype=float)
+
+    def current_type(self, date=None):
+        """日期当天或之前最近一次采购的料号；没有采购时为None"""
+        purchase_dates, purchase_types, _ = self.purchases
+        i = int(np.searchsorted(purchase_dates, to_day(date), side='right')) - 1 if date is not None \
+            else len(purchase_dates) - 1
+        return purchase_types[i] if i >= 0 else None
+
+    def daily_average(self, days, end=None):
+        """截至end（默认最后一个事件的日期）最近days天的日均耗料(kg)；没有记录时为None"""
+        end = self.last_date if end is None else to_day(end)
+        if end is None:
+            return None
+        start = end - np.timedelta64(days, 'D')
+        consumed = self._consumed[self._position(end)] - self._consumed[
+            int(np.searchsorted(self.dates, start, side='right'))]
+        return consumed / days
+
+    def events(self):
+        """事件序列：日期、料号、数量（采购为正、耗料为负）及之后的库存合计"""
+        return pd.DataFrame({
+            "日期": self.dates.astype('datetime64[ns]'),
+            "料号": self.types,
+            "数量(kg)": self.amounts,
+            "库存合计(kg)": self._balances[1:].sum(axis=1) if len(self.dates) else np.array([]),
+        })
+
+
+class FeedLedger:
+    """按数据版本维护的各鸡舍饲料库存，多个会话共享（与FarmRollups的用法相同）"""
+    def __init__(self, house_numbers=HOUSES):
+        self.house_numbers = list(house_numbers)
+        self.version = _UNSET
+        self.houses = None
+        self.rebuilds = 0
+        self._lock = threading.Lock()
+
+    def sync(self, version, load):
+        """数据版本与台账不一致时用load()读取各鸡舍工作表和采购记录重建，版本一致时不读取数据"""
+        with self._lock:
+            if self.houses is None or self.version != version:
+                sheets = load()
+                self._rebuild(sheets)
+                self.version = getattr(sheets, 'version', version)
+
+    def _rebuild(self, sheets):
+        purchases = _by_house(sheets.get(PURCHASE_SHEET))
+        self.houses = {house: HouseFeed(purchases.get(house), sheets.get(str(house)))
+                       for house in self.house_numbers}
+        self.rebuilds += 1
+
+    def apply_changes(self, sheets, replaced, appended, before, after, load=None):
+        """提交改动后调用（参数与FarmRollups.apply_changes相同，load()读取各鸡舍工作表和采购记录）"""
+        with self._lock:
+            if self.houses is None:
+                return
+            if self.version != before:
+                # 台账落后于提交前的数据
+                self._reload(after, load)
+                return
+            reload_purchases = PURCHASE_SHEET in replaced
+            if not reload_purchases and PURCHASE_SHEET in appended:
+                for house, rows in _by_house(appended[PURCHASE_SHEET]).items():
+                    if house in self.houses and not self.houses[house].append(purchases=rows):
+                        # 补录了早于已有事件的采购：按全部采购记录重建各鸡舍
+                        reload_purchases = True
+                        break
+            if reload_purchases:
+                if PURCHASE_SHEET not in sheets and PURCHASE_SHEET not in replaced:
+                    # 本次提交的数据不包含全部采购记录
+                    self._reload(after, load)
+                    return
+                purchases = _by_house(sheets.get(PURCHASE_SHEET))
+            for house, feed in self.houses.items():
+                sheet_name = str(house)
+                if reload_purchases:
+                    feed.replace(purchases=purchases.get(house))
+                if sheet_name in replaced:
+                    feed.replace(daily=sheets.get(sheet_name))
+                elif sheet_name in appended and not feed.append(daily=appended[sheet_name]):
+                    if sheet_name not in sheets:
+                        self._reload(after, load)
+                        return
+                    feed.replace(daily=sheets[sheet_name])
+            self.version = after
+
+    def _reload(self, after, load):
+        """重建全部鸡舍；没有load时保留原有台账（仍可读取）并标记为过期"""
+        if load is None:
+            self.version = _UNSET
+            return
+        self._rebuild(load())
+        self.version = after
+
+    def rebase(self, before, after):
+        """数据内容不变、只有版本号变化（如日志写回工作簿）时沿用台账"""
+        with self._lock:
+            if self.version == before:
+                self.version = after
+
+    def house(self, house):
+        with self._lock:
+            return self.houses.get(int(house)) if self.houses is not None else None
+
+    def table(self, date=None, days=7, warn_days=3):
+        """各鸡舍在date当天结束时的库存：各料号、合计、近days天日均耗料和预计可用天数
+
+        预计可用天数 = 库存合计 ÷ 近days天日均耗料；不超过warn_days天的鸡舍标记为需要补料。
+        """
+        with self._lock:
+            houses = dict(self.houses)
+        balances = {house: feed.balance(date) for house, feed in houses.items()}
+        numbers = list(houses)
+        table = pd.DataFrame(balances).T.reindex(numbers).fillna(0.0)
+        types = sorted(name for name in table.columns if name != UNMATCHED)
+        current = [houses[house].current_type(date) for house in numbers]
+        # 第一次采购之前的期初库存未知，库存合计不计入未对账耗料；没有采购记录的鸡舍为空值
+        on_hand = table[types].sum(axis=1).where(pd.notna(pd.Series(current, index=numbers)))
+        average = pd.Series([houses[house].daily_average(days, date) for house in numbers], index=numbers, dtype=float)
+        days_left = (on_hand.clip(lower=0) / average.where(average > 0))
+        result = table[types].copy()
+        if UNMATCHED in table.columns:
+            result["未对账耗料(kg)"] = -table[UNMATCHED]
+        result.insert(0, "当前料号", current)
+        result["库存合计(kg)"] = on_hand
+        result[f"近{days}天日均耗料(kg)"] = average
+        result["预计可用天数"] = days_left
+        result["需要补料"] = ((days_left <= warn_days) | (on_hand <= 0) & (average > 0)).fillna(False)
+        result.index.name = "鸡舍"
+        return result
+
+
+def _by_house(df):
+    """按鸡舍拆分采购记录：{鸡舍编号: DataFrame}"""
+    if df is None or df.empty:
+        return {}
+    houses = pd.to_numeric(df['鸡舍编号'], errors='coerce')
+    return {int(house): group for house, group in df.groupby(houses, sort=False)}
+
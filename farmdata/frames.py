@@ -0,0 +1,34 @@
+"""各模块共用的DataFrame工具：日期转换，以及按DataFrame对象缓存的派生结构"""
+import functools
+import weakref
+
+import numpy as np
+import pandas as pd
+
+
+def to_day(value):
+    """把日期、时间或字符串转换为datetime64[D]，便于在日期数组上二分查找"""
+    return np.datetime64(pd.Timestamp(value).date(), 'D')
+
+
+def per_frame_cache(builder):
+    """按DataFrame对象和其余参数缓存builder(df, *args)的结果
+
+    同一对象、同样的参数只计算一次；工作表被替换（新的DataFrame）后重新计算，
+    DataFrame被回收时同时移除缓存的结果。其余参数须可哈希。
+    """
+    cache = {}
+
+    @functools.wraps(builder)
+    def cached(df, *args):
+        key = id(df)
+        entry = cache.get(key)
+        if entry is None or entry[0]() is not df:
+            entry = (weakref.ref(df, lambda _, key=key: cache.pop(key, None)), {})
+            cache[key] = entry
+        results = entry[1]
+        if args not in results:
+            results[args] = builder(df, *args)
+        return results[args]
+
+    return cached
@@ -0,0 +1,174 @@
+"""称重数据的生长分析：各鸡舍的均重曲线、均匀度（变异系数）和日增重，与品种标准对比
+
+全部称重记录按鸡舍、日期、鸡笼、层数一次分组汇总，之后的结果都由这张汇总表得到：
+    均重曲线：每次称重的样本数量、总重量和均重(g)，以及日龄
+    均匀度：同一次称重同一层各鸡笼均重的变异系数CV(%)，以及全部笼层均重的CV(%)
+    日增重：与同一批次上一次称重的均重之差除以相隔天数
+品种标准为各品种若干日龄的标准体重，之间按日龄线性插值；可以从CSV文件读取。
+同一个称重数据DataFrame只分析一次，数据版本不变时直接使用缓存的结果。
+"""
+import numpy as np
+import pandas as pd
+
+from farmdata.archive import MAX_START_AGE
+from farmdata.frames import per_frame_cache
+
+STANDARD_COLUMNS = ["品种", "日龄", "标准体重(g)"]
+
+# 各品种公母混养的参考标准体重(g)，按周龄；实际使用时可换成种鸡公司提供的标准
+_DEFAULT_STANDARD = {
+    "AA+": [42, 190, 480, 950, 1550, 2200, 2900, 3550, 4150],
+    "罗斯308": [42, 200, 510, 1000, 1630, 2300, 3000, 3650, 4250],
+    "科宝500": [42, 185, 470, 940, 1530, 2180, 2870, 3520, 4100],
+}
+
+def default_standard():
+    """内置的品种标准体重表"""
+    ages = list(range(0, 57, 7))
+    return pd.DataFrame(
+        [(breed, age, weight) for breed, weights in _DEFAULT_STANDARD.items() for age, weight in zip(ages, weights)],
+        columns=STANDARD_COLUMNS,
+    )
+
+
+def load_standard(path):
+    """从CSV文件读取品种标准体重表（列为 品种、日龄、标准体重(g)）"""
+    df = pd.read_csv(path, encoding="utf-8-sig", dtype={"品种": str})
+    missing = [column for column in STANDARD_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"品种标准文件缺少列：{'、'.join(missing)}")
+    df = df[STANDARD_COLUMNS].copy()
+    df["日龄"] = pd.to_numeric(df["日龄"], errors='coerce')
+    df["标准体重(g)"] = pd.to_numeric(df["标准体重(g)"], errors='coerce')
+    return df.dropna().sort_values(["品种", "日龄"], kind='stable', ignore_index=True)
+
+
+def standard_weights(standard, breeds, ages):
+    """按品种和日龄插值得到标准体重；品种不在标准中或日龄超出范围时为NaN"""
+    breeds = np.asarray(breeds, dtype=object)
+    ages = np.asarray(ages, dtype=float)
+    result = np.full(len(ages), np.nan)
+    for breed, table in standard.groupby("品种", sort=False):
+        mask = breeds == breed
+        if mask.any():
+            result[mask] = np.interp(ages[mask], table["日龄"].to_numpy(dtype=float),
+                                     table["标准体重(g)"].to_numpy(dtype=float), left=np.nan, right=np.nan)
+    return result
+
+
+def _cv(std, mean, count):
+    """变异系数(%)；少于两个鸡笼时没有意义，为NaN"""
+    cv = std / mean * 100
+    return cv.where((count >= 2) & (mean > 0))
+
+
+class GrowthAnalytics:
+    """全部鸡舍称重数据的分析结果"""
+    def __init__(self, df=None):
+        columns = ["鸡舍", "日期", "鸡笼编号", "层数", "日龄", "样本数量", "总重量(kg)"]
+        if df is None or df.empty:
+            self.cages = pd.DataFrame(columns=columns + ["均重(g)"])
+        else:
+            data = pd.DataFrame({
+                "鸡舍": pd.to_numeric(df['鸡舍编号'], errors='coerce'),
+                "日期": pd.to_datetime(df['日期'], errors='coerce'),
+                "鸡笼编号": pd.to_numeric(df['鸡笼编号'], errors='coerce'),
+                "层数": df['层数'].astype(str),
+                "日龄": pd.to_numeric(df['日龄'], errors='coerce'),
+                "样本数量": pd.to_numeric(df['样本数量'], errors='coerce'),
+                "总重量(kg)": pd.to_numeric(df['总重量(kg)'], errors='coerce'),
+            }).dropna(subset=["鸡舍", "日期", "样本数量", "总重量(kg)"])
+            data = data[data["样本数量"] > 0]
+            data["鸡舍"] = data["鸡舍"].astype(int)
+            # 唯一一次按原始记录分组：同一笼层同一天多次称重合并
+            self.cages = data.groupby(["鸡舍", "日期", "鸡笼编号", "层数"], sort=True, dropna=False).agg(
+                日龄=("日龄", "max"), 样本数量=("样本数量", "sum"), 总重量=("总重量(kg)", "sum"),
+            ).rename(columns={"总重量": "总重量(kg)"}).reset_index()
+            self.cages["均重(g)"] = self.cages["总重量(kg)"] * 1000 / self.cages["样本数量"]
+        self.layers = self._summarise(["鸡舍", "日期", "层数"])
+        self.curve = self._with_gain(self._summarise(["鸡舍", "日期"]))
+
+    def _summarise(self, keys):
+        """按keys汇总笼层：均重为总重量除以样本数，CV为各笼层均重的变异系数"""
+        groups = self.cages.groupby(keys, sort=True)
+        summary = groups.agg(
+            日龄=("日龄", "max"), 鸡笼数=("均重(g)", "size"), 样本数量=("样本数量", "sum"),
+            总重量=("总重量(kg)", "sum"), 笼均重=("均重(g)", "mean"),
+        )
+        summary["笼标准差"] = groups["均重(g)"].std(ddof=0)
+        summary["均重(g)"] = summary["总重量"] * 1000 / summary["样本数量"]
+        summary["变异系数(%)"] = _cv(summary["笼标准差"], summary["笼均重"], summary["鸡笼数"])
+        summary = summary.rename(columns={"总重量": "总重量(kg)"}).drop(columns=["笼均重", "笼标准差"])
+        return summary.reset_index()
+
+    @staticmethod
+    def _with_gain(curve, placed=None):
+        """加上批次序号和日增重
+
+        placed为每次称重所属进雏的序号（没有所属进雏时为-1）：属于某次进雏的称重以进雏日期为批次边界，
+        其余日龄比上一次称重小且不超过MAX_START_AGE时为新批次。
+        """
+        if curve.empty:
+            return curve.assign(批次=pd.Series(dtype=int), **{"日增重(g)": pd.Series(dtype=float)})
+        houses = curve["鸡舍"]
+        ages = curve["日龄"]
+        previous_age = ages.groupby(houses).shift()
+        first = houses.ne(houses.shift())
+        new_cycle = first | ((ages < previous_age) & (ages <= MAX_START_AGE))
+        if placed is not None:
+            placed = pd.Series(placed, index=curve.index)
+            new_cycle = first | new_cycle.where(placed < 0, placed.ne(placed.shift()))
+        curve["批次"] = new_cycle.astype(int).groupby(houses).cumsum()
+        days = curve["日期"].groupby(houses).diff().dt.days
+        gain = curve["均重(g)"].groupby(houses).diff() / days
+        curve["日增重(g)"] = gain.where(~new_cycle)
+        return curve
+
+    def compare(self, standard, registry=None, default_breed=None):
+        """均重曲线加上品种、标准体重和达标率；品种取所属批次的进雏记录，没有时为default_breed
+
+        有进雏记录时批次序号和日增重按进雏日期划分的批次重新计算。
+        """
+        curve = self.curve.copy()
+        breeds = np.full(len(curve), default_breed, dtype=object)
+        placed = np.full(len(curve), -1)
+        if registry is not None and len(curve):
+            for house, positions in curve.groupby("鸡舍").indices.items():
+                cycles = registry.house(house)
+                if not len(cycles):
+                    continue
+                found = cycles.find_all(curve["日期"].to_numpy(dtype='datetime64[D]')[positions])
+                breeds[positions] = np.where(found >= 0, cycles.breeds[np.maximum(found, 0)], default_breed)
+                placed[positions] = found
+        if (placed >= 0).any():
+            curve = self._with_gain(curve, placed)
+        curve["品种"] = breeds
+        curve["标准体重(g)"] = standard_weights(standard, breeds, curve["日龄"])
+        curve["达标率(%)"] = curve["均重(g)"] / curve["标准体重(g)"] * 100
+        return curve
+
+    def latest(self, curve=None):
+        """各鸡舍最近一次称重，以鸡舍编号为索引"""
+        curve = self.curve if curve is None else curve
+        return curve.drop_duplicates("鸡舍", keep="last").set_index("鸡舍")
+
+    def house_curve(self, curve, house, cycle=None):
+        """鸡舍某一批次（默认最近一批）按日龄排列的均重曲线"""
+        curve = curve[curve["鸡舍"] == house]
+        if curve.empty:
+            return curve
+        cycle = curve["批次"].iat[-1] if cycle is None else cycle
+        return curve[curve["批次"] == cycle].set_index("日龄")
+
+    def house_layers(self, house, date):
+        """鸡舍某次称重各层的均重和变异系数"""
+        layers = self.layers
+        return layers[(layers["鸡舍"] == house) & (layers["日期"] == pd.Timestamp(date))].set_index("层数")
+
+
+_analytics = per_frame_cache(GrowthAnalytics)
+
+
+def growth_analytics(df):
+    """获取称重数据DataFrame对应的分析结果；没有称重数据工作表时为空"""
+    return GrowthAnalytics() if df is None else _analytics(df)
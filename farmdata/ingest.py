@@ -0,0 +1,234 @@
+"""本地数据接收接口：电子秤、料塔计量表等设备批量上报称重和日常数据（耗料、死亡、淘汰）
+
+运行方式（在项目根目录）：
+    python -m farmdata.ingest --workbook D:/原始数据/chicken.xlsx --port 8765
+
+    POST /weights   称重数据：日期、鸡舍编号、鸡笼编号、层数、样本数量、总重量(kg)，日龄可省略
+    POST /daily     日常数据：日期、鸡舍编号、单日耗料(kg)、单日死亡(只)，单日淘汰(只)省略时为0
+    GET  /health    服务状态和数据版本
+请求体为JSON（记录列表，或 {"records": [...]}）或CSV（Content-Type: text/csv），
+列名可以用中文或英文别名（见ALIASES）。
+
+每个请求为一批：整批按与批量导入相同的规则一次向量化校验，缺少日龄时按calculate_age_for_date的规则推算；
+与已有记录或批内重复（称重按鸡舍、日期、鸡笼、层数，日常数据按鸡舍、日期）的行被拒绝，
+其余行一次提交。晚于已有记录的数据只追加到表尾，不重写工作表。返回
+    {"accepted": 写入行数, "rejected": [{"index": 批内序号（从0开始）, "reason": 原因}], "sheets": [工作表]}
+只监听本机地址；写入使用与页面相同的写锁，页面运行时也可以接收数据。
+"""
+import argparse
+import io
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+from farmdata import bulk_import
+from farmdata.archive import CycleArchive
+from farmdata.concurrency import ConflictError, commit
+from farmdata.farms import load_farms
+from farmdata.rollups import HOUSES
+from farmdata.storage import SheetDict, open_storage
+from farmdata.writer import BackgroundWriter
+
+# 接口路径对应的记录类型
+ENDPOINTS = {"/weights": bulk_import.WEIGHT, "/daily": bulk_import.DAILY}
+
+# 设备导出数据常用的英文列名
+ALIASES = {
+    "date": "日期",
+    "house": "鸡舍编号",
+    "cage": "鸡笼编号",
+    "layer": "层数",
+    "samples": "样本数量",
+    "weight_kg": "总重量(kg)",
+    "age": "日龄",
+    "feed_kg": "单日耗料(kg)",
+    "deaths": "单日死亡(只)",
+    "culls": "单日淘汰(只)",
+}
+
+# 可以省略的列及其取值
+DEFAULTS = {bulk_import.DAILY: {"单日淘汰(只)": 0}}
+
+# 单个请求体的大小上限
+MAX_BODY = 16 * 1024 * 1024
+
+
+def parse_payload(body, content_type):
+    """把请求体解析为DataFrame：text/csv按CSV读取，否则按JSON读取"""
+    if content_type.split(";")[0].strip().lower() in ("text/csv", "application/csv"):
+        df = pd.read_csv(io.BytesIO(body), encoding="utf-8-sig")
+    else:
+        data = json.loads(body.decode("utf-8-sig"))
+        if isinstance(data, dict):
+            data = data.get("records")
+        if not isinstance(data, list):
+            raise ValueError("JSON应为记录列表或 {\"records\": [...]}")
+        if not all(isinstance(record, dict) for record in data):
+            raise ValueError("每条记录应为JSON对象")
+        df = pd.DataFrame.from_records(data)
+    return df.rename(columns=lambda column: ALIASES.get(str(column).strip().lower(), str(column).strip()))
+
+
+class Ingestor:
+    """校验并提交设备上报的数据，多个请求线程共享
+
+    数据版本未变时复用上次读取的工作表，不重复读取；每批的校验和提交串行进行。
+    """
+    def __init__(self, storage, houses=HOUSES, on_commit=None):
+        self.storage = storage
+        self.houses = list(houses)
+        self.on_commit = on_commit
+        # 归档目录与工作簿（或同名的SQLite数据库）同目录
+        self.archive = CycleArchive(storage.path)
+        self.batches = 0
+        self.rows = 0
+        self._sheets = None
+        self._lock = threading.Lock()
+
+    def _snapshot(self):
+        version = self.storage.version()
+        if self._sheets is None or self._sheets.version != version:
+            self._sheets = SheetDict(self.storage.load_all_sheets() if version is not None else {}, version=version)
+        return self._sheets
+
+    def ingest(self, record_type, upload):
+        """校验一批记录并一次提交，返回(校验结果, 受影响的工作表)；缺少必填列时抛出ValueError"""
+        for column, value in DEFAULTS.get(record_type, {}).items():
+            if column not in upload.columns:
+                upload = upload.assign(**{column: value})
+        with self._lock:
+            sheets = self._snapshot()
+            result = bulk_import.validate(record_type, upload, sheets, self.houses, self.archive)
+            if result.rows.empty:
+                return result, []
+            replaced = False
+
+            def apply(latest):
+                nonlocal result, replaced
+                if latest is not sheets:
+                    # 其他进程（如页面）已写入：在最新数据上重新校验
+                    result = bulk_import.validate(record_type, upload, latest, self.houses, self.archive)
+                changed = bulk_import.apply_import(latest, result)
+                replaced = bool(latest.dirty)
+                return changed
+
+            try:
+                changed = commit(self.storage, sheets, apply, on_commit=self.on_commit)
+            except BaseException:
+                # 快照可能已被部分修改，下次重新读取
+                self._sheets = None
+                raise
+            if replaced:
+                # 整表重写的工作表日期列类型与读取时不同，下次重新读取
+                self._sheets = None
+            self.batches += 1
+            self.rows += len(result.rows)
+            return result, changed
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "farmdata-ingest"
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != "/health":
+            self._reply(404, {"error": "未知的接口"})
+            return
+        ingestor = self.server.ingestor
+        self._reply(200, {"status": "ok", "version": ingestor.storage.version(),
+                          "batches": ingestor.batches, "rows": ingestor.rows})
+
+    def do_POST(self):
+        record_type = ENDPOINTS.get(self.path)
+        if record_type is None:
+            self._reply(404, {"error": "未知的接口"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # 负数会让读取一直阻塞，直到连接关闭
+            self._reply(400, {"error": "Content-Length无效"})
+            return
+        if length > MAX_BODY:
+            self._reply(413, {"error": f"请求体超过{MAX_BODY // (1024 * 1024)}MB，请分批上报"})
+            return
+        try:
+            upload = parse_payload(self.rfile.read(length), self.headers.get("Content-Type", "application/json"))
+            result, changed = self.server.ingestor.ingest(record_type, upload)
+        except ConflictError as e:
+            self._reply(409, {"error": str(e)})
+            return
+        except (TypeError, ValueError, UnicodeDecodeError, pd.errors.ParserError) as e:
+            # TypeError：记录的取值结构不对（如应为数值的列是列表）
+            self._reply(400, {"error": str(e)})
+            return
+        if changed and self.server.writer is not None:
+            self.server.writer.notify()
+        rejected = [{"index": int(row) - 2, "reason": reason} for row, reason in result.errors.itertuples(index=False)]
+        self._reply(200, {"accepted": len(result.rows), "rejected": rejected, "sheets": changed})
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def make_server(storage, houses=HOUSES, host="127.0.0.1", port=8765, writer=None, quiet=False):
+    """创建接收服务（port为0时自动选择端口，见server.server_address）；调用serve_forever()开始服务"""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.ingestor = Ingestor(storage, houses)
+    server.writer = writer
+    server.quiet = quiet
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m farmdata.ingest", description="本地数据接收接口")
+    parser.add_argument("--workbook", help="工作簿路径；不指定时使用鸡场配置中的鸡场")
+    parser.add_argument("--storage", default=os.environ.get("CHICKEN_STORAGE", "excel"), choices=["excel", "sqlite"])
+    parser.add_argument("--farms", default=os.environ.get("CHICKEN_FARMS"), help="鸡场配置文件")
+    parser.add_argument("--farm", help="鸡场名称，鸡场配置中有多个鸡场时必须指定")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    if args.workbook is None and not args.farms:
+        parser.error("需要--workbook或鸡场配置（--farms）")
+    try:
+        farms = load_farms(None if args.workbook else args.farms, args.workbook, args.storage)
+    except (OSError, ValueError) as e:
+        parser.error(f"鸡场配置读取失败：{e}")
+    if args.farm is not None:
+        farms = [farm for farm in farms if farm.name == args.farm]
+    if len(farms) != 1:
+        parser.error("请用--farm指定一个鸡场")
+    farm = farms[0]
+
+    # 与页面相同：提交时只写日志，由后台线程合并后写回工作簿
+    storage = open_storage(farm.path, farm.backend, batch_size=None)
+    writer = BackgroundWriter(storage)
+    server = make_server(storage, farm.houses, args.host, args.port, writer)
+    print(f"[{farm.name}] 正在接收数据：http://{args.host}:{server.server_address[1]}（Ctrl+C 停止）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        writer.close()
+
+
+if __name__ == "__main__":
+    main()
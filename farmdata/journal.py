@@ -0,0 +1,118 @@
+"""预写日志：每次改动先以一行JSON追加到日志文件并fsync，再由压缩程序批量写回工作簿
+
+日志记录三种操作：
+- append：在工作表末尾追加新行
+- replace：整表替换（删除、修改、补录历史日期时使用）
+- compacted：压缩标记，记录写回后工作簿的版本号，用于判断之前的记录是否已写入工作簿
+"""
+import json
+import os
+
+import pandas as pd
+
+
+def frame_to_entry(op, sheet_name, df):
+    """把DataFrame转换为日志记录"""
+    df = df.copy()
+    if '日期' in df.columns and not df.empty:
+        df['日期'] = pd.to_datetime(df['日期']).dt.strftime('%Y-%m-%d')
+    payload = json.loads(df.to_json(orient='split', index=False, force_ascii=False))
+    return {"op": op, "sheet": sheet_name, "columns": payload["columns"], "data": payload["data"]}
+
+
+def entry_to_frame(entry):
+    """把日志记录还原为DataFrame（日期为date对象，与读取工作簿的结果一致）"""
+    df = pd.DataFrame(entry["data"], columns=entry["columns"])
+    if '日期' in df.columns and not df.empty:
+        df['日期'] = pd.to_datetime(df['日期']).dt.date
+    return df
+
+
+class Journal:
+    """只追加的JSON Lines日志文件
+
+    进程在写入中途退出时，末尾会留下不完整的一行（这条记录从未被确认）。读取时忽略这一行；
+    持有写锁的写入方在追加之前调用repair()去掉它，否则新记录会接在它后面而无法解析。
+    打开和读取日志都不修改文件。
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def repair(self):
+        """去掉末尾不完整的一行，返回是否有改动；调用方须持有写锁"""
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, "rb+") as f:
+            end = f.seek(0, os.SEEK_END)
+            if end == 0:
+                return False
+            f.seek(end - 1)
+            if f.read(1) == b"\n":
+                return False
+            f.seek(0)
+            f.truncate(f.read().rfind(b"\n") + 1)
+            f.flush()
+            os.fsync(f.fileno())
+        return True
+
+    def write(self, entries):
+        """追加记录并fsync，返回后即可向用户确认保存成功；调用方须持有写锁"""
+        lines = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def entries(self):
+        """读取全部已确认的记录"""
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "rb") as f:
+            data = f.read()
+        # 末尾没有换行的一行正在写入或写入中途中断，尚未确认
+        lines = data[:data.rfind(b"\n") + 1].split(b"\n")[:-1]
+        entries = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # 中间无法解析的一行（旧版本修复日志时与写入方冲突留下的）：只跳过这一行，
+                # 其后已确认的记录照常读取
+                continue
+        return entries
+
+    def size(self):
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def truncate(self):
+        """工作簿写回完成后清空日志"""
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def pending_entries(entries, workbook_version):
+    """去掉已经写回工作簿的记录
+
+    从后往前找与当前工作簿版本一致的压缩标记，标记之前的记录已写回工作簿；
+    版本不一致的标记说明那次替换工作簿没有完成，其之前的记录仍需重放。
+    """
+    start = 0
+    if workbook_version is not None:
+        for i in range(len(entries) - 1, -1, -1):
+            if entries[i]["op"] == "compacted" and entries[i]["version"] == list(workbook_version):
+                start = i + 1
+                break
+    return [entry for entry in entries[start:] if entry["op"] != "compacted"]
+
+
+def replay(sheets, entries):
+    """把日志记录应用到工作表字典上"""
+    for entry in entries:
+        if entry["op"] == "append":
+            rows = entry_to_frame(entry)
+            existing = sheets.get(entry["sheet"])
+            sheets[entry["sheet"]] = rows if existing is None else pd.concat([existing, rows], ignore_index=True)
+        elif entry["op"] == "replace":
+            sheets[entry["sheet"]] = entry_to_frame(entry)
+    return sheets
@@ -0,0 +1,232 @@
+"""离线维护：重算全部鸡舍的日龄和存栏数、校验工作簿、重建缓存和索引、输出汇总报表
+
+各鸡舍的工作表相互独立，重算和校验在进程池中按鸡舍并行：子进程只接收一个鸡舍的工作表和批次，
+传回重算后的工作表和发现的问题，主进程合并后一次提交。由命令行（python -m farmdata）
+在夜间等空闲时段运行，页面不必承担这些整表运算。
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from farmdata.archive import cycle_starts
+from farmdata.concurrency import commit
+from farmdata.cycles import cycle_registry, refresh_house
+from farmdata.feed import FeedLedger
+from farmdata.growth import GrowthAnalytics, default_standard
+from farmdata.rollups import HOUSES, FarmRollups
+from farmdata.schema import (
+    DAILY_COLUMNS,
+    PLACEMENT_COLUMNS,
+    PLACEMENT_SHEET,
+    PURCHASE_COLUMNS,
+    PURCHASE_SHEET,
+    WEIGHT_COLUMNS,
+    WEIGHT_SHEET,
+    is_house_sheet,
+)
+from farmdata.storage import SheetDict
+
+ISSUE_COLUMNS = ["工作表", "行号", "日期", "问题"]
+
+# 其余工作表：列定义、不能为负的列、不能重复的键
+_RECORD_SHEETS = {
+    WEIGHT_SHEET: (WEIGHT_COLUMNS, ["样本数量", "总重量(kg)"], ["鸡舍编号", "日期", "鸡笼编号", "层数"]),
+    PURCHASE_SHEET: (PURCHASE_COLUMNS, ["采购饲料(kg)"], None),
+    PLACEMENT_SHEET: (PLACEMENT_COLUMNS, ["进雏数量"], ["鸡舍编号", "日期"]),
+}
+_DAILY_AMOUNTS = ["单日耗料(kg)", "单日死亡(只)", "单日淘汰(只)"]
+
+
+def parallel_map(func, items, max_workers=None):
+    """在进程池中对items逐项执行func，按顺序返回结果
+
+    进程数默认为项数与CPU核数中较小者；只有一项或max_workers为1时在当前进程中执行。
+    """
+    items = list(items)
+    workers = min(len(items), max_workers or os.cpu_count() or 1)
+    if workers <= 1:
+        return [func(item) for item in items]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(func, items))
+
+
+def _issues(sheet_name, positions, dates, message):
+    """问题表：行号为工作簿中的行号（表头为第1行），整个工作表的问题（位置为-1）行号为空"""
+    positions = np.asarray(positions, dtype=np.int64)
+    rows = pd.array(positions + 2, dtype="Int64")
+    rows[positions < 0] = pd.NA
+    return pd.DataFrame({
+        "工作表": sheet_name,
+        "行号": rows,
+        "日期": pd.to_datetime(pd.Series(dates, dtype=object), errors='coerce').dt.date.to_numpy(),
+        "问题": message,
+    }, columns=ISSUE_COLUMNS)
+
+
+def _differs(old, new):
+    old = pd.to_numeric(old, errors='coerce').to_numpy(dtype=float)
+    new = pd.to_numeric(new, errors='coerce').to_numpy(dtype=float)
+    return ~((old == new) | (np.isnan(old) & np.isnan(new)))
+
+
+def _check_frame(sheet_name, df, columns, non_negative):
+    """各工作表共同的校验：缺少的列、无效日期和负数；缺少列时不再继续校验"""
+    missing = [column for column in columns if column not in df.columns]
+    if missing:
+        return [_issues(sheet_name, [-1], [None], f"缺少列：{'、'.join(missing)}")], None
+    found = []
+    dates = pd.to_datetime(df['日期'], errors='coerce')
+    invalid = dates.isna().to_numpy()
+    if invalid.any():
+        found.append(_issues(sheet_name, np.flatnonzero(invalid), df['日期'][invalid], "日期无效"))
+    for column in non_negative:
+        negative = (pd.to_numeric(df[column], errors='coerce') < 0).to_numpy()
+        if negative.any():
+            found.append(_issues(sheet_name, np.flatnonzero(negative), df['日期'][negative], f"{column}为负数"))
+    return found, dates
+
+
+def process_house(task):
+    """处理一个鸡舍（在子进程中运行）：校验记录，重算日龄和存栏数
+
+    task为(工作表名称, 工作表, 批次)；返回(重算后的工作表, 改动的记录数, 问题表)，
+    无法重算（缺少列或日期无效）时工作表为None。
+    """
+    sheet_name, df, cycles = task
+    found, dates = _check_frame(sheet_name, df, DAILY_COLUMNS, _DAILY_AMOUNTS)
+    if dates is None or dates.isna().any():
+        return None, 0, pd.concat(found, ignore_index=True)
+
+    wrong_house = (pd.to_numeric(df['鸡舍编号'], errors='coerce') != int(sheet_name)).to_numpy()
+    if wrong_house.any():
+        found.append(_issues(sheet_name, np.flatnonzero(wrong_house), df['日期'][wrong_house], "鸡舍编号与工作表不一致"))
+    duplicated = dates.duplicated(keep=False).to_numpy()
+    if duplicated.any():
+        found.append(_issues(sheet_name, np.flatnonzero(duplicated), df['日期'][duplicated], "同一天有多条记录"))
+
+    # 按日期稳定排序后重算，记下每一行在工作表中的原始位置
+    order = np.argsort(dates.to_numpy(), kind='stable')
+    ordered = df.iloc[order].reset_index(drop=True)
+    recomputed = refresh_house(ordered, cycles)
+    ordered_dates = pd.to_datetime(ordered['日期'])
+    # 属于某次进雏的记录由下面与重算结果的比较校验日龄
+    unplaced = np.isnan(cycles.ages(ordered_dates.to_numpy(dtype='datetime64[D]')))
+    if unplaced.any():
+        # 没有所属进雏记录的记录：同一批次内日龄的差应等于日期的差
+        ages = pd.to_numeric(ordered['日龄'], errors='coerce')
+        jumps = _differs(ages.diff(), ordered_dates.diff().dt.days)
+        jumps[cycle_starts(ordered, cycles)] = False
+        jumps &= unplaced
+        if jumps.any():
+            found.append(_issues(sheet_name, order[jumps], ordered['日期'][jumps], "日龄与日期间隔不一致"))
+    changed = np.zeros(len(ordered), dtype=bool)
+    for column, message in [("日龄", "日龄与进雏日期不一致"), ("存栏数", "存栏数与累计死亡、淘汰不一致")]:
+        differs = _differs(ordered[column], recomputed[column])
+        if differs.any():
+            found.append(_issues(sheet_name, order[differs], ordered['日期'][differs], message))
+        changed |= differs
+    if (order != np.arange(len(order))).any():
+        found.append(_issues(sheet_name, [-1], [None], "记录未按日期排序"))
+        changed |= order != np.arange(len(order))
+    issues = pd.concat(found, ignore_index=True) if found else pd.DataFrame(columns=ISSUE_COLUMNS)
+    return recomputed, int(changed.sum()), issues
+
+
+def scan_houses(sheets, max_workers=None):
+    """按鸡舍并行校验和重算，返回({工作表: (重算后的工作表, 改动的记录数)}, 问题表)；只包含有改动的鸡舍"""
+    registry = cycle_registry(sheets.get(PLACEMENT_SHEET))
+    names = [name for name in sheets if is_house_sheet(name) and not sheets[name].empty]
+    results = parallel_map(process_house, [(name, sheets[name], registry.house(name)) for name in names],
+                           max_workers)
+    updates = {name: (df, count) for name, (df, count, _) in zip(names, results) if df is not None and count}
+    frames = [issues for _, _, issues in results if not issues.empty]
+    issues = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=ISSUE_COLUMNS)
+    return updates, issues
+
+
+def check_records(sheets, houses=HOUSES):
+    """校验称重、采购和进雏记录，以及鸡舍是否在鸡场配置中（数据量小，在当前进程中向量化校验）"""
+    houses = list(houses)
+    found = []
+    extra = sorted((name for name in sheets if is_house_sheet(name) and int(name) not in houses), key=int)
+    for name in extra:
+        found.append(_issues(name, [-1], [None], "鸡舍不在鸡场配置中"))
+    for sheet_name, (columns, non_negative, key) in _RECORD_SHEETS.items():
+        df = sheets.get(sheet_name)
+        if df is None or df.empty:
+            continue
+        checked, dates = _check_frame(sheet_name, df, columns, non_negative)
+        found.extend(checked)
+        if dates is None:
+            continue
+        unknown = ~pd.to_numeric(df['鸡舍编号'], errors='coerce').isin(houses).to_numpy()
+        if unknown.any():
+            found.append(_issues(sheet_name, np.flatnonzero(unknown), df['日期'][unknown], "鸡舍编号无效"))
+        if key is not None:
+            keys = df[key].assign(日期=dates)
+            duplicated = keys.duplicated(keep=False).to_numpy()
+            if duplicated.any():
+                found.append(_issues(sheet_name, np.flatnonzero(duplicated), df['日期'][duplicated], "重复记录"))
+    return pd.concat(found, ignore_index=True) if found else pd.DataFrame(columns=ISSUE_COLUMNS)
+
+
+def validate(sheets, houses=HOUSES, max_workers=None):
+    """校验全部工作表，返回问题表（工作表、行号、日期、问题）；没有问题时为空表"""
+    _, issues = scan_houses(sheets, max_workers)
+    return pd.concat([issues, check_records(sheets, houses)], ignore_index=True)
+
+
+def recompute(storage, max_workers=None):
+    """重算全部鸡舍的日龄和存栏数，有改动的鸡舍一次提交，返回{工作表: 改动的记录数}
+
+    在读取的快照上按鸡舍并行重算；提交时数据已被修改（如页面上有人录入）则在最新数据上重新重算。
+    """
+    snapshot = SheetDict(storage.load_all_sheets(), version=storage.version())
+    updates, _ = scan_houses(snapshot, max_workers)
+    if not updates:
+        return {}
+
+    def apply(sheets):
+        changes = updates if sheets is snapshot else scan_houses(sheets, max_workers)[0]
+        for sheet_name, (df, _) in changes.items():
+            sheets[sheet_name] = df
+        return {sheet_name: count for sheet_name, (_, count) in changes.items()}
+
+    return commit(storage, snapshot, apply)
+
+
+def rebuild_caches(storage):
+    """把未写回的日志写回主存储，再重建读取缓存和索引"""
+    storage.compact()
+    storage.rebuild_caches()
+
+
+def build_reports(sheets, houses=HOUSES, date=None, standard=None):
+    """汇总报表：{名称: DataFrame}，包括鸡舍指标、全场合计、饲料库存和各鸡舍最近一次称重"""
+    rollups = FarmRollups(houses)
+    rollups.sync(None, lambda: sheets)
+    ledger = FeedLedger(houses)
+    ledger.sync(None, lambda: sheets)
+    growth = GrowthAnalytics(sheets.get(WEIGHT_SHEET))
+    curve = growth.compare(default_standard() if standard is None else standard,
+                           cycle_registry(sheets.get(PLACEMENT_SHEET)))
+    return {
+        "鸡舍指标": rollups.table(),
+        "全场合计": pd.DataFrame([rollups.totals()]),
+        "饲料库存": ledger.table(date),
+        "最近称重": growth.latest(curve),
+    }
+
+
+def write_reports(reports, folder):
+    """把报表写成CSV（带BOM的UTF-8），返回写出的文件"""
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for name, df in reports.items():
+        path = os.path.join(folder, f"{name}.csv")
+        df.to_csv(path, encoding="utf-8-sig", index=not isinstance(df.index, pd.RangeIndex),
+                  date_format="%Y-%m-%d")
+        paths.append(path)
+    return paths
@@ -0,0 +1,183 @@
+"""可选的耗时统计：记录每次页面运行中各关键步骤的耗时、涉及的行数和字节数
+
+设置环境变量 CHICKEN_PROFILE=1 开启。未开启时profiled直接返回原函数，span返回
+空的上下文管理器，几乎没有额外开销。
+
+每次页面运行由begin_run开始、end_run结束，期间同一线程内的计时都记在这次运行中；
+section把运行分成顺序的几段（如各个标签页），段内的计时记为该段的下一层。
+end_run把本次运行的明细以一行JSON追加到日志文件，便于离线分析。
+"""
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+import pandas as pd
+
+ENABLED = os.environ.get("CHICKEN_PROFILE", "").lower() in ("1", "true", "yes")
+
+_local = threading.local()
+_NULL = nullcontext()
+_log_lock = threading.Lock()
+
+
+def frame_size(value):
+    """DataFrame（或工作表字典、以DataFrame开头的元组）的行数和字节数"""
+    if isinstance(value, tuple) and value:
+        value = value[0]
+    if isinstance(value, pd.DataFrame):
+        frames = [value]
+    elif isinstance(value, dict):
+        frames = [df for df in value.values() if isinstance(df, pd.DataFrame)]
+    else:
+        return {}
+    # 不统计对象列的实际内容，避免计时本身扫描全部数据
+    return {
+        "rows": sum(len(df) for df in frames),
+        "bytes": int(sum(df.memory_usage(index=False).sum() for df in frames)),
+    }
+
+
+class Run:
+    """一次页面运行的计时明细"""
+    def __init__(self, label=None):
+        self.label = label
+        self.started = time.perf_counter()
+        self.time = datetime.now()
+        self.spans = []
+        self.depth = 0
+        self.total = None
+        self._section = None
+
+    def section(self, name):
+        """结束上一段，开始名为name的新一段；name为None时只结束上一段"""
+        now = time.perf_counter()
+        if self._section is not None:
+            record, started = self._section
+            record["seconds"] = now - started
+            self.depth = 0
+            self._section = None
+        if name is not None:
+            record = {"name": name, "depth": 0}
+            self.spans.append(record)
+            self._section = (record, now)
+            self.depth = 1
+
+    def to_dict(self):
+        return {
+            "time": self.time.isoformat(timespec="milliseconds"),
+            "label": self.label,
+            "total": self.total,
+            "spans": self.spans,
+        }
+
+
+def current_run():
+    return getattr(_local, "run", None)
+
+
+def begin_run(label=None):
+    """开始记录本线程的一次运行；未开启时返回None"""
+    if not ENABLED:
+        return None
+    _local.run = Run(label)
+    return _local.run
+
+
+def section(name):
+    """开始运行中的新一段（如一个标签页），上一段随之结束"""
+    run = current_run() if ENABLED else None
+    if run is not None:
+        run.section(name)
+
+
+def end_run(log_path=None):
+    """结束本线程的运行，把明细追加到日志文件，返回该次运行"""
+    run = current_run()
+    if run is None:
+        return None
+    _local.run = None
+    run.section(None)
+    run.total = time.perf_counter() - run.started
+    if log_path:
+        line = json.dumps(run.to_dict(), ensure_ascii=False, default=str)
+        with _log_lock, open(log_path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    return run
+
+
+@contextmanager
+def _span(run, name):
+    info = {}
+    record = {"name": name, "depth": run.depth}
+    # 先占位，嵌套的步骤排在外层步骤之后
+    run.spans.append(record)
+    run.depth += 1
+    started = time.perf_counter()
+    try:
+        yield info
+    finally:
+        record["seconds"] = time.perf_counter() - started
+        record.update(info)
+        run.depth -= 1
+
+
+def span(name):
+    """计时一段代码；with语句得到的字典可填入rows、bytes等信息，未在记录时为None"""
+    run = current_run() if ENABLED else None
+    if run is None:
+        return _NULL
+    return _span(run, name)
+
+
+def result_size(result, *args, **kwargs):
+    """profiled的measure：按返回值统计行数和字节数"""
+    return frame_size(result)
+
+
+def profiled(name, measure=None):
+    """计时函数的装饰器；measure(result, *args, **kwargs)返回要记录的行数、字节数等
+
+    未开启时直接返回原函数。
+    """
+    def decorator(func):
+        if not ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            run = current_run()
+            if run is None:
+                return func(*args, **kwargs)
+            with _span(run, name) as info:
+                result = func(*args, **kwargs)
+                if measure is not None:
+                    info.update(measure(result, *args, **kwargs))
+                return result
+        return wrapper
+    return decorator
+
+
+def _total(values):
+    return values.sum(min_count=1)
+
+
+def summary(run):
+    """汇总一次运行：每一段内同一层的同名步骤合并，按首次出现的顺序排列，下层步骤缩进显示"""
+    if run is None or not run.spans:
+        return pd.DataFrame(columns=["步骤", "次数", "耗时(ms)", "行数", "字节数"])
+    spans = pd.DataFrame(run.spans)
+    for column in ["seconds", "rows", "bytes"]:
+        if column not in spans:
+            spans[column] = pd.NA
+    # 所属的段：第一层的步骤各自开始新的一段
+    spans["segment"] = (spans["depth"] == 0).cumsum()
+    grouped = spans.groupby(["segment", "depth", "name"], sort=False).agg(
+        次数=("name", "size"), 耗时=("seconds", "sum"), 行数=("rows", _total), 字节数=("bytes", _total))
+    grouped = grouped.reset_index()
+    grouped["步骤"] = ["\u3000" * depth + name for depth, name in zip(grouped["depth"], grouped["name"])]
+    grouped["耗时(ms)"] = grouped["耗时"].astype(float) * 1000
+    return grouped[["步骤", "次数", "耗时(ms)", "行数", "字节数"]]
@@ -0,0 +1,205 @@
+"""记录浏览与批量操作：按日期范围、鸡舍筛选并分页，记录以稳定的记录ID标识
+
+记录ID由记录的关键列（日期、鸡舍、鸡笼等）加同键序号组成，与记录在工作表中的
+位置无关：其他会话插入或删除别的记录后，仍能在最新数据中找到同一条记录。
+同键记录被删除后序号会指向另一条记录，因此在最新数据上重新执行时还要核对记录的取值。
+记录表按DataFrame对象缓存，与日期索引相同。
+"""
+import numpy as np
+import pandas as pd
+
+from farmdata.concurrency import ConflictError
+from farmdata.cycles import house_cycles, refresh_house
+from farmdata.frames import per_frame_cache
+from farmdata.schema import PLACEMENT_SHEET, PURCHASE_SHEET, WEIGHT_SHEET, is_house_sheet
+from farmdata.stock import initial_stock, recalculate_stock
+
+_KEY_COLUMNS = {
+    WEIGHT_SHEET: ["日期", "鸡舍编号", "鸡笼编号", "层数"],
+    PURCHASE_SHEET: ["日期", "鸡舍编号", "料号"],
+    PLACEMENT_SHEET: ["日期", "鸡舍编号"],
+}
+
+# 由其他列推算、其他会话的改动会连带改变的列，核对记录时不比较
+_DERIVED_COLUMNS = ["日龄", "存栏数", "均重(g)"]
+
+def key_columns(sheet_name, df):
+    """组成记录ID的列：鸡舍工作表每天一条记录，只用日期"""
+    if is_house_sheet(sheet_name):
+        columns = ["日期"]
+    else:
+        columns = _KEY_COLUMNS.get(sheet_name, list(df.columns))
+    return [c for c in columns if c in df.columns]
+
+
+def _key_text(series):
+    if series.name == "日期":
+        return pd.to_datetime(series, errors='coerce').dt.strftime('%Y-%m-%d').fillna('')
+    if pd.api.types.is_numeric_dtype(series):
+        # 整数列读回后可能变成浮点，统一成整数文本
+        return pd.to_numeric(series, errors='coerce').round().astype('Int64').astype(str)
+    return series.astype(str)
+
+
+def _same_column(old, new):
+    if old.name != "日期" and pd.api.types.is_numeric_dtype(old) and pd.api.types.is_numeric_dtype(new):
+        return np.allclose(old.to_numpy(dtype=float), new.to_numpy(dtype=float), equal_nan=True)
+    old, new = (_key_text(s) if s.name == "日期" or pd.api.types.is_numeric_dtype(s)
+                else s.where(s.notna(), '').astype(str) for s in (old, new))
+    return (old.to_numpy() == new.to_numpy()).all()
+
+
+def same_records(old, new):
+    """两组记录（按位置一一对应）的取值是否相同；日期、整数读回后的类型差异不算改动"""
+    columns = [c for c in old.columns if c not in _DERIVED_COLUMNS]
+    if len(old) != len(new) or any(c not in new.columns for c in columns):
+        return False
+    return all(_same_column(old[c], new[c]) for c in columns)
+
+
+def record_ids(sheet_name, df):
+    """每条记录的ID：关键列取值 + 同键记录中的序号"""
+    if df.empty:
+        return np.array([], dtype=object)
+    parts = [_key_text(df[c]) for c in key_columns(sheet_name, df)]
+    if not parts:
+        key = pd.Series('', index=df.index)
+    else:
+        key = parts[0].str.cat(parts[1:], sep='|') if len(parts) > 1 else parts[0]
+    ordinal = key.groupby(key, sort=False).cumcount()
+    return (key + '#' + ordinal.astype(str)).to_numpy(dtype=object)
+
+
+class RecordTable:
+    """单个工作表的记录ID与筛选用的日期、鸡舍数组"""
+    def __init__(self, sheet_name, df):
+        self.ids = record_ids(sheet_name, df)
+        self._positions = {record_id: i for i, record_id in enumerate(self.ids)}
+        self.dates = pd.to_datetime(df['日期'], errors='coerce').to_numpy(dtype='datetime64[D]')
+        self.houses = (pd.to_numeric(df['鸡舍编号'], errors='coerce').to_numpy()
+                       if '鸡舍编号' in df.columns else None)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def position(self, record_id):
+        """记录ID当前所在的位置；记录已不存在时返回None"""
+        return self._positions.get(record_id)
+
+    def date_range(self):
+        """最早和最晚的记录日期；没有有效日期时返回(None, None)"""
+        valid = self.dates[~np.isnat(self.dates)]
+        if not len(valid):
+            return None, None
+        return valid.min().astype(object), valid.max().astype(object)
+
+    def select(self, start=None, end=None, house=None):
+        """按日期范围（含首尾）和鸡舍筛选，返回位置数组，最新的记录在前"""
+        mask = np.ones(len(self.ids), dtype=bool)
+        if start is not None:
+            mask &= self.dates >= np.datetime64(start, 'D')
+        if end is not None:
+            mask &= self.dates <= np.datetime64(end, 'D')
+        if house is not None and self.houses is not None:
+            mask &= self.houses == house
+        positions = np.flatnonzero(mask)
+        # 按日期倒序，同一天后录入的在前
+        order = np.argsort(self.dates[positions], kind='stable')[::-1]
+        return positions[order]
+
+
+_table = per_frame_cache(lambda df, sheet_name: RecordTable(sheet_name, df))
+
+
+def record_table(sheet_name, df):
+    """获取DataFrame对应的记录表"""
+    return _table(df, sheet_name)
+
+
+def page_count(total, page_size):
+    """分页后的总页数，至少为1页"""
+    return max(1, -(-total // page_size))
+
+
+def page_positions(positions, page, page_size):
+    """第page页（从1开始）的记录位置"""
+    start = (page - 1) * page_size
+    return positions[start:start + page_size]
+
+
+def required_sheets(sheets, targets, houses):
+    """apply_batch除targets中的工作表外还需要、sheets中还没有的工作表
+
+    日常数据按批次重算存栏数，需要进雏记录；进雏记录改动后要按批次刷新各鸡舍工作表。
+    只读取了部分工作表的快照应先补齐这些工作表，否则存栏数会跨过进雏日期继续累计。
+    """
+    needed = []
+    if PLACEMENT_SHEET not in sheets and any(is_house_sheet(name) for name in targets):
+        needed.append(PLACEMENT_SHEET)
+    if PLACEMENT_SHEET in targets:
+        needed.extend(str(house) for house in houses if str(house) not in sheets)
+    return needed
+
+
+def _resolve(sheet_name, df, ids):
+    """记录ID在df中的位置；有记录找不到时为None"""
+    if df is None or df.empty:
+        return None
+    table = record_table(sheet_name, df)
+    positions = [table.position(record_id) for record_id in ids]
+    return None if any(position is None for position in positions) else positions
+
+
+def apply_batch(sheets, targets, updates=None, snapshot=None):
+    """批量删除或修改记录：每个工作表只替换一次，鸡舍工作表只重算一次存栏数
+
+    targets为{工作表: [记录ID]}；updates为None时删除这些记录，否则为{列: 新值}。
+    snapshot为选择记录时读取的工作表：sheets中的数据与之不同（其他会话已写入）时，
+    按记录ID找到的记录必须与snapshot中的取值相同，否则可能是同键记录被删除后序号指向了别的记录。
+    有记录在sheets中找不到或已被修改时抛出ConflictError，不做任何修改。返回处理的记录条数。
+    """
+    resolved = {}
+    for sheet_name, ids in targets.items():
+        df = sheets.get(sheet_name)
+        positions = _resolve(sheet_name, df, ids)
+        if positions is not None and snapshot is not None and snapshot.get(sheet_name) is not df:
+            selected = snapshot.get(sheet_name)
+            expected = _resolve(sheet_name, selected, ids)
+            if expected is None or not same_records(selected.iloc[expected], df.iloc[positions]):
+                positions = None
+        if positions is None:
+            raise ConflictError("记录已被其他用户修改或删除，请刷新后重试")
+        if positions:
+            resolved[sheet_name] = (df, np.unique(positions))
+
+    # 进雏记录有改动时，涉及鸡舍从最早改动的进雏日期起按新的批次重算日龄和存栏
+    refresh = {}
+    if PLACEMENT_SHEET in resolved:
+        df, positions = resolved[PLACEMENT_SHEET]
+        changed = pd.DataFrame({"鸡舍": pd.to_numeric(df['鸡舍编号'].iloc[positions], errors='coerce'),
+                                "日期": pd.to_datetime(df['日期'].iloc[positions], errors='coerce')}).dropna()
+        refresh = changed.groupby("鸡舍")["日期"].min().to_dict()
+
+    for sheet_name, (df, positions) in resolved.items():
+        # 初始存栏按改动前的数据推算，删除或修改第一条记录后不变
+        house_stock = initial_stock(df) if is_house_sheet(sheet_name) else None
+        first_date = df['日期'].iloc[positions].min()
+        rows = df.index[positions]
+        if updates is None:
+            df = df.drop(rows).reset_index(drop=True)
+        else:
+            # 复制后再修改，避免改动共享缓存中的数据
+            df = df.copy()
+            for column, value in updates.items():
+                df.loc[rows, column] = value
+        if house_stock is not None and int(sheet_name) not in refresh:
+            # 只重算最早改动日期及之后的存栏数
+            df = recalculate_stock(df, house_stock, start_date=first_date,
+                                   cycles=house_cycles(sheets, int(sheet_name)))
+        sheets[sheet_name] = df
+
+    for house, start_date in refresh.items():
+        sheet_name = str(int(house))
+        if sheets.get(sheet_name) is not None and not sheets[sheet_name].empty:
+            sheets[sheet_name] = refresh_house(sheets[sheet_name], house_cycles(sheets, house), start_date)
+    return sum(len(positions) for _, positions in resolved.values())
@@ -0,0 +1,277 @@
+"""鸡场汇总指标：各鸡舍的死亡率、淘汰数、只均日耗料和料重比
+
+工作表中可能还有未归档的往批记录：存栏数不是由上一条记录减去当天死亡、淘汰得到的记录
+（进雏后存栏从进雏数量重新累计）为一个批次的第一条记录。死亡率、淘汰率以各批次的
+初始存栏（进雏数量）之和为分母，料重比只用当前批次的耗料。
+
+汇总表在首次打开时用分组向量化运算一次算出，之后提交改动时按改动增量更新：
+追加的新行只汇总新行再与原有汇总合并，整表替换的工作表只重算该鸡舍。
+看板直接读取汇总表，数据版本未变时不扫描工作表。
+每个鸡舍另有累计和（HouseAggregates），用于查询任意日期范围的合计。
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from farmdata.aggregates import HouseAggregates
+from farmdata.schema import WEIGHT_SHEET, is_house_sheet
+
+# 默认的鸡舍编号（没有配置鸡场时）
+HOUSES = range(1, 17)
+
+_HOUSE_COLUMNS = ["日期", "日龄", "单日耗料(kg)", "单日死亡(只)", "单日淘汰(只)", "存栏数"]
+# 合并两段汇总时相加的列
+_ADDITIVE = ["记录天数", "累计死亡", "累计淘汰", "累计耗料(kg)", "存栏只日"]
+# 合并时按批次是否接续计算的列；首条推算存栏为第一条记录的存栏数 + 死亡 + 淘汰
+_CYCLE_COLUMNS = ["初始存栏", "批次数", "批次耗料(kg)", "首条推算存栏"]
+_UNSET = object()
+
+
+def _house_data(frames):
+    """把{鸡舍编号: 工作表}合并为一张表，按鸡舍、日期排序"""
+    frames = [df[_HOUSE_COLUMNS].assign(鸡舍=house) for house, df in frames.items() if not df.empty]
+    if not frames:
+        return None
+    data = pd.concat(frames, ignore_index=True)
+    data['日期'] = pd.to_datetime(data['日期'])
+    return data.sort_values(['鸡舍', '日期'], kind='stable')
+
+
+def _continues(inferred, previous):
+    """推算的初始存栏与上一条记录的存栏数相同，即接续同一批次；任一为空时视为接续"""
+    inferred = np.asarray(inferred, dtype=float)
+    previous = np.asarray(previous, dtype=float)
+    return np.isnan(inferred) | np.isnan(previous) | np.isclose(inferred, previous)
+
+
+def _cycle_starts(houses, inferred, previous):
+    """每个鸡舍的第一条记录和不接续上一条记录的记录为批次的第一条记录"""
+    return pd.Series(~houses.duplicated().to_numpy() | ~_continues(inferred, previous), index=houses.index)
+
+
+def summarise_houses(frames):
+    """按鸡舍分组汇总日常数据，返回以鸡舍编号为索引的汇总表"""
+    data = _house_data(frames)
+    if data is None:
+        return pd.DataFrame(columns=["首次日期", "最近日期", "日龄", "存栏数"] + _CYCLE_COLUMNS + _ADDITIVE,
+                            index=pd.Index([], name="鸡舍"))
+    groups = data.groupby('鸡舍', sort=True)
+    first = data.drop_duplicates('鸡舍', keep='first').set_index('鸡舍')
+    last = data.drop_duplicates('鸡舍', keep='last').set_index('鸡舍')
+    sums = groups[["单日死亡(只)", "单日淘汰(只)", "单日耗料(kg)", "存栏数"]].sum()
+    # 推算的初始存栏 = 存栏数 + 死亡 + 淘汰；与上一条记录的存栏数不同即为新批次的第一条记录
+    inferred = data['存栏数'] + data['单日死亡(只)'] + data['单日淘汰(只)']
+    starts = _cycle_starts(data['鸡舍'], inferred, groups['存栏数'].shift())
+    segments = starts.cumsum()
+    current = segments == segments.groupby(data['鸡舍']).transform('max')
+    return pd.DataFrame({
+        "首次日期": first['日期'],
+        "最近日期": last['日期'],
+        "日龄": last['日龄'],
+        "存栏数": last['存栏数'],
+        # 各批次进雏数量之和
+        "初始存栏": inferred.where(starts).groupby(data['鸡舍']).sum(),
+        "批次数": starts.groupby(data['鸡舍']).sum(),
+        "批次耗料(kg)": data['单日耗料(kg)'].where(current).groupby(data['鸡舍']).sum(),
+        "首条推算存栏": first['存栏数'] + first['单日死亡(只)'] + first['单日淘汰(只)'],
+        "记录天数": groups.size(),
+        "累计死亡": sums['单日死亡(只)'],
+        "累计淘汰": sums['单日淘汰(只)'],
+        "累计耗料(kg)": sums['单日耗料(kg)'],
+        # 每天的存栏数之和，用于计算只均日耗料
+        "存栏只日": sums['存栏数'],
+    })
+
+
+def summarise_weights(weights):
+    """各鸡舍最近一次称重的样本数和总重量，返回以鸡舍编号为索引的汇总表"""
+    columns = ["称重日期", "样本数量", "总重量(kg)"]
+    if weights is None or weights.empty:
+        return pd.DataFrame(columns=columns, index=pd.Index([], name="鸡舍"))
+    data = weights[["日期", "鸡舍编号", "样本数量", "总重量(kg)"]].copy()
+    data['日期'] = pd.to_datetime(data['日期'])
+    data['鸡舍'] = pd.to_numeric(data['鸡舍编号'], errors='coerce')
+    data = data.dropna(subset=['鸡舍', '日期'])
+    data['鸡舍'] = data['鸡舍'].astype(int)
+    latest = data[data['日期'] == data.groupby('鸡舍')['日期'].transform('max')]
+    summary = latest.groupby('鸡舍').agg(
+        称重日期=('日期', 'first'), 样本数量=('样本数量', 'sum'), 总重量=('总重量(kg)', 'sum'))
+    return summary.rename(columns={"总重量": "总重量(kg)"})[columns]
+
+
+def _merge_house(old, new):
+    """把新追加记录的汇总合并到原有汇总；新记录早于原有最近日期时返回None"""
+    if new['首次日期'] < old['最近日期']:
+        return None
+    merged = old.copy()
+    for column in _ADDITIVE:
+        merged[column] = old[column] + new[column]
+    for column in ["最近日期", "日龄", "存栏数", "批次耗料(kg)"]:
+        merged[column] = new[column]
+    if _continues([new['首条推算存栏']], [old['存栏数']])[0]:
+        # 新记录的第一条接续原有的最后一个批次
+        first = 0 if pd.isna(new['首条推算存栏']) else new['首条推算存栏']
+        merged['初始存栏'] = old['初始存栏'] + new['初始存栏'] - first
+        merged['批次数'] = old['批次数'] + new['批次数'] - 1
+        if new['批次数'] == 1:
+            merged['批次耗料(kg)'] = old['批次耗料(kg)'] + new['批次耗料(kg)']
+    else:
+        merged['初始存栏'] = old['初始存栏'] + new['初始存栏']
+        merged['批次数'] = old['批次数'] + new['批次数']
+    return merged
+
+
+def _merge_weights(old, new):
+    """合并称重汇总：同一天的称重累加，更近日期的称重取代原有汇总"""
+    merged = old.copy()
+    for house, row in new.iterrows():
+        if house not in merged.index or row['称重日期'] > merged.at[house, '称重日期']:
+            merged.loc[house] = row
+        elif row['称重日期'] == merged.at[house, '称重日期']:
+            merged.loc[house, ["样本数量", "总重量(kg)"]] += row[["样本数量", "总重量(kg)"]].to_numpy()
+    return merged
+
+
+class FarmRollups:
+    """按数据版本维护的各鸡舍汇总，多个会话共享；house_numbers为鸡场的鸡舍编号"""
+    def __init__(self, house_numbers=HOUSES):
+        self.house_numbers = list(house_numbers)
+        self.version = _UNSET
+        self.houses = None
+        self.weights = None
+        self.aggregates = {}
+        self.rebuilds = 0
+        self._lock = threading.Lock()
+
+    def sync(self, version, load):
+        """数据版本与汇总不一致（首次打开或其他进程写入）时用load()读取全部工作表重算，
+        版本一致时不读取数据
+        """
+        with self._lock:
+            if self.houses is None or self.version != version:
+                sheets = load()
+                self._rebuild(sheets)
+                self.version = getattr(sheets, 'version', version)
+
+    def _rebuild(self, sheets):
+        self.houses = summarise_houses(
+            {int(name): df for name, df in sheets.items() if is_house_sheet(name)})
+        self.weights = summarise_weights(sheets.get(WEIGHT_SHEET))
+        self.aggregates = {int(name): HouseAggregates(df) for name, df in sheets.items() if is_house_sheet(name)}
+        self.rebuilds += 1
+
+    def apply_changes(self, sheets, replaced, appended, before, after, load=None):
+        """提交改动后调用：sheets为改动后的数据，before、after为提交前后的版本号
+
+        load()读取提交后的全部工作表（在写锁内调用，与after一致），汇总无法增量更新时用它重算；
+        为None时只把汇总标记为过期，下次sync时重算。
+        """
+        with self._lock:
+            if self.houses is None:
+                return
+            if self.version != before:
+                # 汇总落后于提交前的数据，增量更新无法保证正确；提交的可能只是部分工作表
+                self._reload(after, load)
+                return
+            for sheet_name in set(replaced) | set(appended):
+                if sheet_name == WEIGHT_SHEET:
+                    if sheet_name in replaced:
+                        self.weights = summarise_weights(sheets.get(WEIGHT_SHEET))
+                    else:
+                        self.weights = _merge_weights(self.weights, summarise_weights(appended[sheet_name]))
+                elif is_house_sheet(sheet_name):
+                    self._update_house(int(sheet_name), sheets.get(sheet_name),
+                                       None if sheet_name in replaced else appended[sheet_name])
+            self.version = after
+
+    def _reload(self, after, load):
+        """重算全部汇总；没有load时保留原有汇总（仍可读取）并标记为过期"""
+        if load is None:
+            self.version = _UNSET
+            return
+        self._rebuild(load())
+        self.version = after
+
+    def _update_house(self, house, df, new_rows):
+        aggregates = self.aggregates.get(house)
+        if df is None or df.empty:
+            self.aggregates.pop(house, None)
+        elif aggregates is None:
+            self.aggregates[house] = HouseAggregates(df)
+        elif new_rows is None or not aggregates.append(new_rows):
+            # 从第一处改动的位置起修复累计和
+            aggregates.repair(df)
+
+        merged = None
+        if new_rows is not None and house in self.houses.index:
+            new = summarise_houses({house: new_rows})
+            if not new.empty:
+                merged = _merge_house(self.houses.loc[house], new.loc[house])
+        if merged is None:
+            # 整表替换、补录早于最近日期的记录或新鸡舍：只重算该鸡舍
+            summary = summarise_houses({house: df} if df is not None else {})
+            self.houses = self.houses.drop(index=house, errors='ignore')
+            if summary.empty:
+                return
+            merged = summary.loc[house]
+        self.houses.loc[house] = merged
+        self.houses = self.houses.sort_index()
+
+    def rebase(self, before, after):
+        """数据内容不变、只有版本号变化（如日志写回工作簿）时沿用汇总"""
+        with self._lock:
+            if self.version == before:
+                self.version = after
+
+    def house_totals(self, house, start=None, end=None):
+        """鸡舍在日期范围（含首尾）内的合计，由累计和之差得到"""
+        with self._lock:
+            return self.aggregates.get(house, HouseAggregates()).totals(start, end)
+
+    def house_window(self, house, days, end=None):
+        """鸡舍截至end（默认最后一条记录的日期）最近days天的合计"""
+        with self._lock:
+            return self.aggregates.get(house, HouseAggregates()).window(days, end)
+
+    def table(self):
+        """各鸡舍的关键指标，鸡场的每个鸡舍各一行，没有数据的鸡舍为空值"""
+        with self._lock:
+            houses = self.houses.reindex(self.house_numbers)
+            weights = self.weights.reindex(self.house_numbers)
+            recent = [self.aggregates.get(house, HouseAggregates()).window(7) for house in self.house_numbers]
+        stock = houses['存栏数'].astype(float)
+        average_weight = weights['总重量(kg)'].astype(float) * 1000 / weights['样本数量'].replace(0, np.nan)
+        feed = houses['累计耗料(kg)'].astype(float)
+        cycle_feed = houses['批次耗料(kg)'].astype(float)
+        return pd.DataFrame({
+            "日龄": houses['日龄'],
+            "存栏数": houses['存栏数'],
+            "死亡率(%)": houses['累计死亡'] / houses['初始存栏'] * 100,
+            "累计淘汰(只)": houses['累计淘汰'],
+            "淘汰率(%)": houses['累计淘汰'] / houses['初始存栏'] * 100,
+            "只均日耗料(g)": feed * 1000 / houses['存栏只日'].replace(0, np.nan),
+            "均重(g)": average_weight,
+            # 料重比按当前批次的耗料、当前存栏和最近一次称重的均重估算
+            "料重比": cycle_feed / (stock * average_weight / 1000),
+            "近7天死亡(只)": [r["死亡(只)"] if r["天数"] else np.nan for r in recent],
+            "近7天日均耗料(kg)": [r["平均日耗料(kg)"] if r["天数"] else np.nan for r in recent],
+            "最近日期": houses['最近日期'],
+        }, index=pd.Index(self.house_numbers, name="鸡舍")).astype({"死亡率(%)": float, "淘汰率(%)": float})
+
+    def totals(self):
+        """全场合计指标"""
+        with self._lock:
+            houses = self.houses.copy()
+            weights = self.weights.reindex(houses.index)
+        initial = houses['初始存栏'].sum()
+        bird_days = houses['存栏只日'].sum()
+        live_weight = (houses['存栏数'] * weights['总重量(kg)'] / weights['样本数量']).sum()
+        return {
+            "存栏数": int(houses['存栏数'].sum()),
+            "死亡率(%)": houses['累计死亡'].sum() / initial * 100 if initial else None,
+            "只均日耗料(g)": houses['累计耗料(kg)'].sum() * 1000 / bird_days if bird_days else None,
+            # 只统计已有称重数据的鸡舍
+            "料重比": (houses['批次耗料(kg)'][weights['样本数量'].notna()].sum() / live_weight
+                    if live_weight else None),
+        }
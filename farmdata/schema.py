@@ -0,0 +1,19 @@
+"""工作表名称与列定义"""
+
+WEIGHT_SHEET = "称重数据"
+PURCHASE_SHEET = "采购饲料记录"
+PLACEMENT_SHEET = "进雏记录"
+
+DAILY_COLUMNS = ["日期", "鸡舍编号", "日龄", "单日耗料(kg)", "单日死亡(只)", "单日淘汰(只)", "存栏数"]
+WEIGHT_COLUMNS = ["日期", "鸡舍编号", "鸡笼编号", "层数", "样本数量", "总重量(kg)", "均重(g)", "日龄"]
+PURCHASE_COLUMNS = ["日期", "鸡舍编号", "采购饲料(kg)", "料号"]
+# 每批鸡一条记录，日期为进雏日期
+PLACEMENT_COLUMNS = ["日期", "鸡舍编号", "进雏数量", "品种"]
+
+FEED_TYPES = ["510", "510DC", "511", "513"]
+BREEDS = ["AA+", "罗斯308", "科宝500"]
+
+
+def is_house_sheet(sheet_name):
+    """鸡舍工作表以鸡舍编号命名"""
+    return str(sheet_name).isdigit()
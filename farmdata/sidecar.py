@@ -0,0 +1,79 @@
+"""工作簿的列式缓存（Arrow IPC），加速冷启动读取
+
+缓存放在工作簿同目录的隐藏文件夹中，每个工作表一个 .arrow 文件，
+manifest.json 记录生成缓存时工作簿的修改时间和大小。工作簿被修改
+（包括手工编辑）后缓存自动失效，下次读取时重新生成。Excel始终是唯一的数据源。
+"""
+import json
+import os
+import shutil
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+MANIFEST = "manifest.json"
+
+
+def sidecar_dir(excel_path):
+    """缓存目录：与工作簿同目录的 .<文件名>.cache"""
+    folder, name = os.path.split(excel_path)
+    return os.path.join(folder, f".{name}.cache")
+
+
+def _since(table, since):
+    """在Arrow表上筛选日期不早于since的行，只有筛选后的行会转换为DataFrame"""
+    if since is None or "日期" not in table.column_names:
+        return table
+    date_type = table.schema.field("日期").type
+    if not pa.types.is_date(date_type):
+        return table
+    return table.filter(pc.greater_equal(table["日期"], pa.scalar(since, date_type)))
+
+
+def read_sidecar(excel_path, version, sheet_names=None, since=None):
+    """读取与工作簿版本一致的缓存；缓存不存在或已过期时返回None
+
+    sheet_names为None时读取全部工作表，否则只读取其中存在的工作表；
+    since（date）不为None时只保留日期不早于since的行。
+    """
+    folder = sidecar_dir(excel_path)
+    try:
+        with open(os.path.join(folder, MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+        if tuple(manifest["version"]) != tuple(version):
+            return None
+        wanted = None if sheet_names is None else set(sheet_names)
+        sheets = {}
+        for i, sheet_name in enumerate(manifest["sheets"]):
+            if wanted is not None and sheet_name not in wanted:
+                continue
+            # 内存映射读取，不需要先把整个文件读入内存
+            with pa.memory_map(os.path.join(folder, f"{i}.arrow")) as source:
+                table = pa.ipc.open_file(source).read_all()
+            sheets[sheet_name] = _since(table, since).to_pandas()
+        return sheets
+    except (OSError, ValueError, KeyError, pa.ArrowException):
+        return None
+
+
+def write_sidecar(excel_path, version, sheets):
+    """为当前版本的工作簿生成缓存；无法转换为Arrow格式时不生成缓存"""
+    folder = sidecar_dir(excel_path)
+    temp = folder + ".tmp"
+    shutil.rmtree(temp, ignore_errors=True)
+    try:
+        os.makedirs(temp)
+        for i, df in enumerate(sheets.values()):
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            with pa.OSFile(os.path.join(temp, f"{i}.arrow"), "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+        # 最后写入manifest，保证缓存要么完整要么无效
+        with open(os.path.join(temp, MANIFEST), "w", encoding="utf-8") as f:
+            json.dump({"version": list(version), "sheets": list(sheets)}, f, ensure_ascii=False)
+        shutil.rmtree(folder, ignore_errors=True)
+        os.replace(temp, folder)
+        return True
+    except (OSError, pa.ArrowException):
+        shutil.rmtree(temp, ignore_errors=True)
+        return False
@@ -0,0 +1,82 @@
+"""存栏数计算"""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from farmdata.date_index import house_index
+from farmdata.profiling import profiled, result_size
+
+DEFAULT_INITIAL_STOCK = 54000  # 默认初始存栏
+
+
+def initial_stock(df):
+    """鸡舍的初始存栏数：最早记录的存栏数 + 死亡 + 淘汰；没有记录时为默认值"""
+    if df is None or df.empty:
+        return DEFAULT_INITIAL_STOCK
+    return house_index(df).initial_stock()
+
+
+@profiled("recalculate_stock", measure=result_size)
+def recalculate_stock(df, initial_stock=DEFAULT_INITIAL_STOCK, start_date=None, cycles=None):
+    """重新计算存栏数：存栏 = 初始存栏 - (死亡 + 淘汰)的累计和
+
+    指定start_date时只重算该日期及之后的记录，之前记录的存栏数保持不变，
+    以上一条记录的存栏数作为起点。
+    cycles为鸡舍的批次（farmdata.cycles.HouseCycles）时，每次进雏当天起存栏从进雏数量重新累计；
+    早于第一次进雏的记录仍从初始存栏累计。
+    """
+    if df.empty:
+        return df
+
+    # 确保按日期排序（已有序时跳过排序）
+    if df['日期'].is_monotonic_increasing:
+        df = df.reset_index(drop=True)
+    else:
+        df = df.sort_values('日期').reset_index(drop=True)
+
+    start = 0
+    if start_date is not None:
+        # 已排序，二分查找第一条受影响的记录
+        key = _date_key(df['日期'], start_date)
+        start = int(df['日期'].searchsorted(key, side='left'))
+        if start >= len(df):
+            return df
+
+    cycle = None
+    if cycles is not None and len(cycles):
+        cycle = cycles.find_all(pd.to_datetime(df['日期']).to_numpy(dtype='datetime64[D]'))
+        if cycle[start] >= 0:
+            # 从所属批次的第一条记录开始重算
+            start = int(np.searchsorted(cycle, cycle[start], side='left'))
+
+    # 起点：第一条记录从初始存栏开始，否则从上一条记录的存栏开始
+    base = initial_stock if start == 0 else df['存栏数'].iat[start - 1]
+    losses = df['单日死亡(只)'].iloc[start:] + df['单日淘汰(只)'].iloc[start:]
+    if cycle is None:
+        # skipna=False：与逐行计算一致，缺失值之后的存栏数均为空
+        stock = (base - losses.cumsum(skipna=False)).to_numpy()
+    else:
+        # 按批次分段累计，每段从进雏数量（第一次进雏之前为起点存栏）开始
+        segments = cycle[start:]
+        bounds = np.flatnonzero(np.diff(segments)) + 1
+        parts = []
+        for lo, hi in zip(np.r_[0, bounds], np.r_[bounds, len(segments)]):
+            segment_base = cycles.counts[segments[lo]] if segments[lo] >= 0 else base
+            parts.append((segment_base - losses.iloc[lo:hi].cumsum(skipna=False)).to_numpy())
+        stock = np.concatenate(parts)
+
+    if start == 0:
+        df['存栏数'] = stock
+    else:
+        df.loc[start:, '存栏数'] = stock
+    return df
+
+
+def _date_key(dates, value):
+    """把查找日期转换为与日期列相同的类型，便于直接二分查找"""
+    value = pd.Timestamp(value)
+    first = dates.iat[0]
+    if pd.api.types.is_datetime64_any_dtype(dates) or isinstance(first, datetime):
+        return value
+    return value.date()
@@ -0,0 +1,667 @@
+"""数据存储：Excel工作簿与SQLite两种实现，对外提供相同接口
+
+两种实现都以“工作表字典”（工作表名 -> DataFrame）的形式读写数据，
+与原有 chicken.xlsx 的布局保持一致。
+"""
+import os
+import shutil
+import sqlite3
+import urllib.request
+from contextlib import closing
+from datetime import date, datetime, time
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+from farmdata.journal import Journal, frame_to_entry, pending_entries, replay
+from farmdata.locking import WriteLock
+from farmdata.schema import (
+    DAILY_COLUMNS,
+    PLACEMENT_COLUMNS,
+    PLACEMENT_SHEET,
+    PURCHASE_COLUMNS,
+    PURCHASE_SHEET,
+    WEIGHT_COLUMNS,
+    WEIGHT_SHEET,
+    is_house_sheet,
+)
+from farmdata.sidecar import read_sidecar, sidecar_dir, write_sidecar
+
+# 分块读取（如导出）时每块的行数
+CHUNK_ROWS = 50000
+
+
+class SheetDict(dict):
+    """工作表字典：记录读取时的数据版本，以及被替换的工作表和追加的新行，
+    保存时只写出这些改动
+    """
+    def __init__(self, *args, version=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.version = version
+        self.dirty = set()
+        self.appended = {}
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.dirty.add(key)
+
+    def append_rows(self, sheet_name, rows):
+        """在工作表末尾追加新行；工作表不存在时作为新工作表保存"""
+        if sheet_name not in self:
+            self[sheet_name] = rows.reset_index(drop=True)
+            return self[sheet_name]
+        combined = pd.concat([self[sheet_name], rows], ignore_index=True)
+        # 内存中的数据同步追加，但不标记为需要整表重写
+        super().__setitem__(sheet_name, combined)
+        self.appended.setdefault(sheet_name, []).append(rows)
+        return combined
+
+    def mark_saved(self):
+        self.dirty.clear()
+        self.appended.clear()
+
+
+def normalize_dates(sheets):
+    """将所有工作表的日期列统一转换为日期格式（不含时间）"""
+    for sheet_name, df in sheets.items():
+        if not df.empty and '日期' in df.columns:
+            df['日期'] = pd.to_datetime(df['日期']).dt.date
+        # 料号在Excel中可能被识别为数字，统一为文本
+        if '料号' in df.columns:
+            df['料号'] = df['料号'].map(_feed_type_text)
+    return sheets
+
+
+def _feed_type_text(value):
+    if pd.isna(value):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def since_day(since):
+    """since对应的起始日期：带时间的since取其后的第一个整天"""
+    return pd.Timestamp(since).ceil('D').date()
+
+
+def filter_since(df, since):
+    """只保留日期不早于since的记录；since为None或没有日期列时原样返回"""
+    if df is None or since is None or df.empty or '日期' not in df.columns:
+        return df
+    keep = pd.to_datetime(df['日期']) >= pd.Timestamp(since_day(since))
+    if keep.all():
+        return df
+    return df[keep.to_numpy()].reset_index(drop=True)
+
+
+def iter_frame(df, start=None, end=None, houses=None, chunk_rows=CHUNK_ROWS):
+    """分块遍历日期在start至end（含首尾）之间、鸡舍编号属于houses的记录
+
+    每块单独筛选后交出，不生成整张表的筛选结果；参数为None时不限制。
+    """
+    if df is None or df.empty:
+        return
+    for lo in range(0, len(df), chunk_rows):
+        chunk = df.iloc[lo:lo + chunk_rows]
+        keep = np.ones(len(chunk), dtype=bool)
+        if (start is not None or end is not None) and '日期' in chunk.columns:
+            dates = pd.to_datetime(chunk['日期'])
+            if start is not None:
+                keep &= (dates >= pd.Timestamp(start)).to_numpy()
+            if end is not None:
+                keep &= (dates <= pd.Timestamp(end)).to_numpy()
+        if houses is not None and '鸡舍编号' in chunk.columns:
+            keep &= pd.to_numeric(chunk['鸡舍编号'], errors='coerce').isin(list(houses)).to_numpy()
+        if keep.all():
+            yield chunk
+        elif keep.any():
+            yield chunk[keep]
+
+
+def _row_date(value):
+    """单元格中的日期转换为datetime，无法识别时返回None"""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime.combine(value, time())
+    try:
+        value = pd.Timestamp(value)
+    except (TypeError, ValueError):
+        return None
+    return None if pd.isna(value) else value
+
+
+def stream_sheets(path, sheet_names, since=None):
+    """用openpyxl只读模式逐行读取指定的工作表，跳过日期早于since的行
+
+    只解析请求的工作表，被跳过的行不会生成DataFrame，内存占用只与保留的行数有关。
+    """
+    start = None if since is None else datetime.combine(since_day(since), time())
+    sheets = {}
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        for sheet_name in sheet_names:
+            if sheet_name not in workbook.sheetnames:
+                continue
+            rows = workbook[sheet_name].iter_rows(values_only=True)
+            header = list(next(rows, ()))
+            # 去掉表头右侧的空列
+            while header and header[-1] is None:
+                header.pop()
+            width = len(header)
+            date_column = header.index('日期') if start is not None and '日期' in header else None
+            kept = []
+            for row in rows:
+                row = tuple(row[:width]) + (None,) * (width - len(row))
+                if all(value is None for value in row):
+                    continue
+                if date_column is not None:
+                    row_date = _row_date(row[date_column])
+                    if row_date is None or row_date < start:
+                        continue
+                kept.append(row)
+            sheets[sheet_name] = pd.DataFrame(kept, columns=header)
+    finally:
+        workbook.close()
+    return normalize_dates(sheets)
+
+
+def _to_excel_frame(df):
+    """保存前确保日期格式正确"""
+    if not df.empty and '日期' in df.columns:
+        df_copy = df.copy()
+        # 确保日期列是datetime类型以便Excel保存
+        df_copy['日期'] = pd.to_datetime(df_copy['日期'])
+        return df_copy
+    return df
+
+
+def write_workbook(path, sheets):
+    """按原有布局完整写出工作簿"""
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        for sheet_name, df in sheets.items():
+            _to_excel_frame(df).to_excel(writer, sheet_name=sheet_name, index=False)
+
+
+class Storage:
+    """存储接口
+
+    write_lock为写锁（见farmdata.locking.WriteLock），所有写入都应在锁内进行。
+    """
+    # 是否支持按（鸡舍编号, 日期）索引查询
+    indexed = False
+    write_lock = None
+
+    def version(self):
+        """数据版本号，数据变化后版本号随之变化；没有数据时返回None"""
+        raise NotImplementedError
+
+    def load_all_sheets(self):
+        """读取全部数据，返回工作表字典"""
+        raise NotImplementedError
+
+    def load_sheets(self, sheet_names, since=None):
+        """只读取指定的工作表，返回工作表字典（不含不存在的工作表）；
+        since不为None时只保留日期不早于since的记录
+        """
+        sheets = self.load_all_sheets()
+        return {name: filter_since(sheets[name], since) for name in sheet_names if name in sheets}
+
+    def load_sheet(self, sheet_name, since=None):
+        """读取单个工作表，工作表不存在时返回None"""
+        return self.load_sheets([sheet_name], since).get(sheet_name)
+
+    def iter_records(self, sheet_name, start=None, end=None, houses=None, chunk_rows=CHUNK_ROWS):
+        """分块读取工作表中日期在start至end（含首尾）之间、属于houses的记录，每次交出一个DataFrame"""
+        yield from iter_frame(self.load_sheet(sheet_name, since=start), start, end, houses, chunk_rows)
+
+    def save_sheets(self, sheets, sheet_names=None):
+        """保存工作表；sheet_names为None时保存全部"""
+        raise NotImplementedError
+
+    def append_rows(self, sheet_name, rows):
+        """在工作表末尾追加新行"""
+        raise NotImplementedError
+
+    def find_daily_records(self, house_num, date):
+        """查询鸡舍某一天的日常数据"""
+        raise NotImplementedError
+
+    def daily_records_since(self, house_num, since):
+        """查询鸡舍某日期之后的日常数据（按日期倒序）"""
+        raise NotImplementedError
+
+    def pending_count(self):
+        """尚未写回主存储的改动数"""
+        return 0
+
+    def compact(self):
+        """把未写回的改动写回主存储，有写回时返回True"""
+        return False
+
+    def rebuild_caches(self):
+        """重建读取缓存和索引（离线维护时调用）"""
+
+    def export_excel(self, path):
+        """导出为原有的xlsx布局"""
+        write_workbook(path, self.load_all_sheets())
+
+
+class ExcelStorage(Storage):
+    """以单个xlsx工作簿存储全部数据"""
+    def __init__(self, path):
+        self.path = path
+        self.write_lock = WriteLock(path + ".lock")
+
+    def version(self):
+        return self._file_version()
+
+    def _file_version(self, path=None):
+        path = path or self.path
+        if not os.path.exists(path):
+            return None
+        # 以修改时间和文件大小作为版本号
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _replace_file(self, write, copy_existing=False, before_replace=None):
+        """先写入临时文件再原子替换，写入中途出错不会损坏原工作簿"""
+        root, ext = os.path.splitext(self.path)
+        temp = f"{root}.saving{ext}"
+        try:
+            if copy_existing:
+                shutil.copy2(self.path, temp)
+            write(temp)
+            if before_replace is not None:
+                before_replace(temp)
+            os.replace(temp, self.path)
+        finally:
+            if os.path.exists(temp):
+                os.remove(temp)
+
+    def load_all_sheets(self):
+        version = self._file_version()
+        if version is None:
+            return {}
+        # 优先读取列式缓存，缓存失效时解析工作簿并重新生成缓存
+        sheets = read_sidecar(self.path, version)
+        if sheets is None:
+            sheets = normalize_dates(pd.read_excel(self.path, sheet_name=None))
+            write_sidecar(self.path, version, sheets)
+        return sheets
+
+    def rebuild_caches(self):
+        """删除列式缓存，重新解析工作簿生成"""
+        with self.write_lock:
+            shutil.rmtree(sidecar_dir(self.path), ignore_errors=True)
+            ExcelStorage.load_all_sheets(self)
+
+    def load_sheets(self, sheet_names, since=None):
+        version = self._file_version()
+        if version is None:
+            return {}
+        # 缓存有效时只读取请求的工作表；否则逐行读取工作簿中的这些工作表
+        sheets = read_sidecar(self.path, version, sheet_names, None if since is None else since_day(since))
+        if sheets is None:
+            sheets = stream_sheets(self.path, sheet_names, since)
+        return {name: filter_since(sheets[name], since) for name in sheet_names if name in sheets}
+
+    def save_sheets(self, sheets, sheet_names=None, before_replace=None):
+        if sheet_names is None or not os.path.exists(self.path):
+            # 文件不存在或未指定改动时，完整写出所有工作表
+            self._replace_file(lambda temp: write_workbook(temp, sheets), before_replace=before_replace)
+        elif sheet_names:
+            def write(temp):
+                # 只替换改动过的工作表，其余工作表保持原样
+                with pd.ExcelWriter(temp, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
+                    for sheet_name in sheet_names:
+                        if sheet_name in sheets:
+                            _to_excel_frame(sheets[sheet_name]).to_excel(writer, sheet_name=sheet_name, index=False)
+            self._replace_file(write, copy_existing=True, before_replace=before_replace)
+
+    def append_rows(self, sheet_name, rows):
+        """在工作表末尾追加新行
+
+        openpyxl的追加模式仍会读入并重新写出整个工作簿，只省去了把各工作表转换为DataFrame
+        再写出的开销，耗时仍随工作簿大小增长。需要与工作簿大小无关的追加时使用
+        JournaledExcelStorage（open_storage的默认方式）：新行只写入日志，之后批量写回。
+        """
+        def write(temp):
+            with pd.ExcelWriter(temp, engine='openpyxl', mode='a', if_sheet_exists='overlay') as writer:
+                worksheet = writer.sheets[sheet_name]
+                # 按表头顺序排列新行的列
+                header = [cell.value for cell in worksheet[1]]
+                frame = _to_excel_frame(rows.reindex(columns=header))
+                frame.to_excel(writer, sheet_name=sheet_name, index=False, header=False, startrow=worksheet.max_row)
+        self._replace_file(write, copy_existing=True)
+
+
+class JournaledExcelStorage(ExcelStorage):
+    """先写日志再确认：每次保存只向日志追加一条记录并fsync，
+    日志累积到batch_size条后由compact()批量写回工作簿，启动时重放未写回的记录。
+    batch_size为None时不在保存时写回，由后台线程（farmdata.writer）负责
+    """
+    def __init__(self, path, batch_size=20):
+        super().__init__(path)
+        self.journal = Journal(path + ".journal")
+        self.batch_size = batch_size
+        # (工作簿版本, 日志大小)及对应的未写回记录
+        self._pending_cache = None
+
+    def version(self):
+        workbook_version = self._file_version()
+        journal_size = self.journal.size()
+        if workbook_version is None and journal_size == 0:
+            return None
+        return (workbook_version, journal_size)
+
+    def _pending(self):
+        """未写回的记录；工作簿和日志都没有变化时直接使用上次解析的结果，不重新读取日志"""
+        key = (self._file_version(), self.journal.size())
+        cached = self._pending_cache
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        entries = pending_entries(self.journal.entries(), key[0])
+        # 解析期间有写入或压缩时不缓存，下次重新解析
+        if (self._file_version(), self.journal.size()) == key:
+            self._pending_cache = (key, entries)
+        return entries
+
+    def pending_count(self):
+        """尚未写回工作簿的记录数"""
+        return len(self._pending())
+
+    def load_all_sheets(self):
+        # 读取不加锁；读取期间恰好发生压缩时版本号会变化，重新读取
+        while True:
+            version = self.version()
+            sheets = replay(super().load_all_sheets(), self._pending())
+            if self.version() == version:
+                return sheets
+
+    def load_sheets(self, sheet_names, since=None):
+        wanted = set(sheet_names)
+        while True:
+            version = self.version()
+            # 只重放这些工作表的日志；整表替换的记录包含全部历史，重放后再按日期筛选
+            entries = [entry for entry in self._pending() if entry["sheet"] in wanted]
+            sheets = replay(super().load_sheets(sheet_names, since), entries)
+            if self.version() == version:
+                return {name: filter_since(sheets[name], since) for name in sheet_names if name in sheets}
+
+    def save_sheets(self, sheets, sheet_names=None):
+        if sheet_names is None:
+            sheet_names = list(sheets)
+        entries = [frame_to_entry("replace", name, sheets[name]) for name in sheet_names if name in sheets]
+        self._write(entries)
+
+    def append_rows(self, sheet_name, rows):
+        self._write([frame_to_entry("append", sheet_name, rows)])
+
+    def _write(self, entries):
+        if not entries:
+            return
+        with self.write_lock:
+            self.journal.repair()
+            self.journal.write(entries)
+            if self.batch_size is not None and self.pending_count() >= self.batch_size:
+                self.compact()
+
+    def compact(self):
+        """把日志中的记录写回工作簿并清空日志；工作簿被占用时保留日志，稍后再试"""
+        with self.write_lock:
+            # 启动时的恢复也经过这里：去掉上次写入中途中断留下的不完整记录
+            self.journal.repair()
+            entries = self._pending()
+            if not entries:
+                return False
+            sheets = self.load_all_sheets()
+            changed = {entry["sheet"] for entry in entries}
+
+            def mark(temp):
+                # 替换工作簿之前记下新工作簿的版本号：
+                # 替换完成但日志未清空时，重放会据此跳过已写回的记录
+                self.journal.write([{"op": "compacted", "version": list(self._file_version(temp))}])
+
+            try:
+                ExcelStorage.save_sheets(self, sheets, changed, before_replace=mark)
+            except OSError:
+                return False
+            self.journal.truncate()
+            # 合并后的数据已在内存中，直接生成新版本工作簿的列式缓存，省去下次解析
+            write_sidecar(self.path, self._file_version(), normalize_dates(sheets))
+            return True
+
+
+# SQLite中的表：日常数据按鸡舍编号拆分为各鸡舍工作表
+_TABLES = {
+    "daily": (DAILY_COLUMNS, {"日期": "TEXT", "鸡舍编号": "INTEGER", "日龄": "INTEGER", "单日耗料(kg)": "REAL",
+                              "单日死亡(只)": "INTEGER", "单日淘汰(只)": "INTEGER", "存栏数": "INTEGER"}),
+    "weight": (WEIGHT_COLUMNS, {"日期": "TEXT", "鸡舍编号": "INTEGER", "鸡笼编号": "INTEGER", "层数": "TEXT",
+                                "样本数量": "INTEGER", "总重量(kg)": "REAL", "均重(g)": "REAL", "日龄": "INTEGER"}),
+    "purchase": (PURCHASE_COLUMNS, {"日期": "TEXT", "鸡舍编号": "INTEGER", "采购饲料(kg)": "REAL", "料号": "TEXT"}),
+    "placement": (PLACEMENT_COLUMNS, {"日期": "TEXT", "鸡舍编号": "INTEGER", "进雏数量": "INTEGER", "品种": "TEXT"}),
+}
+
+# 除鸡舍工作表外，其余工作表与表一一对应
+_SHEET_TABLES = {WEIGHT_SHEET: "weight", PURCHASE_SHEET: "purchase", PLACEMENT_SHEET: "placement"}
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _table_for_sheet(sheet_name):
+    if is_house_sheet(sheet_name):
+        return "daily"
+    return _SHEET_TABLES.get(sheet_name)
+
+
+def _to_sql_frame(df, columns):
+    """按表结构整理列，日期保存为YYYY-MM-DD文本以便索引和排序"""
+    df = df.reindex(columns=columns).copy()
+    df['日期'] = pd.to_datetime(df['日期']).dt.strftime('%Y-%m-%d')
+    if '料号' in df.columns:
+        df['料号'] = df['料号'].astype(str)
+    return df
+
+
+def _from_sql_frame(df):
+    """读取后日期转换为date对象，与Excel读取结果一致"""
+    if not df.empty:
+        df['日期'] = pd.to_datetime(df['日期']).dt.date
+    return df
+
+
+class SqliteStorage(Storage):
+    """SQLite存储：日常、称重、采购、进雏四张表，均按（鸡舍编号, 日期）建立索引
+
+    readonly为True时以只读方式打开已有的数据库，不建表（用于跨场汇总等只读取数据的场合）。
+    """
+    indexed = True
+
+    def __init__(self, path, readonly=False):
+        self.path = path
+        self.readonly = readonly
+        self.write_lock = WriteLock(path + ".lock")
+        if readonly:
+            return
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            for table, (columns, types) in _TABLES.items():
+                column_defs = ", ".join(f"{_quote(c)} {types[c]}" for c in columns)
+                conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY, {column_defs})")
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_house_date ON {table} ({_quote('鸡舍编号')}, {_quote('日期')})")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0)")
+
+    def _connect(self):
+        # 每次操作使用独立连接，Streamlit多线程会话之间不共享连接
+        if self.readonly:
+            return sqlite3.connect(f"file:{urllib.request.pathname2url(os.path.abspath(self.path))}?mode=ro", uri=True)
+        return sqlite3.connect(self.path)
+
+    @staticmethod
+    def _bump_version(conn):
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+
+    def version(self):
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+    def rebuild_caches(self):
+        """重建索引、更新查询统计，并把WAL日志合并回数据库文件"""
+        with self.write_lock, closing(self._connect()) as conn:
+            conn.execute("REINDEX")
+            conn.execute("ANALYZE")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def is_empty(self):
+        """数据库中是否还没有任何记录"""
+        with closing(self._connect()) as conn:
+            return all(conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone() is None for table in _TABLES)
+
+    def _read(self, conn, table, where="", params=(), order="id"):
+        columns, _ = _TABLES[table]
+        select = ", ".join(_quote(c) for c in columns)
+        sql = f"SELECT {select} FROM {table} {where} ORDER BY {order}"
+        return _from_sql_frame(pd.read_sql_query(sql, conn, params=params))
+
+    def load_all_sheets(self):
+        sheets = {}
+        with closing(self._connect()) as conn:
+            daily = self._read(conn, "daily", order=f"{_quote('鸡舍编号')}, {_quote('日期')}, id")
+            for house_num, df in daily.groupby('鸡舍编号', sort=True):
+                sheets[str(house_num)] = df.reset_index(drop=True)
+            for sheet_name, table in _SHEET_TABLES.items():
+                df = self._read(conn, table)
+                if not df.empty:
+                    sheets[sheet_name] = df
+        return sheets
+
+    def load_sheets(self, sheet_names, since=None):
+        sheets = {}
+        with closing(self._connect()) as conn:
+            for sheet_name in sheet_names:
+                table = _table_for_sheet(sheet_name)
+                if table is None:
+                    continue
+                # 鸡舍工作表按（鸡舍编号, 日期）索引读取该鸡舍的记录
+                if table == "daily":
+                    owner, owner_params = f"WHERE {_quote('鸡舍编号')} = ?", (int(sheet_name),)
+                    order = f"{_quote('日期')}, id"
+                else:
+                    owner, owner_params, order = "", (), "id"
+                if since is None:
+                    df = self._read(conn, table, owner, owner_params, order=order)
+                else:
+                    where = f"{owner} AND" if owner else "WHERE"
+                    df = self._read(conn, table, f"{where} {_quote('日期')} >= ?",
+                                    owner_params + (since_day(since).strftime('%Y-%m-%d'),), order=order)
+                # 与load_all_sheets一致：没有任何记录的工作表视为不存在
+                if df.empty and (since is None or conn.execute(
+                        f"SELECT 1 FROM {table} {owner} LIMIT 1", owner_params).fetchone() is None):
+                    continue
+                sheets[sheet_name] = df
+        return sheets
+
+    def iter_records(self, sheet_name, start=None, end=None, houses=None, chunk_rows=CHUNK_ROWS):
+        """按索引查询，用游标分块读取，内存占用只与块大小有关"""
+        table = _table_for_sheet(sheet_name)
+        if table is None:
+            return
+        conditions, params = [], []
+        if table == "daily":
+            if houses is not None and int(sheet_name) not in houses:
+                return
+            conditions.append(f"{_quote('鸡舍编号')} = ?")
+            params.append(int(sheet_name))
+            order = f"{_quote('日期')}, id"
+        else:
+            if houses is not None:
+                houses = [int(house) for house in houses]
+                conditions.append(f"{_quote('鸡舍编号')} IN ({', '.join('?' for _ in houses)})")
+                params.extend(houses)
+            order = "id"
+        if start is not None:
+            conditions.append(f"{_quote('日期')} >= ?")
+            params.append(pd.Timestamp(start).strftime('%Y-%m-%d'))
+        if end is not None:
+            conditions.append(f"{_quote('日期')} <= ?")
+            params.append(pd.Timestamp(end).strftime('%Y-%m-%d'))
+        columns, _ = _TABLES[table]
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        sql = f"SELECT {', '.join(_quote(c) for c in columns)} FROM {table} {where} ORDER BY {order}"
+        with closing(self._connect()) as conn:
+            for chunk in pd.read_sql_query(sql, conn, params=params, chunksize=chunk_rows):
+                yield _from_sql_frame(chunk)
+
+    def save_sheets(self, sheets, sheet_names=None):
+        if sheet_names is None:
+            sheet_names = list(sheets)
+        if not sheet_names:
+            return
+        with closing(self._connect()) as conn, conn:
+            for sheet_name in sheet_names:
+                table = _table_for_sheet(sheet_name)
+                if table is None or sheet_name not in sheets:
+                    continue
+                # 整表替换：鸡舍工作表只替换该鸡舍的记录
+                if table == "daily":
+                    conn.execute(f"DELETE FROM daily WHERE {_quote('鸡舍编号')} = ?", (int(sheet_name),))
+                    df = sheets[sheet_name].assign(鸡舍编号=int(sheet_name))
+                else:
+                    conn.execute(f"DELETE FROM {table}")
+                    df = sheets[sheet_name]
+                self._insert(conn, table, df)
+            self._bump_version(conn)
+
+    def _insert(self, conn, table, df):
+        if df.empty:
+            return
+        columns, _ = _TABLES[table]
+        placeholders = ", ".join("?" for _ in columns)
+        names = ", ".join(_quote(c) for c in columns)
+        rows = _to_sql_frame(df, columns).astype(object).where(lambda d: d.notna(), None)
+        conn.executemany(f"INSERT INTO {table} ({names}) VALUES ({placeholders})", rows.itertuples(index=False, name=None))
+
+    def append_rows(self, sheet_name, rows):
+        table = _table_for_sheet(sheet_name)
+        if table is None:
+            raise ValueError(f"不支持的工作表：{sheet_name}")
+        if table == "daily":
+            rows = rows.assign(鸡舍编号=int(sheet_name))
+        with closing(self._connect()) as conn, conn:
+            self._insert(conn, table, rows)
+            self._bump_version(conn)
+
+    def find_daily_records(self, house_num, date):
+        with closing(self._connect()) as conn:
+            return self._read(conn, "daily", f"WHERE {_quote('鸡舍编号')} = ? AND {_quote('日期')} = ?",
+                              (int(house_num), pd.to_datetime(date).strftime('%Y-%m-%d')))
+
+    def daily_records_since(self, house_num, since):
+        with closing(self._connect()) as conn:
+            return self._read(conn, "daily", f"WHERE {_quote('鸡舍编号')} = ? AND {_quote('日期')} >= ?",
+                              (int(house_num), pd.to_datetime(since).strftime('%Y-%m-%d')),
+                              order=f"{_quote('日期')} DESC, id")
+
+
+def open_storage(excel_path, backend="excel", batch_size=20):
+    """按配置打开存储；SQLite数据库与工作簿同名（.db），首次打开时导入已有工作簿
+
+    batch_size见JournaledExcelStorage，仅对Excel存储有效。
+    """
+    if backend == "excel":
+        storage = JournaledExcelStorage(excel_path, batch_size=batch_size)
+        # 启动时把上次未写回的日志合并进工作簿
+        storage.compact()
+        return storage
+    if backend == "sqlite":
+        storage = SqliteStorage(os.path.splitext(excel_path)[0] + ".db")
+        if storage.is_empty() and os.path.exists(excel_path):
+            storage.save_sheets(ExcelStorage(excel_path).load_all_sheets())
+        return storage
+    raise ValueError(f"未知的存储类型：{backend}")
@@ -0,0 +1,109 @@
+"""后台写回线程
+
+提交改动时只写日志（几毫秒），由后台线程在改动停顿一段时间后把日志合并写回
+工作簿。短时间内连续提交的多条改动只触发一次完整写入。
+"""
+import atexit
+import threading
+import time
+from datetime import datetime
+
+
+class BackgroundWriter:
+    """等待改动停顿delay秒（最长等待max_delay秒）后，把存储中未写回的改动一次写回
+
+    on_compact(before, after)在每次写回后调用，before、after为写回前后的版本号（数据内容不变）。
+    """
+    def __init__(self, storage, delay=3.0, max_delay=30.0, retry_delay=10.0, on_compact=None):
+        self.storage = storage
+        self.on_compact = on_compact
+        self.delay = delay
+        self.max_delay = max_delay
+        self.retry_delay = retry_delay
+        self.last_saved = None
+        self.last_error = None
+        self.saves = 0
+        self._saving = False
+        self._first_change = None
+        self._last_change = None
+        self._stopped = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="farmdata-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def notify(self):
+        """有新的改动写入日志"""
+        with self._cond:
+            now = time.monotonic()
+            if self._first_change is None:
+                self._first_change = now
+            self._last_change = now
+            self._cond.notify()
+
+    def _due(self):
+        """距最后一次改动已过delay秒，或距第一次改动已过max_delay秒时写回"""
+        now = time.monotonic()
+        return min(self._last_change + self.delay, self._first_change + self.max_delay) - now
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopped and (self._first_change is None or self._due() > 0):
+                    self._cond.wait(None if self._first_change is None else self._due())
+                if self._stopped:
+                    return
+                self._first_change = self._last_change = None
+            if not self._save():
+                # 工作簿被占用等原因写回失败，稍后重试
+                with self._cond:
+                    if self._first_change is None:
+                        self._first_change = self._last_change = time.monotonic() + self.retry_delay - self.delay
+
+    def _save(self):
+        self._saving = True
+        try:
+            if self.storage.pending_count():
+                with self.storage.write_lock:
+                    before = self.storage.version()
+                    if not self.storage.compact():
+                        self.last_error = "工作簿被占用，稍后重试"
+                        return False
+                    if self.on_compact is not None:
+                        self.on_compact(before, self.storage.version())
+                self.saves += 1
+            self.last_saved = datetime.now()
+            self.last_error = None
+            return True
+        except Exception as e:
+            self.last_error = str(e)
+            return False
+        finally:
+            self._saving = False
+
+    def flush(self):
+        """立即写回所有未写回的改动，成功返回True"""
+        with self._cond:
+            self._first_change = self._last_change = None
+        return self._save()
+
+    def status(self):
+        """写回状态：pending为未写回的改动数"""
+        return {
+            "pending": self.storage.pending_count(),
+            "saving": self._saving,
+            "last_saved": self.last_saved,
+            "last_error": self.last_error,
+            "saves": self.saves,
+        }
+
+    def close(self):
+        """停止后台线程并写回剩余改动（进程退出时自动调用）"""
+        with self._cond:
+            if self._stopped:
+                return
+            self._stopped = True
+            self._cond.notify()
+        self._thread.join()
+        self.flush()
+        atexit.unregister(self.close)
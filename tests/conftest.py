@@ -0,0 +1,30 @@
+"""测试共用的夹具：临时工作簿和两种存储方式
+
+在项目根目录运行：python -m pytest
+"""
+import os
+import sys
+
+import pytest
+
+# 直接运行pytest时也能导入farmdata
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from farmdata import open_storage  # noqa: E402
+from farmdata.schema import WEIGHT_SHEET  # noqa: E402
+from farmdata.storage import write_workbook  # noqa: E402
+from sheets import house_sheet, weight_sheet  # noqa: E402
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    """两个鸡舍各30天记录和少量称重数据的工作簿，返回路径"""
+    path = str(tmp_path / "chicken.xlsx")
+    write_workbook(path, {"1": house_sheet(30, 1), "2": house_sheet(30, 2, seed=1), WEIGHT_SHEET: weight_sheet()})
+    return path
+
+
+@pytest.fixture(params=["excel", "sqlite"])
+def storage(request, workbook):
+    """两种存储方式各运行一次；Excel存储不在保存时写回工作簿"""
+    return open_storage(workbook, request.param, batch_size=None)
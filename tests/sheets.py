@@ -0,0 +1,39 @@
+"""测试用的小型工作表：鸡舍日常数据和称重数据"""
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from farmdata import recalculate_stock
+from farmdata.schema import DAILY_COLUMNS, WEIGHT_COLUMNS
+
+START = date(2024, 1, 1)
+
+
+def house_sheet(rows, house=1, start=START, seed=0, initial=1000):
+    """一个鸡舍每天一条记录的工作表，存栏数按初始存栏累计"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "日期": [start + timedelta(days=i) for i in range(rows)],
+        "鸡舍编号": house,
+        "日龄": np.arange(1, rows + 1),
+        "单日耗料(kg)": rng.uniform(10, 30, rows).round(1),
+        "单日死亡(只)": rng.integers(0, 5, rows),
+        "单日淘汰(只)": rng.integers(0, 2, rows),
+        "存栏数": 0,
+    })[DAILY_COLUMNS]
+    return recalculate_stock(df, initial)
+
+
+def weight_sheet():
+    """称重数据：鸡舍1同一天同一笼层称了两次（记录ID只靠序号区分）"""
+    return pd.DataFrame({
+        "日期": [START + timedelta(days=6)] * 3,
+        "鸡舍编号": [1, 1, 2],
+        "鸡笼编号": [1, 1, 1],
+        "层数": ["1层", "1层", "1层"],
+        "样本数量": [20, 20, 20],
+        "总重量(kg)": [3.0, 3.4, 3.2],
+        "均重(g)": [150.0, 170.0, 160.0],
+        "日龄": [7, 7, 7],
+    })[WEIGHT_COLUMNS]
@@ -0,0 +1,82 @@
+"""并发提交：快照过期时在最新数据上重新应用改动，记录已被删除或挪位时报冲突"""
+from datetime import timedelta
+
+import pytest
+
+from farmdata import ConflictError, SheetDict, commit
+from farmdata.records import apply_batch, record_table
+from farmdata.schema import WEIGHT_SHEET
+from sheets import START, house_sheet
+
+
+def snapshot(storage):
+    """会话读取时的工作表字典"""
+    return SheetDict(storage.load_all_sheets(), version=storage.version())
+
+
+def new_day(offset, house=1):
+    """鸡舍在START之后第offset天的一条记录"""
+    return house_sheet(1, house, start=START + timedelta(days=offset))
+
+
+def record_id(sheets, sheet_name, position):
+    return record_table(sheet_name, sheets[sheet_name]).ids[position]
+
+
+def test_stale_commit_reapplies_on_latest_data(storage):
+    first, second = snapshot(storage), snapshot(storage)
+    commit(storage, first, lambda sheets: sheets.append_rows("1", new_day(30)))
+    # second的快照已过期：在最新数据上重新追加，不覆盖first写入的记录
+    commit(storage, second, lambda sheets: sheets.append_rows("1", new_day(31)))
+
+    df = storage.load_sheet("1")
+    assert len(df) == 32
+    assert list(df['日期'].iloc[-2:]) == [START + timedelta(days=30), START + timedelta(days=31)]
+    # 调用方的快照也已更新为提交后的数据
+    assert len(second["1"]) == 32
+    assert second.version == storage.version()
+
+
+def test_stale_update_applies_to_selected_record(storage):
+    first, second = snapshot(storage), snapshot(storage)
+    target = record_id(second, "1", 10)
+    commit(storage, first, lambda sheets: sheets.append_rows("1", new_day(30)))
+
+    selected = dict(second)
+    count = commit(storage, second,
+                   lambda sheets: apply_batch(sheets, {"1": [target]}, {"单日死亡(只)": 50}, snapshot=selected))
+
+    df = storage.load_sheet("1")
+    assert count == 1
+    assert len(df) == 31
+    assert df['单日死亡(只)'].iloc[10] == 50
+    # 改动之后的存栏数已重算
+    assert df['存栏数'].iloc[10] == df['存栏数'].iloc[9] - 50 - df['单日淘汰(只)'].iloc[10]
+
+
+def test_update_of_deleted_record_conflicts(storage):
+    first, second = snapshot(storage), snapshot(storage)
+    target = record_id(second, "1", 10)
+    commit(storage, first, lambda sheets: apply_batch(sheets, {"1": [target]}))
+    before = storage.load_sheet("1")
+
+    selected = dict(second)
+    with pytest.raises(ConflictError):
+        commit(storage, second,
+               lambda sheets: apply_batch(sheets, {"1": [target]}, {"单日死亡(只)": 50}, snapshot=selected))
+    assert len(before) == 29
+    assert storage.load_sheet("1").equals(before)
+
+
+def test_shifted_ordinal_conflicts(storage):
+    """同键记录被删除后序号前移：ID相同但已指向另一条记录"""
+    first, second = snapshot(storage), snapshot(storage)
+    target = record_id(second, WEIGHT_SHEET, 0)
+    assert target == record_id(first, WEIGHT_SHEET, 0)
+    commit(storage, first, lambda sheets: apply_batch(sheets, {WEIGHT_SHEET: [target]}))
+
+    selected = dict(second)
+    with pytest.raises(ConflictError):
+        commit(storage, second, lambda sheets: apply_batch(sheets, {WEIGHT_SHEET: [target]}, snapshot=selected))
+    # 原来的第二次称重仍在
+    assert list(storage.load_sheet(WEIGHT_SHEET)['总重量(kg)']) == [3.4, 3.2]
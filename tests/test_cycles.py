@@ -0,0 +1,72 @@
+"""日龄：有进雏记录时按所属批次计算，否则由鸡舍已有记录推算"""
+from datetime import timedelta
+
+import pandas as pd
+
+from farmdata import SheetDict, commit
+from farmdata.cycles import age_for_date
+from farmdata.schema import PLACEMENT_COLUMNS, PLACEMENT_SHEET
+from sheets import START, house_sheet
+
+
+def day(offset):
+    return START + timedelta(days=offset)
+
+
+def placement_sheet(*rows):
+    """进雏记录：(鸡舍, 距START的天数, 进雏数量)"""
+    return pd.DataFrame({
+        "日期": [day(offset) for _, offset, _ in rows],
+        "鸡舍编号": [house for house, _, _ in rows],
+        "进雏数量": [count for _, _, count in rows],
+        "品种": "罗斯308",
+    })[PLACEMENT_COLUMNS]
+
+
+def farm():
+    # 鸡舍1的日常记录从START起日龄1~30，进雏记录与之无关；鸡舍2没有进雏记录
+    return {
+        "1": house_sheet(30, 1),
+        "2": house_sheet(30, 2),
+        # 故意打乱顺序：批次按进雏日期排序
+        PLACEMENT_SHEET: placement_sheet((1, 20, 4000), (1, 10, 3000)),
+    }
+
+
+def test_age_follows_the_latest_placement():
+    sheets = farm()
+    assert age_for_date(sheets, 1, day(10)) == 1
+    assert age_for_date(sheets, 1, day(15)) == 6
+    assert age_for_date(sheets, 1, day(19)) == 10
+    # 第二批进雏后日龄重新从1开始
+    assert age_for_date(sheets, 1, day(20)) == 1
+    assert age_for_date(sheets, 1, day(45)) == 26
+
+
+def test_age_before_first_placement_uses_daily_records():
+    sheets = farm()
+    assert age_for_date(sheets, 1, day(5)) == 6
+    assert age_for_date(sheets, 1, day(-3)) == 1
+
+
+def test_age_without_placements_extends_daily_records():
+    sheets = farm()
+    assert age_for_date(sheets, 2, day(0)) == 1
+    assert age_for_date(sheets, 2, day(29)) == 30
+    assert age_for_date(sheets, 2, day(40)) == 41
+
+
+def test_age_without_records_is_one():
+    assert age_for_date(farm(), 3, day(5)) == 1
+    assert age_for_date({}, 1, day(5)) == 1
+
+
+def test_age_after_saving_placements(storage):
+    sheets = SheetDict(storage.load_all_sheets(), version=storage.version())
+    commit(storage, sheets, lambda s: s.append_rows(PLACEMENT_SHEET, placement_sheet((2, 12, 3500))))
+
+    loaded = storage.load_all_sheets()
+    assert age_for_date(loaded, 2, day(12)) == 1
+    assert age_for_date(loaded, 2, day(30)) == 19
+    assert age_for_date(loaded, 2, day(11)) == 12
+    assert age_for_date(loaded, 1, day(12)) == 13
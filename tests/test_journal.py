@@ -0,0 +1,109 @@
+"""预写日志的重放：写入中途中断留下的残行、压缩后未清空的日志"""
+from datetime import timedelta
+
+from farmdata import JournaledExcelStorage
+from farmdata.journal import Journal
+from sheets import START, house_sheet
+
+
+def new_day(offset, house=1):
+    return house_sheet(1, house, start=START + timedelta(days=offset))
+
+
+def journaled(workbook):
+    """写入只追加日志，不自动写回工作簿"""
+    return JournaledExcelStorage(workbook, batch_size=None)
+
+
+def read_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def tear(path):
+    """模拟进程在写入一条记录的中途退出"""
+    with open(path, "ab") as f:
+        f.write(b'{"op": "append", "sheet": "1", "colu')
+
+
+def test_torn_tail_is_ignored_without_touching_the_file(workbook):
+    storage = journaled(workbook)
+    storage.append_rows("1", new_day(30))
+    tear(storage.journal.path)
+    torn = read_bytes(storage.journal.path)
+
+    # 打开和读取都不修改日志文件
+    reopened = journaled(workbook)
+    assert reopened.pending_count() == 1
+    assert len(reopened.load_sheet("1")) == 31
+    assert len(Journal(storage.journal.path).entries()) == 1
+    assert read_bytes(storage.journal.path) == torn
+
+
+def test_write_after_torn_tail_repairs_it(workbook):
+    storage = journaled(workbook)
+    storage.append_rows("1", new_day(30))
+    tear(storage.journal.path)
+    storage.append_rows("1", new_day(31))
+
+    assert read_bytes(storage.journal.path).endswith(b"\n")
+    assert storage.pending_count() == 2
+    assert storage.compact()
+    assert storage.pending_count() == 0
+    df = journaled(workbook).load_sheet("1")
+    assert len(df) == 32
+    assert df['日期'].iloc[-1] == START + timedelta(days=31)
+
+
+def test_unparseable_middle_line_is_skipped(workbook):
+    storage = journaled(workbook)
+    storage.append_rows("1", new_day(30))
+    with open(storage.journal.path, "ab") as f:
+        f.write(b"not json\n")
+    storage.append_rows("2", new_day(30, house=2))
+
+    # 坏行之后已确认的记录照常重放
+    assert storage.pending_count() == 2
+    sheets = storage.load_all_sheets()
+    assert len(sheets["1"]) == 31
+    assert len(sheets["2"]) == 31
+
+
+def test_replay_after_interrupted_compaction(workbook, monkeypatch):
+    """工作簿已替换但日志没来得及清空：重放跳过压缩标记之前已写回的记录"""
+    storage = journaled(workbook)
+    storage.append_rows("1", new_day(30))
+    storage.save_sheets({"2": house_sheet(5, 2)})
+    monkeypatch.setattr(Journal, "truncate", lambda self: None)
+    assert storage.compact()
+    monkeypatch.undo()
+
+    reopened = journaled(workbook)
+    assert reopened.pending_count() == 0
+    sheets = reopened.load_all_sheets()
+    assert len(sheets["1"]) == 31
+    assert len(sheets["2"]) == 5
+
+    # 之后的新记录仍会重放
+    reopened.append_rows("1", new_day(31))
+    assert reopened.pending_count() == 1
+    assert len(journaled(workbook).load_sheet("1")) == 32
+
+
+def test_failed_compaction_keeps_entries_pending(workbook, monkeypatch):
+    storage = journaled(workbook)
+    storage.append_rows("1", new_day(30))
+
+    def locked(*args, **kwargs):
+        raise PermissionError("工作簿被占用")
+
+    monkeypatch.setattr("farmdata.storage.os.replace", locked)
+    assert not storage.compact()
+    monkeypatch.undo()
+
+    # 留下的压缩标记与工作簿版本不一致，之前的记录仍需重放
+    reopened = journaled(workbook)
+    assert reopened.pending_count() == 1
+    assert len(reopened.load_sheet("1")) == 31
+    assert reopened.compact()
+    assert len(journaled(workbook).load_sheet("1")) == 31
@@ -0,0 +1,109 @@
+"""存栏数重算：向量化实现与原逐行实现一致，包括按批次分段累计和增量重算"""
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from farmdata import recalculate_stock
+from farmdata.cycles import HouseCycles
+from sheets import START, house_sheet
+
+
+def loop_stock(df, initial, cycles=None):
+    """原逐行实现；有批次时每次进雏当天起从进雏数量重新累计"""
+    df = df.sort_values('日期').reset_index(drop=True)
+    stock, previous_cycle = initial, -1
+    for i in range(len(df)):
+        cycle = -1 if cycles is None else cycles.find(df.at[i, '日期'])
+        if cycle >= 0 and cycle != previous_cycle:
+            stock = cycles.counts[cycle]
+        stock = stock - df.at[i, '单日死亡(只)'] - df.at[i, '单日淘汰(只)']
+        df.at[i, '存栏数'] = stock
+        previous_cycle = cycle
+    return df
+
+
+def placements(*offsets_and_counts):
+    """鸡舍的批次：(距START的天数, 进雏数量)"""
+    return HouseCycles(
+        np.array([START + timedelta(days=offset) for offset, _ in offsets_and_counts], dtype='datetime64[D]'),
+        np.array([count for _, count in offsets_and_counts], dtype=np.int64),
+        np.array(["罗斯308"] * len(offsets_and_counts), dtype=object),
+    )
+
+
+def stocks(df):
+    return df['存栏数'].to_numpy(dtype=float)
+
+
+def test_full_recalculation_matches_loop():
+    df = house_sheet(200)
+    expected = loop_stock(df.copy(), 5000)
+    assert np.array_equal(stocks(recalculate_stock(df.copy(), 5000)), stocks(expected))
+
+
+def test_unsorted_input_is_sorted_first():
+    df = house_sheet(50)
+    shuffled = df.sample(frac=1, random_state=0)
+    result = recalculate_stock(shuffled.copy(), 5000)
+    assert pd.to_datetime(result['日期']).is_monotonic_increasing
+    assert np.array_equal(stocks(result), stocks(loop_stock(df.copy(), 5000)))
+
+
+def test_missing_losses_propagate_like_loop():
+    df = house_sheet(20).astype({"单日死亡(只)": float})
+    df.loc[8, '单日死亡(只)'] = np.nan
+    result = recalculate_stock(df.copy(), 5000)
+    assert np.array_equal(stocks(result), stocks(loop_stock(df.copy(), 5000)), equal_nan=True)
+    assert np.isnan(stocks(result)[8:]).all()
+
+
+def test_incremental_recalculation_keeps_earlier_rows():
+    df = recalculate_stock(house_sheet(120), 5000)
+    edited = df.copy()
+    edited.loc[90, '单日死亡(只)'] += 7
+    # 之前的记录被人为改乱：增量重算不应触碰它们
+    edited.loc[10, '存栏数'] = -1
+    result = recalculate_stock(edited.copy(), 5000, start_date=edited.loc[90, '日期'])
+    expected = loop_stock(edited.copy(), 5000)
+    assert stocks(result)[10] == -1
+    assert np.array_equal(stocks(result)[90:], stocks(expected)[90:])
+    assert np.array_equal(stocks(result)[11:90], stocks(df)[11:90])
+
+
+def test_start_date_after_last_record_is_noop():
+    df = recalculate_stock(house_sheet(10), 5000)
+    result = recalculate_stock(df.copy(), 5000, start_date=START + timedelta(days=30))
+    assert np.array_equal(stocks(result), stocks(df))
+
+
+def test_cycle_segments_restart_at_placement_counts():
+    df = house_sheet(150)
+    cycles = placements((20, 3000), (70, 4000), (120, 3500))
+    result = recalculate_stock(df.copy(), 5000, cycles=cycles)
+    expected = loop_stock(df.copy(), 5000, cycles)
+    assert np.array_equal(stocks(result), stocks(expected))
+    # 进雏当天的存栏 = 进雏数量 - 当天死亡淘汰
+    day = 70
+    assert stocks(result)[day] == 4000 - df.at[day, '单日死亡(只)'] - df.at[day, '单日淘汰(只)']
+
+
+def test_incremental_recalculation_inside_a_cycle():
+    cycles = placements((0, 3000), (60, 4000))
+    df = recalculate_stock(house_sheet(100), 5000, cycles=cycles)
+    edited = df.copy()
+    edited.loc[75, '单日淘汰(只)'] += 9
+    result = recalculate_stock(edited.copy(), 5000, start_date=edited.loc[75, '日期'], cycles=cycles)
+    assert np.array_equal(stocks(result), stocks(loop_stock(edited.copy(), 5000, cycles)))
+
+
+def test_incremental_recalculation_before_first_placement():
+    cycles = placements((40, 3000))
+    df = recalculate_stock(house_sheet(80), 5000, cycles=cycles)
+    edited = df.copy()
+    edited.loc[15, '单日死亡(只)'] += 4
+    result = recalculate_stock(edited.copy(), 5000, start_date=edited.loc[15, '日期'], cycles=cycles)
+    expected = loop_stock(edited.copy(), 5000, cycles)
+    assert np.array_equal(stocks(result), stocks(expected))
+    # 进雏后的存栏不受进雏前改动的影响
+    assert np.array_equal(stocks(result)[40:], stocks(df)[40:])